@@ -1,14 +1,65 @@
+import json
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 from http import HTTPStatus
-from typing import List
+from typing import IO, Any, Dict, Iterator, List, Tuple
 
-from flask import Flask, Request, Response, request
+from flask import Flask, Response, jsonify, request
 
 from config_processors.config_processor import ConfigProcessor
 from config_processors.config_processors_initializer import \
     ConfigProcessorsInitializer
+from config_version_managers.git_repository_coordinator import \
+    git_repository_coordinators
+from entities.remote_entity import RemoteEntity
 from utils.config_loader import ConfigLoader
-from utils.data_validator import validate_data
+from utils.data_validator import validate_entity_data, validate_manifest_data
+from utils.entity_registry import EntityRegistry
+from utils.metrics import metrics
+from utils.processor_executor import ProcessorExecutor, UpdateResult
+from utils.request_profiler import (PROFILE_SIGNATURE_HEADER,
+                                    PROFILE_SIGNED_VALUE, RequestProfiler)
 from utils.signature_validator import SignatureValidator
+from utils.stream_parser import (StreamParseError, iter_json_array_objects,
+                                 iter_ndjson_objects, spool_stream)
+from utils.update_queue import UpdateQueue
+
+# bodies of batch requests larger than this are spooled to a temporary file
+SPOOLED_BODY_MAX_MEMORY_SIZE = 1024 * 1024
+DEFAULT_MAX_BATCH_BODY_SIZE = 256 * 1024 * 1024
+# number of valid batch entities made durable in the update queue at once
+BATCH_ENQUEUE_SIZE = 100
+
+STAGE_DURATION = metrics.histogram(
+    "webhook_stage_duration_seconds",
+    "Time spent in the stages of webhook processing",
+    ("stage",),
+)
+UPDATES = metrics.counter(
+    "entity_updates_total",
+    "Processed entity updates - updated, failed (by any processor) or "
+    "skipped (no relevant processor)",
+    ("status",),
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "HTTP requests being handled"
+)
+UPDATE_QUEUE_DEPTH = metrics.gauge(
+    "update_queue_depth", "Accepted updates that were not processed yet"
+)
+
+
+def get_preferred_wait(prefer_header: str) -> float:
+    # RFC 7240 "Prefer: wait=<seconds>" asks for a synchronous response
+    for preference in prefer_header.split(","):
+        name, _, value = preference.strip().partition("=")
+        if name.strip().lower() == "wait":
+            try:
+                return max(0.0, float(value.strip().strip('"')))
+            except ValueError:
+                return 0.0
+    return 0.0
 
 
 def set_flask_config_options(app: Flask, app_cfg) -> None:
@@ -24,53 +75,348 @@ def get_flask_app() -> Flask:
 
     config_processors_initializer = ConfigProcessorsInitializer(processors_cfg)
     signature_validator = SignatureValidator(processors_cfg)
+    max_batch_body_size = processors_cfg.get("shared_settings", {}).get(
+        "webhook_max_batch_body_size", DEFAULT_MAX_BATCH_BODY_SIZE
+    )
     config_processors = config_processors_initializer.get_processors()
+    # git repositories of the processors are opened (or cloned) in parallel
+    # before the first update arrives
+    git_warm_up_settings = processors_cfg.get("git_warm_up_settings", {})
+    if git_warm_up_settings.get("enabled", True):
+        git_repository_coordinators.open_repositories(
+            git_warm_up_settings.get("max_workers")
+        )
+    entity_registry = EntityRegistry(
+        processors_cfg.get("entity_registry_settings", {})
+    )
+    entity_registry.load()
+    # relevant processors of an update are run concurrently
+    processor_executor = ProcessorExecutor(
+        processors_cfg.get("processor_executor_settings", {})
+    )
+    request_profiler = RequestProfiler(
+        processors_cfg.get("request_profiler_settings", {})
+    )
+
+    # filters of all processors are compiled into a dispatch table once
+    routing_index = config_processors_initializer.get_routing_index(
+        config_processors
+    )
 
     def get_relevant_config_processors(
-        request: Request,
+        entity: RemoteEntity,
     ) -> List[ConfigProcessor]:
-        received_hash_id = request.json.get("object", {}).get("id_hash")
-        relevant_config_processors = []
-        for config_processor in config_processors:
-            observed_entity_filters = config_processor.observed_entity_filters
-            # special case where no entity filters are configured ->
-            # config_processor is relevant for all entities
-            if not observed_entity_filters:
-                relevant_config_processors.append(config_processor)
-                continue
-
-            if received_hash_id in observed_entity_filters:
-                relevant_config_processors.append(config_processor)
-                continue
-
-        return relevant_config_processors
-
-    def update_relevant_configurations(request: Request) -> None:
-        relevant_config_processors = get_relevant_config_processors(request)
-
-        # TODO - handle errors when updating configuration (failed write in
-        #  file etc.)
-        for config_processor in relevant_config_processors:
-            config_processor.update_configuration(request)
+        with STAGE_DURATION.time(stage="routing"):
+            return routing_index.get_relevant_processors(entity)
+
+    def update_relevant_configurations(entity: RemoteEntity) -> UpdateResult:
+        relevant_config_processors = get_relevant_config_processors(entity)
+
+        # a failing or slow processor does not affect the other processors,
+        # the outcome of each processor is part of the update result
+        update_result = processor_executor.update_configurations(
+            entity, relevant_config_processors
+        )
+        if not relevant_config_processors:
+            UPDATES.inc(status="skipped")
+        elif update_result.is_successful:
+            UPDATES.inc(status="updated")
+        else:
+            UPDATES.inc(status="failed")
+
+        entity_registry.update(
+            entity,
+            [
+                config_processor.name
+                for config_processor in relevant_config_processors
+            ],
+            update_result.failed_processor_names,
+        )
+
+        return update_result
+
+    def handle_update(entity: RemoteEntity) -> UpdateResult:
+        # a profile started by the request continues in the queue worker
+        with request_profiler.profile_update(entity):
+            return update_relevant_configurations(entity)
+
+    update_queue = UpdateQueue(
+        processors_cfg.get("update_queue_settings", {}), handle_update
+    )
+    # updates accepted before a crash or restart are replayed here
+    update_queue.start()
+    UPDATE_QUEUE_DEPTH.set_function(update_queue.depth)
+
+    @app.before_request
+    def count_request_start():
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.teardown_request
+    def count_request_end(error=None):
+        REQUESTS_IN_FLIGHT.dec()
+
+    @app.before_request
+    def start_request_profile():
+        if request.endpoint != "remote_entity_update":
+            return
+        request_profiler.start(
+            signature_validator.has_valid_header_signature(
+                request.headers,
+                PROFILE_SIGNATURE_HEADER,
+                PROFILE_SIGNED_VALUE,
+            )
+        )
+
+    @app.teardown_request
+    def release_request_profile(error=None):
+        request_profiler.release()
+
+    @contextmanager
+    def read_signed_body(max_body_size: int = None) -> Iterator[IO[bytes]]:
+        # the body is streamed into a spooled temporary file while its
+        # signature is computed, the file is only handed out when the
+        # signature is valid
+        with tempfile.SpooledTemporaryFile(
+            max_size=SPOOLED_BODY_MAX_MEMORY_SIZE
+        ) as body_file:
+            body_chunks = spool_stream(request.stream, body_file)
+            # the body is received while it is checked
+            with STAGE_DURATION.time(stage="signature_check"):
+                has_valid_signature = (
+                    signature_validator.has_valid_body_signature(
+                        request.headers, body_chunks, max_body_size
+                    )
+                )
+            if not has_valid_signature:
+                yield None
+                return
+
+            body_file.seek(0)
+            yield body_file
 
     @app.route("/remote-entity-update", methods=["POST"])
     def remote_entity_update():
-        if not signature_validator.has_valid_signature(request):
+        with read_signed_body() as body_file:
+            if not body_file:
+                return Response(
+                    "Invalid signature on received data",
+                    status=HTTPStatus.UNAUTHORIZED,
+                )
+
+            try:
+                webhook_data = json.load(body_file)
+            except ValueError:
+                return Response(
+                    "Invalid data: Request body must be a JSON object.",
+                    status=HTTPStatus.BAD_REQUEST,
+                )
+
+        if not isinstance(webhook_data, dict):
+            webhook_data = {}
+        with STAGE_DURATION.time(stage="validation"):
+            validator_result = validate_entity_data(
+                webhook_data.get("object")
+            )
+        if not validator_result.has_valid_data:
             return Response(
-                "Invalid signature on received data",
-                status=HTTPStatus.UNAUTHORIZED,
+                f"Invalid data: {validator_result.message}",
+                status=HTTPStatus.BAD_REQUEST,
             )
 
-        validator_result = validate_data(request)
+        # the request data is parsed into an entity once, the rest of the
+        # pipeline works with the entity only
+        request_profiler.attach(validator_result.entity)
+        try:
+            with STAGE_DURATION.time(stage="enqueue"):
+                update_future = update_queue.enqueue(validator_result.entity)
+        except BaseException:
+            # the profile is completed by the request thread on teardown
+            request_profiler.detach(validator_result.entity)
+            raise
+        # the request thread only waits for the update from here on
+        request_profiler.release()
+
+        # the update is processed asynchronously unless the sender prefers to
+        # wait for the combined result of the processors
+        wait_time = get_preferred_wait(request.headers.get("Prefer", ""))
+        if wait_time:
+            try:
+                update_result = update_future.result(timeout=wait_time)
+            except FutureTimeoutError:
+                pass
+            except Exception:
+                return Response(
+                    "Failed to process the update.",
+                    status=HTTPStatus.INTERNAL_SERVER_ERROR,
+                )
+            else:
+                response = jsonify(update_result.to_dict())
+                response.headers["Preference-Applied"] = f"wait={wait_time:g}"
+                return response
+
+        return Response("Webhook accepted.", status=HTTPStatus.ACCEPTED)
+
+    def enqueue_entity_batch(
+        entities: Iterator[Dict[str, Any]],
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        entity_results = []
+        pending_entities = []
+        parse_error = None
+
+        try:
+            for index, entity_data in enumerate(entities):
+                entity_result = {
+                    "index": index,
+                    "id_hash": entity_data.get("id_hash"),
+                }
+
+                validator_result = validate_entity_data(entity_data)
+                if validator_result.has_valid_data:
+                    entity_result["status"] = "accepted"
+                    pending_entities.append(validator_result.entity)
+                else:
+                    entity_result["status"] = "invalid"
+                    entity_result["message"] = validator_result.message
+                entity_results.append(entity_result)
+
+                if len(pending_entities) >= BATCH_ENQUEUE_SIZE:
+                    update_queue.enqueue_many(pending_entities)
+                    pending_entities = []
+        except StreamParseError as err:
+            parse_error = str(err)
+
+        # entities parsed before an error in the stream are still processed
+        if pending_entities:
+            update_queue.enqueue_many(pending_entities)
+
+        return entity_results, parse_error
+
+    @app.route("/remote-entity-update/batch", methods=["POST"])
+    def remote_entity_batch_update():
+        # the whole batch is covered by a single signature, so it must be
+        # verified before any of the entities is processed
+        with read_signed_body(max_batch_body_size) as body_file:
+            if not body_file:
+                return Response(
+                    "Invalid signature on received data",
+                    status=HTTPStatus.UNAUTHORIZED,
+                )
+
+            if request.mimetype == "application/x-ndjson":
+                entities = iter_ndjson_objects(body_file)
+            else:
+                entities = iter_json_array_objects(body_file)
+
+            entity_results, parse_error = enqueue_entity_batch(entities)
+
+        response_data = {
+            "accepted": sum(
+                entity_result["status"] == "accepted"
+                for entity_result in entity_results
+            ),
+            "invalid": sum(
+                entity_result["status"] == "invalid"
+                for entity_result in entity_results
+            ),
+            "results": entity_results,
+        }
+        if parse_error:
+            response_data["error"] = f"Invalid batch data: {parse_error}"
+
+        response = jsonify(response_data)
+        response.status = (
+            HTTPStatus.BAD_REQUEST if parse_error else HTTPStatus.ACCEPTED
+        )
+        return response
+
+    @app.route("/remote-entity-reconcile", methods=["POST"])
+    def remote_entity_reconcile():
+        # the manifest lists every entity of the backend, like a batch it
+        # is covered by a single signature
+        with read_signed_body(max_batch_body_size) as body_file:
+            if not body_file:
+                return Response(
+                    "Invalid signature on received data",
+                    status=HTTPStatus.UNAUTHORIZED,
+                )
+
+            try:
+                reconcile_data = json.load(body_file)
+            except ValueError:
+                reconcile_data = None
+
+        validator_result = validate_manifest_data(reconcile_data)
         if not validator_result.has_valid_data:
             return Response(
                 f"Invalid data: {validator_result.message}",
                 status=HTTPStatus.BAD_REQUEST,
             )
 
-        update_relevant_configurations(request)
+        manifest_diff = entity_registry.diff_manifest(
+            validator_result.manifest
+        )
+        # entities with an unchanged digest whose last update failed are
+        # regenerated from the data the connector has, the changed ones
+        # need their full payloads from the backend
+        if manifest_diff.failed_records:
+            update_queue.enqueue_many(
+                [
+                    RemoteEntity.from_data(entity_record.entity_data)
+                    for entity_record in manifest_diff.failed_records
+                ]
+            )
+
+        return jsonify(
+            {
+                "needed": sorted(manifest_diff.changed_id_hashes),
+                "regenerated": [
+                    entity_record.id_hash
+                    for entity_record in manifest_diff.failed_records
+                ],
+                "unlisted": sorted(manifest_diff.removed_id_hashes),
+            }
+        )
+
+    @app.route("/metrics", methods=["GET"])
+    def get_metrics():
+        return Response(
+            metrics.render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+    @app.route("/entities/<id_hash>", methods=["GET"])
+    def get_entity(id_hash: str):
+        entity_record = entity_registry.get(id_hash)
+        if not entity_record:
+            return Response(
+                f"Entity '{id_hash}' is not managed by the connector.",
+                status=HTTPStatus.NOT_FOUND,
+            )
+
+        response = jsonify(entity_record.to_public_dict())
+        response.set_etag(entity_record.etag)
+        return response.make_conditional(request)
+
+    @app.route("/entities", methods=["GET"])
+    def get_entities():
+        entity_type = request.args.get("entity_type")
+        processor = request.args.get("processor")
+
+        etag = entity_registry.get_listing_etag(entity_type, processor)
+        if etag in request.if_none_match:
+            response = Response(status=HTTPStatus.NOT_MODIFIED)
+            response.set_etag(etag)
+            return response
 
-        return Response("Webhook received.", status=HTTPStatus.OK)
+        entity_records = entity_registry.find(entity_type, processor)
+        response = jsonify(
+            [
+                entity_record.to_public_dict()
+                for entity_record in entity_records
+            ]
+        )
+        response.set_etag(etag)
+        return response
 
     return app
 
@@ -0,0 +1,153 @@
+import json
+import platform
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+
+class BenchmarkResult:
+    def __init__(self, name: str, operations: int, seconds: float):
+        self.name = name
+        self.operations = operations
+        self.seconds = seconds
+
+    @property
+    def operations_per_second(self) -> float:
+        return self.operations / self.seconds if self.seconds else 0.0
+
+    @property
+    def seconds_per_operation(self) -> float:
+        return self.seconds / self.operations
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<50} {self.operations_per_second:>14,.0f} ops/s "
+            f"({self.seconds_per_operation * 1e6:,.2f} us/op)"
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "operations": self.operations,
+            "seconds": self.seconds,
+        }
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "BenchmarkResult":
+        return BenchmarkResult(
+            data["name"], data["operations"], data["seconds"]
+        )
+
+
+class BenchmarkComparison:
+    def __init__(
+        self,
+        name: str,
+        baseline: BenchmarkResult,
+        current: BenchmarkResult,
+        threshold: float,
+    ):
+        self.name = name
+        self.baseline = baseline
+        self.current = current
+        self.threshold = threshold
+
+    @property
+    def change(self) -> float:
+        # relative change of the time per operation, positive is slower
+        return (
+            self.current.seconds_per_operation
+            / self.baseline.seconds_per_operation
+            - 1
+        )
+
+    @property
+    def is_regression(self) -> bool:
+        return self.change > self.threshold
+
+    def __str__(self) -> str:
+        comparison = (
+            f"{self.name:<50} "
+            f"{self.baseline.seconds_per_operation * 1e6:>12,.2f} us/op -> "
+            f"{self.current.seconds_per_operation * 1e6:>12,.2f} us/op "
+            f"{self.change:>+8.1%}"
+        )
+        return comparison + " REGRESSION" if self.is_regression else comparison
+
+
+def run_benchmark(
+    name: str,
+    benchmark_function: Callable[[], None],
+    operations: int,
+    repeat: int = 5,
+) -> BenchmarkResult:
+    # benchmark_function performs <operations> operations per call, the best
+    # of the repeated runs is reported to filter out scheduling noise
+    benchmark_function()
+
+    best_seconds = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        benchmark_function()
+        seconds = time.perf_counter() - start
+        if best_seconds is None or seconds < best_seconds:
+            best_seconds = seconds
+
+    return BenchmarkResult(name, operations, best_seconds)
+
+
+def save_results(
+    results_by_suite: Dict[str, List[BenchmarkResult]], file_path: str
+) -> None:
+    # the environment is saved with the results, comparing runs from
+    # different machines or interpreters is rarely meaningful
+    with open(file_path, "w", encoding="utf-8") as results_file:
+        json.dump(
+            {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "suites": {
+                    suite_name: [result.to_dict() for result in results]
+                    for suite_name, results in results_by_suite.items()
+                },
+            },
+            results_file,
+            indent=4,
+        )
+
+
+def load_results(file_path: str) -> Dict[str, List[BenchmarkResult]]:
+    with open(file_path, "r", encoding="utf-8") as results_file:
+        saved_results = json.load(results_file)
+
+    return {
+        suite_name: [BenchmarkResult.from_dict(result) for result in results]
+        for suite_name, results in saved_results["suites"].items()
+    }
+
+
+def compare_results(
+    baseline_results: Dict[str, List[BenchmarkResult]],
+    current_results: Dict[str, List[BenchmarkResult]],
+    threshold: float,
+) -> List[BenchmarkComparison]:
+    # benchmarks are matched by suite and name, benchmarks present in one of
+    # the runs only are not compared
+    comparisons = []
+    for suite_name, results in current_results.items():
+        baseline_by_name = {
+            result.name: result
+            for result in baseline_results.get(suite_name, [])
+        }
+        for result in results:
+            if result.name in baseline_by_name:
+                comparisons.append(
+                    BenchmarkComparison(
+                        f"{suite_name}: {result.name}",
+                        baseline_by_name[result.name],
+                        result,
+                        threshold,
+                    )
+                )
+    return comparisons
@@ -0,0 +1,222 @@
+import hmac
+import io
+import json
+import os
+import tempfile
+from hashlib import sha256
+from typing import List
+
+from dulwich import porcelain
+from dulwich.repo import Repo
+from werkzeug.test import EnvironBuilder
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from benchmarks.entity_generators import generate_entities, get_id_hash
+from config_processors.cpcl.cpcl_config_processor import CpclConfigProcessor
+from config_processors.processor_routing_index import ProcessorRoutingIndex
+from config_version_managers.config_serializers import CONFIG_SERIALIZERS
+from config_version_managers.git_config_version_manager import \
+    GitConfigVersionManager
+from entities.remote_entity import RemoteEntity
+from utils.data_validator import validate_data
+from utils.signature_validator import SignatureValidator
+
+WEBHOOK_SECRET = "benchmark-secret"
+WEBHOOK_TIMESTAMP = "1700000000"
+
+
+class RoutedProcessor:
+    # the routing index only reads the name and the filters of a processor
+    def __init__(self, name: str, observed_entity_filters):
+        self.name = name
+        self.observed_entity_filters = observed_entity_filters
+
+
+def get_signed_request(entity_data: dict):
+    body = json.dumps({"object": entity_data}).encode()
+    signature = hmac.new(
+        WEBHOOK_SECRET.encode(),
+        WEBHOOK_TIMESTAMP.encode() + b":" + body,
+        sha256,
+    ).hexdigest()
+    return EnvironBuilder(
+        method="POST",
+        data=body,
+        content_type="application/json",
+        headers={
+            "Django-Webhook-Signature-v1": signature,
+            "Django-Webhook-Request-Timestamp": WEBHOOK_TIMESTAMP,
+        },
+    ).get_request()
+
+
+def get_routed_processors(processor_count: int) -> List[RoutedProcessor]:
+    # a mix of the filter types seen in deployments with many processors
+    routed_processors = []
+    for i in range(processor_count):
+        match i % 4:
+            case 0:
+                entity_filters = [get_id_hash(i), get_id_hash(i + 1)]
+            case 1:
+                entity_filters = [{"id_hash_prefix": get_id_hash(i)[:4]}]
+            case 2:
+                entity_filters = [{"entity_type": "OIDC_RP"}]
+            case _:
+                entity_filters = None
+        routed_processors.append(
+            RoutedProcessor(f"processor_{i}", entity_filters)
+        )
+    return routed_processors
+
+
+def init_remote_repo(remote_path: str) -> None:
+    # the remote needs an initial commit to be cloneable with a HEAD
+    seed_path = remote_path + "_seed"
+    seed_repo = Repo.init(seed_path, mkdir=True)
+    with open(os.path.join(seed_path, "README"), "w") as readme:
+        readme.write("configs")
+    porcelain.add(seed_repo, paths=[os.path.join(seed_path, "README")])
+    porcelain.commit(
+        seed_repo, message=b"init", committer=b"Seed <seed@mail.com>"
+    )
+    porcelain.clone(seed_path, remote_path, bare=True, errstream=io.BytesIO())
+
+
+def run(
+    entity_count: int = 1000,
+    processor_count: int = 200,
+    git_save_count: int = 20,
+) -> List[BenchmarkResult]:
+    entities_data = generate_entities(entity_count)
+    entities = [
+        RemoteEntity.from_data(entity_data) for entity_data in entities_data
+    ]
+    benchmark_results = []
+
+    # a request is parsed once, later reads of the JSON body are cached
+    requests = [
+        get_signed_request(entity_data) for entity_data in entities_data
+    ]
+    benchmark_results.append(
+        run_benchmark(
+            "validate_data",
+            lambda: [validate_data(request) for request in requests],
+            entity_count,
+        )
+    )
+
+    signature_validator = SignatureValidator(
+        {"shared_settings": {"webhook_secret": WEBHOOK_SECRET}}
+    )
+    benchmark_results.append(
+        run_benchmark(
+            "SignatureValidator.has_valid_signature",
+            lambda: [
+                signature_validator.has_valid_signature(request)
+                for request in requests
+            ],
+            entity_count,
+        )
+    )
+
+    routing_index = ProcessorRoutingIndex(
+        get_routed_processors(processor_count)
+    )
+    benchmark_results.append(
+        run_benchmark(
+            f"processor routing, {processor_count} processors",
+            lambda: [
+                routing_index.get_relevant_processors(entity)
+                for entity in entities
+            ],
+            entity_count,
+        )
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cpcl_config_processor = CpclConfigProcessor(
+            {
+                "name": "cpcl_benchmark",
+                "type": "CPCL",
+                "version_manager": {
+                    "type": "LOCAL",
+                    "config_folder_path": tmp_dir,
+                    "config_file_name": "cpcl",
+                    "config_file_format": "JSON",
+                },
+            }
+        )
+        benchmark_results.append(
+            run_benchmark(
+                "CpclConfigProcessor.prepare_configuration",
+                lambda: [
+                    cpcl_config_processor.prepare_configuration(entity)
+                    for entity in entities
+                ],
+                entity_count,
+            )
+        )
+
+    configs = [
+        cpcl_config_processor.prepare_configuration(entity)
+        for entity in entities
+    ]
+    for config_file_format, config_serializer in CONFIG_SERIALIZERS.items():
+        benchmark_results.append(
+            run_benchmark(
+                f"serializer: {config_file_format.name}",
+                lambda: [config_serializer(config) for config in configs],
+                entity_count,
+            )
+        )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        remote_path = os.path.join(tmp_dir, "remote.git")
+        local_path = os.path.join(tmp_dir, "local")
+        init_remote_repo(remote_path)
+        # cloned here so that the progress of dulwich does not mix into the
+        # report, the version manager opens the existing clone
+        porcelain.clone(remote_path, local_path, errstream=io.BytesIO())
+        version_manager = GitConfigVersionManager(
+            {
+                "git_repo": remote_path,
+                "git_repo_folder_path": local_path,
+                "git_branch_name": "configs",
+                "committer": "Benchmark <benchmark@mail.com>",
+                "config_file_name": "cpcl",
+                "config_file_format": "JSON",
+            }
+        )
+        # the repository is opened before the measurement
+        version_manager.get_repo()
+
+        # every save changes the config, unchanged configs are not committed
+        # - the warm-up run and the repeated runs use the next revisions
+        saved_configs = iter(
+            [
+                {"revision": i, "config": configs[i % entity_count]}
+                for i in range(git_save_count * 4)
+            ]
+        )
+
+        def save_to_git():
+            for entity in entities[:git_save_count]:
+                version_manager.begin_update(entity)
+                version_manager.save_configuration(next(saved_configs), entity)
+                version_manager.end_update(entity)
+
+        benchmark_results.append(
+            run_benchmark(
+                "GitConfigVersionManager.save_configuration, commit + push",
+                save_to_git,
+                git_save_count,
+                repeat=3,
+            )
+        )
+
+    return benchmark_results
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
@@ -0,0 +1,56 @@
+import random
+from hashlib import sha256
+from typing import Any, Dict, List, Sequence
+
+ENTITY_TYPES = ("SAML_SP", "SAML_IDP", "OIDC_RP", "OIDC_OP")
+
+
+def get_id_hash(index: int) -> str:
+    return sha256(f"entity-{index}".encode()).hexdigest()
+
+
+def generate_entity_data(
+    index: int, entity_type: str, description_length: int = 40
+) -> Dict[str, Any]:
+    # webhook data of a valid entity, the same index always gives the same
+    # entity so that runs are comparable
+    host = f"entity{index}.example.org"
+    entity_data = {
+        "id_hash": get_id_hash(index),
+        "entity_type": entity_type,
+        "name": f"Entity {index}",
+        "description": ("description " * description_length)[
+            :description_length
+        ],
+        "is_active": True,
+    }
+    match entity_type:
+        case "SAML_SP" | "SAML_IDP":
+            entity_data["entity_id"] = f"https://{host}/shibboleth"
+            entity_data["metadata_url"] = f"https://{host}/metadata"
+        case "OIDC_RP":
+            entity_data["client_id"] = f"client-{index}"
+            entity_data["client_secret"] = f"secret-{index}"
+            entity_data["redirect_uri"] = f"https://{host}/redirect"
+        case "OIDC_OP":
+            entity_data["client_id"] = f"client-{index}"
+            entity_data["discovery_url"] = (
+                f"https://{host}/.well-known/openid-configuration"
+            )
+    return entity_data
+
+
+def generate_entities(
+    count: int,
+    entity_types: Sequence[str] = ENTITY_TYPES,
+    description_length: int = 40,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    # entity types are mixed in a seeded random order
+    type_random = random.Random(seed)
+    return [
+        generate_entity_data(
+            index, type_random.choice(entity_types), description_length
+        )
+        for index in range(count)
+    ]
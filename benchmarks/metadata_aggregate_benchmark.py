@@ -0,0 +1,110 @@
+import random
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from utils.metadata_aggregate import (build_aggregate_index,
+                                      get_entity_descriptor, get_index_path)
+from utils.metadata_fetcher import MetadataDocument
+
+MD = "urn:oasis:names:tc:SAML:2.0:metadata"
+MDUI = "urn:oasis:names:tc:SAML:metadata:ui"
+
+
+def get_entity_id(index: int) -> str:
+    return f"https://sp-{index}.example.com/shibboleth"
+
+
+def write_aggregate(aggregate_path: Path, entity_count: int) -> None:
+    # an eduGAIN-like aggregate of service providers with a certificate and
+    # UI info, about 2.5 KB per entity
+    certificate = "MIIDdzCCAl+gAwIBAgIJAK" * 50
+    with open(aggregate_path, "w", encoding="utf-8") as aggregate_file:
+        aggregate_file.write(
+            f'<md:EntitiesDescriptor xmlns:md="{MD}" '
+            f'xmlns:mdui="{MDUI}" '
+            'xmlns:ds="http://www.w3.org/2000/09/xmldsig#">\n'
+        )
+        for i in range(entity_count):
+            aggregate_file.write(
+                f'<md:EntityDescriptor entityID="{get_entity_id(i)}">'
+                f'<md:SPSSODescriptor protocolSupportEnumeration="{MD}">'
+                "<md:Extensions><mdui:UIInfo>"
+                f'<mdui:DisplayName xml:lang="en">Service {i}'
+                "</mdui:DisplayName>"
+                "</mdui:UIInfo></md:Extensions>"
+                '<md:KeyDescriptor use="signing"><ds:KeyInfo><ds:X509Data>'
+                f"<ds:X509Certificate>{certificate}</ds:X509Certificate>"
+                "</ds:X509Data></ds:KeyInfo></md:KeyDescriptor>"
+                "<md:AssertionConsumerService "
+                'Binding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST" '
+                f'Location="https://sp-{i}.example.com/acs" index="1"/>'
+                "</md:SPSSODescriptor></md:EntityDescriptor>\n"
+            )
+        aggregate_file.write("</md:EntitiesDescriptor>\n")
+
+
+def run(
+    entity_count: int = 20000, lookup_count: int = 1000
+) -> List[BenchmarkResult]:
+    random.seed(0)
+    entity_ids = [
+        get_entity_id(random.randrange(entity_count))
+        for _ in range(lookup_count)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        aggregate_path = Path(tmp_dir, "aggregate.body")
+        write_aggregate(aggregate_path, entity_count)
+        document = MetadataDocument(
+            "https://fed.example.com/metadata",
+            None,
+            None,
+            0,
+            0,
+            aggregate_path.stat().st_size,
+            content_path=aggregate_path,
+        )
+
+        def build_index():
+            with open(aggregate_path, "rb") as source:
+                build_aggregate_index(source, get_index_path(aggregate_path))
+
+        def look_up_with_index():
+            for entity_id in entity_ids:
+                get_entity_descriptor(document, entity_id)
+
+        # a lookup that loads the whole aggregate, as done without the index
+        def look_up_with_element_tree():
+            for entity_id in entity_ids[:5]:
+                ET.parse(aggregate_path).find(
+                    f"{{{MD}}}EntityDescriptor[@entityID='{entity_id}']"
+                )
+
+        return [
+            run_benchmark(
+                f"metadata aggregate: index build, {entity_count} entities",
+                build_index,
+                1,
+                repeat=3,
+            ),
+            run_benchmark(
+                f"metadata aggregate: indexed lookup, {entity_count} entities",
+                look_up_with_index,
+                lookup_count,
+            ),
+            run_benchmark(
+                "metadata aggregate: ElementTree lookup, "
+                f"{entity_count} entities",
+                look_up_with_element_tree,
+                5,
+                repeat=3,
+            ),
+        ]
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
@@ -0,0 +1,38 @@
+from typing import List
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from utils.metrics import MetricsRegistry
+
+
+def run(operations: int = 100000) -> List[BenchmarkResult]:
+    # the instrumentation cost added to every stage of an update
+    registry = MetricsRegistry()
+    counter = registry.counter("updates_total", "Updates", ("status",))
+    histogram = registry.histogram("stage_seconds", "Stages", ("stage",))
+
+    def time_stage():
+        for _ in range(operations):
+            with histogram.time(stage="validation"):
+                pass
+
+    return [
+        run_benchmark(
+            "counter inc",
+            lambda: [counter.inc(status="updated") for _ in range(operations)],
+            operations,
+        ),
+        run_benchmark(
+            "histogram observe",
+            lambda: [
+                histogram.observe(0.003, stage="validation")
+                for _ in range(operations)
+            ],
+            operations,
+        ),
+        run_benchmark("histogram time", time_stage, operations),
+    ]
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
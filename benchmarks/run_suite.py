@@ -0,0 +1,91 @@
+import argparse
+import sys
+from typing import Callable, Dict, List
+
+from benchmarks import (component_benchmark, metadata_aggregate_benchmark,
+                        metrics_benchmark, satosa_benchmark,
+                        serializer_benchmark, validation_benchmark,
+                        write_durability_benchmark)
+from benchmarks.benchmark_utils import (BenchmarkResult, compare_results,
+                                        load_results, save_results)
+
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+BENCHMARK_SUITES: Dict[str, Callable[[], List[BenchmarkResult]]] = {
+    "component": component_benchmark.run,
+    "validation": validation_benchmark.run,
+    "serializer": serializer_benchmark.run,
+    "satosa": satosa_benchmark.run,
+    "write_durability": write_durability_benchmark.run,
+    "metrics": metrics_benchmark.run,
+    "metadata_aggregate": metadata_aggregate_benchmark.run,
+}
+
+
+def run_suites(suite_names: List[str]) -> Dict[str, List[BenchmarkResult]]:
+    results_by_suite = {}
+    for suite_name in suite_names:
+        print(f"# {suite_name}")
+        results_by_suite[suite_name] = BENCHMARK_SUITES[suite_name]()
+        for benchmark_result in results_by_suite[suite_name]:
+            print(benchmark_result)
+    return results_by_suite
+
+
+def compare(
+    baseline_file_path: str, current_file_path: str, threshold: float
+) -> int:
+    comparisons = compare_results(
+        load_results(baseline_file_path),
+        load_results(current_file_path),
+        threshold,
+    )
+    for comparison in comparisons:
+        print(comparison)
+
+    regression_count = sum(
+        1 for comparison in comparisons if comparison.is_regression
+    )
+    print(
+        f"{regression_count} of {len(comparisons)} benchmarks regressed by "
+        f"more than {threshold:.0%}"
+    )
+    return 1 if regression_count else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Run the benchmark suites or compare two saved runs."
+    )
+    parser.add_argument(
+        "--suite",
+        action="append",
+        choices=list(BENCHMARK_SUITES),
+        help="suite to run, all suites are run by default",
+    )
+    parser.add_argument("--output", help="JSON file the results are saved to")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASELINE", "CURRENT"),
+        help="compare two saved runs instead of running the suites",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_REGRESSION_THRESHOLD,
+        help="relative slowdown reported as a regression (default: 0.1)",
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+
+    results_by_suite = run_suites(args.suite or list(BENCHMARK_SUITES))
+    if args.output:
+        save_results(results_by_suite, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
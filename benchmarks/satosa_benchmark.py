@@ -0,0 +1,111 @@
+import copy
+import os
+import tempfile
+from typing import Any, Dict, List
+
+import yaml
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from benchmarks.entity_generators import generate_entities
+from config_processors.satosa.satosa_config_processor import (
+    BASE_CONFIG_TEMPLATE_NAMES, BASE_CONFIG_TEMPLATES_FOLDER_PATH,
+    SatosaConfigProcessor)
+from entities.remote_entity import RemoteEntity
+
+
+class OverlayRecordingProcessor(SatosaConfigProcessor):
+    # returns the overlay of an entity instead of the rendered config
+    def render_config(self, entity, overlay):
+        return {"name": self.get_module_name(entity), **overlay}
+
+
+def merge_overlay(config: Dict[str, Any], overlay: Dict[str, Any]) -> None:
+    # in-place merge of the overlay into a private copy of a template
+    for key, value in overlay.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            merge_overlay(config[key], value)
+        else:
+            config[key] = value
+
+
+def get_template_path(entity: RemoteEntity) -> str:
+    return os.path.join(
+        BASE_CONFIG_TEMPLATES_FOLDER_PATH,
+        BASE_CONFIG_TEMPLATE_NAMES[entity.entity_type],
+    )
+
+
+def run(entity_count: int = 5000) -> List[BenchmarkResult]:
+    entities = [
+        RemoteEntity.from_data(entity_data)
+        for entity_data in generate_entities(entity_count)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        processor_cfg = {
+            "name": "satosa_benchmark",
+            "type": "SATOSA",
+            "version_manager": {
+                "type": "LOCAL",
+                "config_folder_path": tmp_dir,
+                "config_file_name": "satosa",
+                "config_file_format": "YAML",
+            },
+        }
+        config_processor = SatosaConfigProcessor(processor_cfg)
+        overlay_recording_processor = OverlayRecordingProcessor(processor_cfg)
+
+    # the same overlays applied the ways used before the templates were
+    # parsed once - to a template read from disk and to a deep copy
+    overlays = [
+        overlay_recording_processor.prepare_configuration(entity)
+        for entity in entities
+    ]
+    template_configs = {}
+    for entity in entities:
+        if entity.entity_type not in template_configs:
+            with open(get_template_path(entity)) as template_file:
+                template_configs[entity.entity_type] = yaml.safe_load(
+                    template_file
+                )
+
+    def render_with_yaml_reload():
+        for entity, overlay in zip(entities, overlays):
+            with open(get_template_path(entity)) as template_file:
+                config = yaml.safe_load(template_file)
+            merge_overlay(config, overlay)
+
+    def render_with_deep_copy():
+        for entity, overlay in zip(entities, overlays):
+            config = copy.deepcopy(template_configs[entity.entity_type])
+            merge_overlay(config, overlay)
+
+    def render_with_overlay():
+        for entity in entities:
+            config_processor.prepare_configuration(entity)
+
+    return [
+        run_benchmark(
+            f"satosa: YAML reload + merge, {entity_count} entities",
+            render_with_yaml_reload,
+            entity_count,
+            repeat=3,
+        ),
+        run_benchmark(
+            f"satosa: deep copy + merge, {entity_count} entities",
+            render_with_deep_copy,
+            entity_count,
+            repeat=3,
+        ),
+        run_benchmark(
+            f"satosa: frozen template overlay, {entity_count} entities",
+            render_with_overlay,
+            entity_count,
+            repeat=3,
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
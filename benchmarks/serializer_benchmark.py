@@ -0,0 +1,80 @@
+import copy
+import glob
+import os
+from typing import Any, Dict, List
+
+import yaml
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from config_version_managers.config_serializers import (
+    serialize_config_json_orjson, serialize_config_json_stdlib,
+    serialize_config_yaml_libyaml, serialize_config_yaml_pure)
+
+TEMPLATE_FOLDER_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "config_processors",
+    "satosa",
+    "base_config_templates",
+)
+
+
+def get_satosa_like_config(entity_count: int) -> Dict[str, Any]:
+    # one copy of a SATOSA base template per entity, the size of a proxy
+    # config that serves <entity_count> entities - the copies are independent
+    # objects so that YAML does not write them as aliases
+    template_configs = []
+    for template_path in sorted(
+        glob.glob(os.path.join(TEMPLATE_FOLDER_PATH, "**", "*.yaml"))
+    ):
+        with open(template_path) as template_file:
+            template_configs.append(yaml.safe_load(template_file))
+
+    return {
+        f"entity_{i}": copy.deepcopy(
+            template_configs[i % len(template_configs)]
+        )
+        for i in range(entity_count)
+    }
+
+
+def run(entity_counts=(10, 100, 1000)) -> List[BenchmarkResult]:
+    serializers = [
+        ("json: stdlib", serialize_config_json_stdlib),
+        ("yaml: pure-Python emitter", serialize_config_yaml_pure),
+    ]
+    try:
+        import orjson  # noqa: F401
+
+        serializers.append(("json: orjson", serialize_config_json_orjson))
+    except ImportError:
+        pass
+    if serialize_config_yaml_libyaml:
+        serializers.append(
+            ("yaml: libyaml emitter", serialize_config_yaml_libyaml)
+        )
+
+    benchmark_results = []
+    for entity_count in entity_counts:
+        config = get_satosa_like_config(entity_count)
+        config_size = len(serialize_config_json_stdlib(config))
+        # roughly the same amount of serialized data for every size
+        operations = max(1, 2_000_000 // config_size)
+
+        for serializer_name, serializer in serializers:
+            benchmark_results.append(
+                run_benchmark(
+                    f"{serializer_name}, {entity_count} entities "
+                    f"({config_size // 1024} KiB)",
+                    lambda: [serializer(config) for _ in range(operations)],
+                    operations,
+                    repeat=3,
+                )
+            )
+
+    return benchmark_results
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
@@ -0,0 +1,84 @@
+from typing import Any, Dict, List
+
+from marshmallow import ValidationError
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from utils.data_validator import (BaseSchema, OidcOpSchema, OidcRpSchema,
+                                  SamlSchema, validate_entity_data)
+
+FIRST_ID_HASH = (
+    "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9"
+)
+SECOND_ID_HASH = (
+    "ee17d43ddcbf50090b137e83569dea155a5916e212f5d760c223b76ae8ed2de2"
+)
+
+PAYLOADS = [
+    {
+        "name": "example name",
+        "description": "example desc",
+        "entity_type": "SAML_SP",
+        "entity_id": "https://sp.example.com/shibboleth",
+        "metadata_url": "https://sp.example.com/metadata",
+        "id_hash": FIRST_ID_HASH,
+    },
+    {
+        "entity_type": "OIDC_RP",
+        "client_id": "client",
+        "client_secret": "secret",
+        "redirect_uri": "https://rp.example.com/redirect",
+        "id_hash": SECOND_ID_HASH,
+    },
+    {
+        "entity_type": "OIDC_OP",
+        "client_id": "client",
+        "discovery_url": "https://op.example.com/.well-known/openid-config",
+        "id_hash": SECOND_ID_HASH,
+    },
+]
+
+
+def validate_entity_data_two_pass(data: Dict[str, Any]) -> bool:
+    # validation as it was done before the schemas were cached - a base
+    # schema pass followed by a type-specific pass with new schema instances
+    try:
+        result = BaseSchema().load(data)
+        match result.get("entity_type"):
+            case "SAML_SP" | "SAML_IDP":
+                SamlSchema().load(data)
+            case "OIDC_RP":
+                OidcRpSchema().load(data)
+            case "OIDC_OP":
+                OidcOpSchema().load(data)
+    except ValidationError:
+        return False
+
+    return True
+
+
+def run(payload_count: int = 3000) -> List[BenchmarkResult]:
+    payloads = [PAYLOADS[i % len(PAYLOADS)] for i in range(payload_count)]
+
+    def run_two_pass():
+        for payload in payloads:
+            validate_entity_data_two_pass(payload)
+
+    def run_single_pass():
+        for payload in payloads:
+            validate_entity_data(payload)
+
+    return [
+        run_benchmark(
+            "validation: two-pass, new schemas", run_two_pass, payload_count
+        ),
+        run_benchmark(
+            "validation: single-pass, cached schemas",
+            run_single_pass,
+            payload_count,
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
@@ -0,0 +1,86 @@
+import os
+import tempfile
+from typing import List
+
+from benchmarks.benchmark_utils import BenchmarkResult, run_benchmark
+from config_version_managers.local_config_version_manager import \
+    LocalConfigVersionManager
+from entities.remote_entity import RemoteEntity
+from enums.write_durability import WriteDurability
+
+ENTITY = RemoteEntity.from_data(
+    {
+        "entity_type": "SAML_SP",
+        "id_hash":
+            "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9",
+    }
+)
+
+
+def write_in_place(file_path: str, serialized_config: bytes) -> None:
+    # the write as it was done before the atomic writes
+    with open(file_path, "wb") as config_file:
+        config_file.write(serialized_config)
+
+
+def run(
+    write_count: int = 200,
+    updates_per_batch: int = 10,
+    config_size: int = 32 * 1024,
+) -> List[BenchmarkResult]:
+    serialized_config = b"x" * config_size
+    benchmark_results = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_paths = [
+            os.path.join(tmp_dir, f"cfg_{i}.yaml") for i in range(10)
+        ]
+
+        def run_in_place():
+            for i in range(write_count):
+                write_in_place(
+                    file_paths[i % len(file_paths)], serialized_config
+                )
+
+        benchmark_results.append(
+            run_benchmark(
+                "write: in place, no fsync", run_in_place, write_count, 3
+            )
+        )
+
+        for write_durability in WriteDurability:
+            version_manager = LocalConfigVersionManager(
+                {
+                    "config_folder_path": tmp_dir,
+                    "config_file_name": "cfg",
+                    "config_file_format": "YAML",
+                    "write_durability": write_durability.name,
+                }
+            )
+
+            # the writes of <updates_per_batch> updates form one batch
+            def run_atomic():
+                for i in range(write_count):
+                    if i % updates_per_batch == 0:
+                        version_manager.begin_update(ENTITY)
+                    version_manager.write_config_file(
+                        file_paths[i % len(file_paths)], serialized_config
+                    )
+                    if i % updates_per_batch == updates_per_batch - 1:
+                        version_manager.end_update(ENTITY)
+
+            benchmark_results.append(
+                run_benchmark(
+                    f"write: atomic, {write_durability.name} durability",
+                    run_atomic,
+                    write_count,
+                    3,
+                )
+            )
+
+    return benchmark_results
+
+
+if __name__ == "__main__":
+    for benchmark_result in run():
+        print(benchmark_result)
@@ -1,15 +1,30 @@
 from abc import ABC, abstractmethod
-from typing import Any
-
-from flask import Request
+from typing import Any, Optional
 
 from config_version_managers.config_version_manager_initializer import \
     ConfigVersionManagerInitializer
+from entities.remote_entity import RemoteEntity, SamlEntity
+from utils.metadata_aggregate import get_entity_descriptor
+from utils.metadata_fetcher import MetadataFetcher, metadata_fetchers
+from utils.metrics import metrics
+
+PREPARE_DURATION = metrics.histogram(
+    "config_prepare_duration_seconds",
+    "Time spent in prepare_configuration of the config processors",
+    ("processor_type",),
+)
 
 
 class ConfigProcessor(ABC):
     def __init__(self, config):
+        self.name = config.get("name")
+        self.type = config.get("type")
         self.observed_entity_filters = config.get("filters")
+        # seconds the update may take, the executor default is used if None
+        self.timeout = config.get("timeout")
+        self.__METADATA_FETCHER_CFG = config.get(
+            "metadata_fetcher_settings", {}
+        )
         config_version_manager_cfg = config.get("version_manager", {})
         config_version_manager_initializer = ConfigVersionManagerInitializer(
             config_version_manager_cfg
@@ -18,13 +33,33 @@ class ConfigProcessor(ABC):
             config_version_manager_initializer.get_config_version_manager()
         )
 
-    def save_configuration(self, config: dict[str, Any]) -> None:
-        self.__CONFIG_VERSION_MANAGER.save_configuration(config)
+    def get_metadata_fetcher(self) -> MetadataFetcher:
+        # SAML metadata and OIDC discovery documents of the entities are
+        # fetched through a cache shared by the processors
+        return metadata_fetchers.get_fetcher(self.__METADATA_FETCHER_CFG)
+
+    def get_entity_descriptor(self, entity: SamlEntity) -> Optional[bytes]:
+        # the metadata URL of an entity may point to a whole federation
+        # aggregate, only the EntityDescriptor of the entity is read from it
+        document = self.get_metadata_fetcher().fetch(entity.metadata_url)
+        return get_entity_descriptor(document, entity.entity_id)
+
+    def save_configuration(
+        self, config: dict[str, Any], entity: RemoteEntity = None
+    ) -> None:
+        self.__CONFIG_VERSION_MANAGER.save_configuration(config, entity)
+
+    def begin_update(self, entity: RemoteEntity) -> None:
+        self.__CONFIG_VERSION_MANAGER.begin_update(entity)
+
+    def end_update(self, entity: RemoteEntity) -> None:
+        self.__CONFIG_VERSION_MANAGER.end_update(entity)
 
     @abstractmethod
-    def prepare_configuration(self, request: Request) -> dict[str, Any]:
+    def prepare_configuration(self, entity: RemoteEntity) -> dict[str, Any]:
         pass
 
-    def update_configuration(self, request: Request) -> None:
-        config = self.prepare_configuration(request)
-        self.save_configuration(config)
+    def update_configuration(self, entity: RemoteEntity) -> None:
+        with PREPARE_DURATION.time(processor_type=self.type):
+            config = self.prepare_configuration(entity)
+        self.save_configuration(config, entity)
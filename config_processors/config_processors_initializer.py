@@ -2,6 +2,7 @@ from typing import List
 
 from config_processors.config_processor import ConfigProcessor
 from config_processors.cpcl.cpcl_config_processor import CpclConfigProcessor
+from config_processors.processor_routing_index import ProcessorRoutingIndex
 from config_processors.satosa.satosa_config_processor import \
     SatosaConfigProcessor
 from enums.config_processor_type import ConfigProcessorType
@@ -18,7 +19,7 @@ class ConfigProcessorsInitializer:
         )
 
         configured_processors = []
-        for cfg_values in processor_specific_settings.values():
+        for processor_name, cfg_values in processor_specific_settings.items():
             try:
                 processor_type_in_cfg = cfg_values.get("type")
                 processor_type = ConfigProcessorType[processor_type_in_cfg]
@@ -30,7 +31,11 @@ class ConfigProcessorsInitializer:
                     f"{', '.join([e.name for e in ConfigProcessorType])}"
                 )
 
-            processor_specific_config = {**shared_settings, **cfg_values}
+            processor_specific_config = {
+                **shared_settings,
+                **cfg_values,
+                "name": processor_name,
+            }
             match processor_type:
                 case ConfigProcessorType.CPCL:
                     configured_processors.append(
@@ -42,3 +47,8 @@ class ConfigProcessorsInitializer:
                     )
 
         return configured_processors
+
+    def get_routing_index(
+        self, config_processors: List[ConfigProcessor]
+    ) -> ProcessorRoutingIndex:
+        return ProcessorRoutingIndex(config_processors)
@@ -0,0 +1,96 @@
+from typing import Dict, List
+
+from config_processors.config_processor import ConfigProcessor
+from entities.remote_entity import RemoteEntity
+from enums.entity_filter_type import EntityFilterType
+from enums.entity_type import EntityType
+
+
+class ProcessorRoutingIndex:
+    def __init__(self, config_processors: List[ConfigProcessor]):
+        self.__CONFIG_PROCESSORS = config_processors
+
+        # processors are referenced by their position in the configuration
+        # so that routing results keep the configured order
+        self.__UNFILTERED_PROCESSORS: List[int] = []
+        self.__PROCESSORS_BY_ID_HASH: Dict[str, List[int]] = {}
+        self.__PROCESSORS_BY_ID_HASH_PREFIX: Dict[str, List[int]] = {}
+        self.__PROCESSORS_BY_ENTITY_TYPE: Dict[str, List[int]] = {}
+
+        for position, config_processor in enumerate(config_processors):
+            self.__index_processor(position, config_processor)
+
+        self.__ID_HASH_PREFIX_LENGTHS = sorted(
+            {len(prefix) for prefix in self.__PROCESSORS_BY_ID_HASH_PREFIX}
+        )
+
+    def __index_processor(
+        self, position: int, config_processor: ConfigProcessor
+    ) -> None:
+        observed_entity_filters = config_processor.observed_entity_filters
+        # special case where no entity filters are configured ->
+        # config_processor is relevant for all entities
+        if not observed_entity_filters:
+            self.__UNFILTERED_PROCESSORS.append(position)
+            return
+
+        for entity_filter in observed_entity_filters:
+            # plain values are id_hash filters
+            if not isinstance(entity_filter, dict):
+                entity_filter = {EntityFilterType.ID_HASH.value: entity_filter}
+
+            for filter_type_in_cfg, filter_value in entity_filter.items():
+                try:
+                    filter_type = EntityFilterType(filter_type_in_cfg)
+                except ValueError:
+                    raise ValueError(
+                        f"Invalid entity filter '{filter_type_in_cfg}' in "
+                        f"configuration of processor "
+                        f"'{config_processor.name}'. "
+                        f"Allowed values are: "
+                        f"{', '.join([e.value for e in EntityFilterType])}"
+                    )
+
+                match filter_type:
+                    case EntityFilterType.ID_HASH:
+                        index = self.__PROCESSORS_BY_ID_HASH
+                    case EntityFilterType.ID_HASH_PREFIX:
+                        index = self.__PROCESSORS_BY_ID_HASH_PREFIX
+                    case EntityFilterType.ENTITY_TYPE:
+                        if filter_value not in EntityType.__members__:
+                            raise ValueError(
+                                f"Invalid entity type '{filter_value}' in "
+                                f"filters of processor "
+                                f"'{config_processor.name}'. "
+                                f"Allowed values are: "
+                                f"{', '.join([e.name for e in EntityType])}"
+                            )
+                        index = self.__PROCESSORS_BY_ENTITY_TYPE
+
+                positions = index.setdefault(str(filter_value), [])
+                if position not in positions:
+                    positions.append(position)
+
+    def get_relevant_processors(
+        self, entity: RemoteEntity
+    ) -> List[ConfigProcessor]:
+        id_hash = str(entity.id_hash)
+        entity_type = entity.entity_type
+        relevant_positions = set(self.__UNFILTERED_PROCESSORS)
+        relevant_positions.update(
+            self.__PROCESSORS_BY_ID_HASH.get(id_hash, ())
+        )
+        relevant_positions.update(
+            self.__PROCESSORS_BY_ENTITY_TYPE.get(entity_type, ())
+        )
+        for prefix_length in self.__ID_HASH_PREFIX_LENGTHS:
+            relevant_positions.update(
+                self.__PROCESSORS_BY_ID_HASH_PREFIX.get(
+                    id_hash[:prefix_length], ()
+                )
+            )
+
+        return [
+            self.__CONFIG_PROCESSORS[position]
+            for position in sorted(relevant_positions)
+        ]
@@ -1,40 +1,168 @@
-from typing import Any
+import os
+from functools import lru_cache
+from typing import Any, Dict
 
-from flask import Request
+import yaml
 
 from config_processors.config_processor import ConfigProcessor
+from entities.remote_entity import (OidcOpEntity, OidcRpEntity, RemoteEntity,
+                                    SamlEntity)
+from utils.frozen_config import FrozenDict, apply_overlay, freeze
+
+BASE_CONFIG_TEMPLATES_FOLDER_PATH = os.path.join(
+    os.path.dirname(__file__), "base_config_templates"
+)
+# the proxy plays the counterpart of the remote entity - a remote SP is
+# connected to the SAML IdP frontend, a remote IdP to the SAML SP backend etc.
+BASE_CONFIG_TEMPLATE_NAMES = {
+    "SAML_SP": os.path.join("frontends", "saml_idp.yaml"),
+    "SAML_IDP": os.path.join("backends", "saml_sp.yaml"),
+    "OIDC_RP": os.path.join("frontends", "oidc_op.yaml"),
+    "OIDC_OP": os.path.join("backends", "oidc_rp.yaml"),
+}
+OIDC_DISCOVERY_PATH = "/.well-known/openid-configuration"
+
+
+@lru_cache(maxsize=None)
+def load_base_config_template(template_path: str) -> FrozenDict:
+    # every template is parsed once per process, the rendered configs share
+    # all values they do not override with the template
+    with open(template_path, "r", encoding="utf-8") as template_file:
+        return freeze(yaml.safe_load(template_file))
+
+
+def get_remote_metadata(entity: SamlEntity) -> FrozenDict:
+    # frozen so that it replaces the metadata sources of the template
+    return freeze({"remote": [{"url": entity.metadata_url}]})
+
+
+def get_ui_info(entity: RemoteEntity) -> Dict[str, Any]:
+    return {
+        "display_name": [{"lang": "en", "text": entity.name}],
+        "description": [{"lang": "en", "text": entity.description}],
+    }
+
+
+def get_oidc_ui_info(entity: OidcOpEntity) -> Dict[str, Any]:
+    # the entity info of the OIDC backend lists the values as [text, lang]
+    return {
+        "display_name": [[entity.name, "en"]],
+        "description": [[entity.description, "en"]],
+    }
 
 
 class SatosaConfigProcessor(ConfigProcessor):
     def __init__(self, config):
         super().__init__(config)
+        base_config_templates_folder_path = config.get(
+            "base_config_templates_folder_path",
+            BASE_CONFIG_TEMPLATES_FOLDER_PATH,
+        )
+        # templates are loaded on startup so that a missing or broken
+        # template is found before the first update
+        self.__BASE_CONFIG_TEMPLATES = {
+            entity_type: load_base_config_template(
+                os.path.join(base_config_templates_folder_path, template_name)
+            )
+            for entity_type, template_name in (
+                BASE_CONFIG_TEMPLATE_NAMES.items()
+            )
+        }
+
+    def get_module_name(self, entity: RemoteEntity) -> str:
+        base_config_template = self.__BASE_CONFIG_TEMPLATES[entity.entity_type]
+        return f"{base_config_template['name']}_{entity.id_hash[:16]}"
 
-    # TODO - make actual configs for SATOSA
-    def get_satosa_saml_sp_cfg(self, remote_entity_data):
-        pass
+    def render_config(
+        self, entity: RemoteEntity, overlay: Dict[str, Any]
+    ) -> FrozenDict:
+        return apply_overlay(
+            self.__BASE_CONFIG_TEMPLATES[entity.entity_type],
+            {"name": self.get_module_name(entity), **overlay},
+        )
 
-    def get_satosa_saml_idp_cfg(self, remote_entity_data):
-        pass
+    def get_satosa_saml_sp_cfg(self, entity: SamlEntity) -> FrozenDict:
+        return self.render_config(
+            entity,
+            {
+                "config": {
+                    "idp_config": {
+                        "metadata": get_remote_metadata(entity),
+                        "service": {
+                            "idp": {
+                                "name": entity.name,
+                                "ui_info": get_ui_info(entity),
+                            }
+                        },
+                    }
+                }
+            },
+        )
 
-    def get_satosa_oidc_rp_cfg(self, remote_entity_data):
-        pass
+    def get_satosa_saml_idp_cfg(self, entity: SamlEntity) -> FrozenDict:
+        return self.render_config(
+            entity,
+            {
+                "config": {
+                    "sp_config": {
+                        "name": entity.name,
+                        "description": entity.description,
+                        "metadata": get_remote_metadata(entity),
+                        "service": {"sp": {"ui_info": get_ui_info(entity)}},
+                    }
+                }
+            },
+        )
 
-    def get_satosa_oidc_op_cfg(self, remote_entity_data):
-        pass
+    def get_satosa_oidc_rp_cfg(self, entity: OidcRpEntity) -> FrozenDict:
+        client_metadata = {
+            "client_name": entity.name,
+            "redirect_uris": [entity.redirect_uri],
+        }
+        if entity.client_secret:
+            client_metadata["client_secret"] = entity.client_secret
+        return self.render_config(
+            entity,
+            {
+                "config": {
+                    "provider": {
+                        "client_registration_supported": bool(
+                            entity.dynamic_registration
+                        )
+                    },
+                    "clients": {entity.client_id: client_metadata},
+                }
+            },
+        )
 
-    def prepare_configuration(self, request: Request) -> dict[str, Any]:
-        remote_entity_data = request.json.get("object")
-        entity_type = remote_entity_data.get("entity_type")
+    def get_satosa_oidc_op_cfg(self, entity: OidcOpEntity) -> FrozenDict:
+        issuer = entity.discovery_url.removesuffix(OIDC_DISCOVERY_PATH)
+        return self.render_config(
+            entity,
+            {
+                "config": {
+                    "provider_metadata": {"issuer": issuer},
+                    "client": {
+                        "client_metadata": {
+                            "client_id": entity.client_id,
+                            "application_name": entity.name,
+                        }
+                    },
+                    "entity_info": {"ui_info": get_oidc_ui_info(entity)},
+                }
+            },
+        )
 
-        match entity_type:
+    def prepare_configuration(self, entity: RemoteEntity) -> dict[str, Any]:
+        match entity.entity_type:
             case "SAML_SP":
-                result = self.get_satosa_saml_sp_cfg(remote_entity_data)
+                result = self.get_satosa_saml_sp_cfg(entity)
             case "SAML_IDP":
-                result = self.get_satosa_saml_idp_cfg(remote_entity_data)
+                result = self.get_satosa_saml_idp_cfg(entity)
             case "OIDC_RP":
-                result = self.get_satosa_oidc_rp_cfg(remote_entity_data)
+                result = self.get_satosa_oidc_rp_cfg(entity)
             case "OIDC_OP":
-                result = self.get_satosa_oidc_op_cfg(remote_entity_data)
+                result = self.get_satosa_oidc_op_cfg(entity)
             case _:
                 result = {}
 
@@ -0,0 +1,245 @@
+import json
+import math
+import re
+import uuid
+from typing import Any, Callable, Dict
+
+import yaml
+
+from enums.config_file_format import ConfigFileFormat
+from utils.frozen_config import FrozenDict, FrozenList
+
+# the fast backends are optional, the pure-Python ones are used without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# serialization is canonical (sorted keys) so that the same config always
+# produces the same bytes, the fast backends must produce exactly the same
+# bytes as the pure-Python ones
+ConfigSerializer = Callable[[Any], bytes]
+
+# orjson writes other characters than printable ASCII, floats in exponent
+# notation and non-finite floats differently than json
+JSON_ORJSON_SAFE_STRING_PATTERN = re.compile("[\x20-\x7e]*")
+# the libyaml and pure-Python emitters fold long scalars at other places,
+# with no line width limit neither of them folds
+YAML_LINE_WIDTH = 2**31 - 1
+YAML_LINE_BREAK_PATTERN = re.compile("[\n\r\x85\u2028\u2029]")
+# plain scalar that cannot clash with a real key of a config
+YAML_EMPTY_KEY_PLACEHOLDER = f"empty_key_{uuid.uuid4().hex}"
+
+
+class UnstableYamlOutput(Exception):
+    pass
+
+
+def get_sorted_config(config: Any) -> Any:
+    if isinstance(config, dict):
+        return {
+            key: get_sorted_config(config[key])
+            for key in sorted(config, key=str)
+        }
+    if isinstance(config, (list, tuple)):
+        return [get_sorted_config(item) for item in config]
+    return config
+
+
+def serialize_config_txt(config: Any) -> bytes:
+    return str(get_sorted_config(config)).encode()
+
+
+def serialize_config_json_stdlib(config: Any) -> bytes:
+    return json.dumps(config, indent=4, sort_keys=True).encode()
+
+
+def is_orjson_compatible(config: Any) -> bool:
+    # only configs made of values both backends write the same way are
+    # serialized by orjson
+    pending_values = [config]
+    while pending_values:
+        value = pending_values.pop()
+        if isinstance(value, str):
+            if not JSON_ORJSON_SAFE_STRING_PATTERN.fullmatch(value):
+                return False
+        elif isinstance(value, dict):
+            pending_values.extend(value.keys())
+            pending_values.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending_values.extend(value)
+        elif isinstance(value, float):
+            if not math.isfinite(value) or "e" in repr(value):
+                return False
+        elif value is not None and not isinstance(value, int):
+            return False
+    return True
+
+
+def serialize_config_json_orjson(config: Any) -> bytes:
+    if not is_orjson_compatible(config):
+        return serialize_config_json_stdlib(config)
+
+    try:
+        serialized_config = orjson.dumps(
+            config, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+        )
+    except orjson.JSONEncodeError:
+        # e.g. non-string keys or integers wider than 64 bits
+        return serialize_config_json_stdlib(config)
+
+    # strings cannot contain raw newlines, so every leading space is indent
+    # - doubling it turns the indent of 2 spaces into the indent of 4 spaces
+    return b"\n".join(
+        [
+            line[: len(line) - len(line.lstrip(b" "))] + line
+            for line in serialized_config.split(b"\n")
+        ]
+    )
+
+
+class PureConfigDumper(yaml.Dumper):
+    # frozen configs share their values with the templates they were made
+    # from, a shared value is written in full instead of as an alias
+    def ignore_aliases(self, data):
+        return isinstance(
+            data, (FrozenDict, FrozenList)
+        ) or super().ignore_aliases(data)
+
+
+PureConfigDumper.add_representer(FrozenDict, PureConfigDumper.represent_dict)
+PureConfigDumper.add_representer(FrozenList, PureConfigDumper.represent_list)
+
+
+def serialize_config_yaml_pure(config: Any) -> bytes:
+    return yaml.dump(
+        config,
+        Dumper=PureConfigDumper,
+        default_flow_style=False,
+        sort_keys=True,
+        width=YAML_LINE_WIDTH,
+    ).encode()
+
+
+if getattr(yaml, "__with_libyaml__", False):
+
+    class LibyamlConfigDumper(yaml.CDumper):
+        def ignore_aliases(self, data):
+            return isinstance(
+                data, (FrozenDict, FrozenList)
+            ) or super().ignore_aliases(data)
+
+        # the pure-Python emitter writes empty keys as complex "? ''" keys,
+        # libyaml as simple ones - empty keys are emitted as a placeholder
+        # that is rewritten to the complex form afterwards
+        def represent_dict(self, data):
+            mapping_node = super().represent_dict(data)
+            if "" not in data:
+                return mapping_node
+
+            # the rewrite keeps the output stable only for values that stay
+            # on the line of the key
+            empty_key_value = data[""]
+            if (
+                isinstance(empty_key_value, (dict, list, tuple, set))
+                and empty_key_value
+            ) or (
+                isinstance(empty_key_value, str)
+                and YAML_LINE_BREAK_PATTERN.search(empty_key_value)
+            ):
+                raise UnstableYamlOutput()
+            if YAML_EMPTY_KEY_PLACEHOLDER in data:
+                raise UnstableYamlOutput()
+
+            mapping_node.value = [
+                (
+                    (
+                        yaml.ScalarNode(
+                            "tag:yaml.org,2002:str",
+                            YAML_EMPTY_KEY_PLACEHOLDER,
+                        )
+                        if key_node.value == ""
+                        else key_node
+                    ),
+                    value_node,
+                )
+                for key_node, value_node in mapping_node.value
+            ]
+            return mapping_node
+
+    LibyamlConfigDumper.add_representer(
+        dict, LibyamlConfigDumper.represent_dict
+    )
+    LibyamlConfigDumper.add_representer(
+        FrozenDict, LibyamlConfigDumper.represent_dict
+    )
+    LibyamlConfigDumper.add_representer(
+        FrozenList, LibyamlConfigDumper.represent_list
+    )
+
+    def rewrite_empty_keys(serialized_config: str) -> str:
+        # lines are not folded, so the value stays on the line of the key
+        placeholder = YAML_EMPTY_KEY_PLACEHOLDER + ":"
+        position = serialized_config.find(placeholder)
+        while position != -1:
+            line_start = serialized_config.rfind("\n", 0, position) + 1
+            column = position - line_start
+            value_start = position + len(YAML_EMPTY_KEY_PLACEHOLDER)
+            serialized_config = (
+                serialized_config[:position]
+                + "? ''\n"
+                + " " * column
+                + serialized_config[value_start:]
+            )
+            position = serialized_config.find(placeholder, position)
+
+        return serialized_config
+
+    def serialize_config_yaml_libyaml(config: Any) -> bytes:
+        try:
+            serialized_config = yaml.dump(
+                config,
+                Dumper=LibyamlConfigDumper,
+                default_flow_style=False,
+                sort_keys=True,
+                width=YAML_LINE_WIDTH,
+            )
+        except UnstableYamlOutput:
+            return serialize_config_yaml_pure(config)
+        return rewrite_empty_keys(serialized_config).encode()
+
+else:
+    serialize_config_yaml_libyaml = None
+
+
+CONFIG_SERIALIZERS: Dict[ConfigFileFormat, ConfigSerializer] = {
+    ConfigFileFormat.TXT: serialize_config_txt,
+    ConfigFileFormat.JSON: (
+        serialize_config_json_orjson
+        if orjson
+        else serialize_config_json_stdlib
+    ),
+    ConfigFileFormat.YAML: (
+        serialize_config_yaml_libyaml or serialize_config_yaml_pure
+    ),
+}
+
+
+def register_config_serializer(
+    config_file_format: ConfigFileFormat, config_serializer: ConfigSerializer
+) -> None:
+    CONFIG_SERIALIZERS[config_file_format] = config_serializer
+
+
+def get_config_serializer(
+    config_file_format: ConfigFileFormat,
+) -> ConfigSerializer:
+    try:
+        return CONFIG_SERIALIZERS[config_file_format]
+    except KeyError:
+        raise ValueError(
+            f"No serializer registered for config file format "
+            f"'{config_file_format.name}'. "
+            f"Allowed values are: "
+            f"{', '.join([e.name for e in CONFIG_SERIALIZERS])}"
+        )
@@ -1,8 +1,20 @@
 from abc import ABC, abstractmethod
 from typing import Any
 
+from entities.remote_entity import RemoteEntity
+
 
 class ConfigVersionManager(ABC):
+    # an update of an entity may be saved by several processors, the hooks
+    # surround the saves of a single processor
+    def begin_update(self, entity: RemoteEntity) -> None:
+        pass
+
+    def end_update(self, entity: RemoteEntity) -> None:
+        pass
+
     @abstractmethod
-    def save_configuration(self, config: dict[str, Any]) -> None:
+    def save_configuration(
+        self, config: dict[str, Any], entity: RemoteEntity = None
+    ) -> None:
         pass
@@ -0,0 +1,425 @@
+import os
+import struct
+import threading
+import time
+import zlib
+from difflib import SequenceMatcher
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from config_version_managers.snapshot_store import Snapshot
+
+# index records are fixed-size so that the n-th record is found by seeking:
+# unix timestamp (float64), segment, offset and length of the compressed
+# frame in the segment + raw sha256 digest of the snapshot content
+INDEX_RECORD = struct.Struct(">dIQI32s")
+# delta operations: copy <count> lines of the previous version starting at
+# <start>, or insert <length> bytes that follow the operation
+DELTA_COPY = struct.Struct(">cII")
+DELTA_INSERT = struct.Struct(">cI")
+
+DEFAULT_KEYFRAME_INTERVAL = 32
+
+
+def encode_delta(base: bytes, content: bytes) -> bytes:
+    base_lines = base.splitlines(keepends=True)
+    content_lines = content.splitlines(keepends=True)
+
+    # configs mostly change in a few lines, the common head and tail are
+    # found in linear time and only the rest is diffed
+    prefix_length = 0
+    max_common_length = min(len(base_lines), len(content_lines))
+    while (
+        prefix_length < max_common_length
+        and base_lines[prefix_length] == content_lines[prefix_length]
+    ):
+        prefix_length += 1
+    suffix_length = 0
+    while (
+        suffix_length < max_common_length - prefix_length
+        and base_lines[-suffix_length - 1] == content_lines[-suffix_length - 1]
+    ):
+        suffix_length += 1
+
+    operations = []
+    if prefix_length:
+        operations.append(DELTA_COPY.pack(b"C", 0, prefix_length))
+
+    base_end = len(base_lines) - suffix_length
+    content_end = len(content_lines) - suffix_length
+    matcher = SequenceMatcher(
+        None,
+        base_lines[prefix_length:base_end],
+        content_lines[prefix_length:content_end],
+    )
+    opcodes = matcher.get_opcodes()
+    for tag, base_start, base_stop, content_start, content_stop in opcodes:
+        if tag == "equal":
+            operations.append(
+                DELTA_COPY.pack(
+                    b"C", prefix_length + base_start, base_stop - base_start
+                )
+            )
+        elif content_stop > content_start:
+            inserted_lines = content_lines[prefix_length:content_end]
+            inserted = b"".join(inserted_lines[content_start:content_stop])
+            operations.append(DELTA_INSERT.pack(b"I", len(inserted)))
+            operations.append(inserted)
+
+    if suffix_length:
+        operations.append(DELTA_COPY.pack(b"C", base_end, suffix_length))
+
+    return b"".join(operations)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    base_lines = base.splitlines(keepends=True)
+    content_parts = []
+
+    position = 0
+    while position < len(delta):
+        operation_start = position
+        if delta[operation_start] == ord("C"):
+            _, start, count = DELTA_COPY.unpack_from(delta, operation_start)
+            stop = start + count
+            content_parts.extend(base_lines[start:stop])
+            position += DELTA_COPY.size
+        else:
+            _, length = DELTA_INSERT.unpack_from(delta, operation_start)
+            start = operation_start + DELTA_INSERT.size
+            position = start + length
+            content_parts.append(delta[start:position])
+
+    return b"".join(content_parts)
+
+
+class DeltaRecord:
+    __slots__ = ("timestamp", "segment", "offset", "length", "digest")
+
+    def __init__(
+        self,
+        timestamp: float,
+        segment: int,
+        offset: int,
+        length: int,
+        digest: str,
+    ):
+        self.timestamp = timestamp
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.digest = digest
+
+    def pack(self) -> bytes:
+        return INDEX_RECORD.pack(
+            self.timestamp,
+            self.segment,
+            self.offset,
+            self.length,
+            bytes.fromhex(self.digest),
+        )
+
+    def to_snapshot(self) -> Snapshot:
+        return Snapshot(self.timestamp, self.digest)
+
+
+class DeltaStore:
+    __INDEX_FILE_NAME = "index"
+    __SEGMENT_FOLDER_NAME = "segments"
+
+    def __init__(
+        self,
+        store_folder_path: Path,
+        write_file: Callable[[str, bytes], None],
+        sync_file: Callable[[str], None],
+        retention_count: int = None,
+        retention_max_age: float = None,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    ):
+        self.__INDEX_FILE_PATH = store_folder_path / self.__INDEX_FILE_NAME
+        self.__SEGMENT_FOLDER_PATH = (
+            store_folder_path / self.__SEGMENT_FOLDER_NAME
+        )
+        # writes and syncs follow the durability of the version manager
+        self.__WRITE_FILE = write_file
+        self.__SYNC_FILE = sync_file
+        self.__RETENTION_COUNT = retention_count
+        self.__RETENTION_MAX_AGE = retention_max_age
+        # every segment starts with a full keyframe followed by at most
+        # <keyframe_interval - 1> deltas, each one against the previous
+        # version - reading any version decompresses at most one segment
+        self.__KEYFRAME_INTERVAL = max(1, keyframe_interval)
+        self.__LOCK = threading.RLock()
+
+        self.__index_file = None
+        self.__record_count = 0
+        self.__latest_record: Optional[DeltaRecord] = None
+        # content of the latest snapshot, the base of the next delta
+        self.__latest_content: Optional[bytes] = None
+
+    def open(self) -> None:
+        with self.__LOCK:
+            if self.__index_file:
+                return
+
+            self.__SEGMENT_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+            self.__index_file = open(self.__INDEX_FILE_PATH, "a+b")
+
+            # a torn record of a write interrupted by a crash is dropped
+            index_size = self.__index_file.seek(0, os.SEEK_END)
+            if index_size % INDEX_RECORD.size:
+                self.__index_file.truncate(
+                    index_size - index_size % INDEX_RECORD.size
+                )
+            self.__record_count = index_size // INDEX_RECORD.size
+            self.__latest_record = (
+                self.__read_record(self.__record_count - 1)
+                if self.__record_count
+                else None
+            )
+            self.__latest_content = None
+
+    def close(self) -> None:
+        with self.__LOCK:
+            if self.__index_file:
+                self.__index_file.close()
+                self.__index_file = None
+
+    def __len__(self) -> int:
+        with self.__LOCK:
+            self.open()
+            return self.__record_count
+
+    def get_segment_path(self, segment: int) -> Path:
+        return self.__SEGMENT_FOLDER_PATH / f"{segment:010d}"
+
+    def save(self, content: bytes, timestamp: float = None) -> Snapshot:
+        digest = sha256(content).hexdigest()
+
+        with self.__LOCK:
+            self.open()
+
+            # timestamps never decrease so that the index stays sorted even
+            # if the clock is set back
+            timestamp = time.time() if timestamp is None else timestamp
+            if self.__latest_record:
+                timestamp = max(timestamp, self.__latest_record.timestamp)
+
+            delta = None
+            if self.__latest_record and not self.__is_segment_full():
+                if self.__latest_content is None:
+                    self.__latest_content = self.__read_content(
+                        self.__record_count - 1
+                    )
+                delta = encode_delta(self.__latest_content, content)
+
+            # a delta larger than the content itself is stored as keyframe
+            if delta is not None and len(delta) < len(content):
+                segment = self.__latest_record.segment
+                segment_path = self.get_segment_path(segment)
+                frame = zlib.compress(delta)
+                # a frame torn by a crash stays unreferenced before the offset
+                with open(segment_path, "ab") as segment_file:
+                    offset = segment_file.seek(0, os.SEEK_END)
+                    segment_file.write(frame)
+                self.__SYNC_FILE(str(segment_path))
+            else:
+                segment = (
+                    self.__latest_record.segment + 1
+                    if self.__record_count
+                    else 0
+                )
+                frame = zlib.compress(content)
+                offset = 0
+                self.__WRITE_FILE(str(self.get_segment_path(segment)), frame)
+
+            record = DeltaRecord(
+                timestamp, segment, offset, len(frame), digest
+            )
+            self.__index_file.write(record.pack())
+            self.__index_file.flush()
+            self.__SYNC_FILE(str(self.__INDEX_FILE_PATH))
+
+            self.__record_count += 1
+            self.__latest_record = record
+            self.__latest_content = content
+
+            if self.__get_removable_record_count(timestamp) * 2 > max(
+                self.__record_count, 2
+            ):
+                # expired segments are removed once they make up half of the
+                # index, so the cost of compaction is amortized over saves
+                self.compact(timestamp)
+
+            return record.to_snapshot()
+
+    def get_latest(self) -> Optional[Snapshot]:
+        with self.__LOCK:
+            self.open()
+            if not self.__latest_record:
+                return None
+            return self.__latest_record.to_snapshot()
+
+    def get_as_of(self, timestamp: float) -> Optional[Snapshot]:
+        # the last snapshot saved at or before the timestamp
+        with self.__LOCK:
+            self.open()
+            position = self.__bisect_right(timestamp)
+            if not position:
+                return None
+            return self.__read_record(position - 1).to_snapshot()
+
+    def get_snapshots(self) -> List[Snapshot]:
+        with self.__LOCK:
+            self.open()
+            return [
+                self.__read_record(position).to_snapshot()
+                for position in range(self.__record_count)
+            ]
+
+    def read(self, snapshot: Snapshot) -> bytes:
+        with self.__LOCK:
+            self.open()
+            if (
+                self.__latest_content is not None
+                and snapshot.digest == self.__latest_record.digest
+            ):
+                return self.__latest_content
+
+            # snapshots saved at the same time are told apart by the digest
+            position = self.__bisect_right(snapshot.timestamp) - 1
+            while position >= 0:
+                record = self.__read_record(position)
+                if record.timestamp != snapshot.timestamp:
+                    break
+                if record.digest == snapshot.digest:
+                    return self.__read_content(position)
+                position -= 1
+
+            raise KeyError(f"Snapshot {snapshot} is not in the store")
+
+    def compact(self, now: float = None) -> None:
+        now = time.time() if now is None else now
+
+        with self.__LOCK:
+            self.open()
+            # the expired snapshots are removed by whole segments, the
+            # retained snapshots must stay reconstructable from keyframes
+            removable_record_count = self.__get_removable_record_count(now)
+            if removable_record_count <= 0:
+                return
+            first_retained_segment = self.__read_record(
+                removable_record_count
+            ).segment
+
+            # the index is rewritten next to the old one and replaces it
+            self.__index_file.seek(removable_record_count * INDEX_RECORD.size)
+            retained_records = self.__index_file.read()
+            tmp_index_file_path = self.__INDEX_FILE_PATH.with_suffix(".tmp")
+            self.__WRITE_FILE(str(tmp_index_file_path), retained_records)
+            self.close()
+            os.replace(tmp_index_file_path, self.__INDEX_FILE_PATH)
+            self.__SYNC_FILE(str(self.__INDEX_FILE_PATH))
+            self.open()
+
+            # segments are deleted only after the index stops referencing them
+            for segment_path in self.__SEGMENT_FOLDER_PATH.iterdir():
+                if int(segment_path.name) < first_retained_segment:
+                    segment_path.unlink()
+
+    def __is_segment_full(self) -> bool:
+        segment = self.__latest_record.segment
+        frame_count = 0
+        position = self.__record_count - 1
+        while position >= 0 and frame_count < self.__KEYFRAME_INTERVAL:
+            if self.__read_record(position).segment != segment:
+                break
+            frame_count += 1
+            position -= 1
+        return frame_count >= self.__KEYFRAME_INTERVAL
+
+    def __read_content(self, position: int) -> bytes:
+        # the keyframe of the segment is followed by the deltas up to the
+        # position, all of them are read at once
+        record = self.__read_record(position)
+        keyframe_position = position
+        while keyframe_position > 0:
+            if (
+                self.__read_record(keyframe_position - 1).segment
+                != record.segment
+            ):
+                break
+            keyframe_position -= 1
+        keyframe_record = self.__read_record(keyframe_position)
+
+        with open(self.get_segment_path(record.segment), "rb") as segment_file:
+            segment_file.seek(keyframe_record.offset)
+            frames = segment_file.read(
+                record.offset + record.length - keyframe_record.offset
+            )
+
+        content = zlib.decompress(frames[:keyframe_record.length])
+        for delta_position in range(keyframe_position + 1, position + 1):
+            delta_record = self.__read_record(delta_position)
+            frame_start = delta_record.offset - keyframe_record.offset
+            frame_stop = frame_start + delta_record.length
+            content = apply_delta(
+                content, zlib.decompress(frames[frame_start:frame_stop])
+            )
+        return content
+
+    def __get_removable_record_count(self, now: float) -> int:
+        # the latest snapshot is always retained
+        expired_record_count = 0
+        if self.__RETENTION_COUNT:
+            expired_record_count = max(
+                0, self.__record_count - self.__RETENTION_COUNT
+            )
+        if self.__RETENTION_MAX_AGE:
+            expired_record_count = max(
+                expired_record_count,
+                self.__bisect_right(now - self.__RETENTION_MAX_AGE, True),
+            )
+        expired_record_count = min(
+            expired_record_count, self.__record_count - 1
+        )
+        if expired_record_count <= 0:
+            return 0
+
+        # only records before the keyframe of the first retained one can go
+        first_retained_segment = self.__read_record(
+            expired_record_count
+        ).segment
+        while (
+            expired_record_count > 0
+            and self.__read_record(expired_record_count - 1).segment
+            == first_retained_segment
+        ):
+            expired_record_count -= 1
+        return expired_record_count
+
+    def __bisect_right(self, timestamp: float, exclusive=False) -> int:
+        # number of records with timestamps up to the timestamp, or only
+        # before it if exclusive
+        low, high = 0, self.__record_count
+        while low < high:
+            middle = (low + high) // 2
+            middle_timestamp = self.__read_record(middle).timestamp
+            if middle_timestamp < timestamp or (
+                not exclusive and middle_timestamp == timestamp
+            ):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __read_record(self, position: int) -> DeltaRecord:
+        self.__index_file.seek(position * INDEX_RECORD.size)
+        timestamp, segment, offset, length, raw_digest = INDEX_RECORD.unpack(
+            self.__index_file.read(INDEX_RECORD.size)
+        )
+        # the file is opened for appending, writes still go to its end
+        return DeltaRecord(
+            timestamp, segment, offset, length, raw_digest.hex()
+        )
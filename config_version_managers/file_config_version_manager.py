@@ -1,11 +1,33 @@
-import json
+import os
+import threading
+import uuid
 from abc import abstractmethod
-from typing import Any, Dict
-
-import yaml
+from contextlib import suppress
+from hashlib import sha256
+from typing import Any, Dict, Set
 
+from config_version_managers.config_serializers import get_config_serializer
 from config_version_managers.config_version_manager import ConfigVersionManager
+from entities.remote_entity import RemoteEntity
 from enums.config_file_format import ConfigFileFormat
+from enums.write_durability import WriteDurability
+from utils.metrics import metrics
+
+DEDUPLICATED_UPDATES = metrics.counter(
+    "config_updates_deduplicated_total",
+    "Saves skipped because the serialized config was identical to the last "
+    "written one",
+    ("config_file_name",),
+)
+SERIALIZE_DURATION = metrics.histogram(
+    "config_serialize_duration_seconds",
+    "Time spent serializing configs",
+    ("format",),
+)
+WRITE_DURATION = metrics.histogram(
+    "config_file_write_duration_seconds",
+    "Time spent writing config files, including fsync when configured",
+)
 
 
 class FileConfigVersionManager(ConfigVersionManager):
@@ -29,43 +51,164 @@ class FileConfigVersionManager(ConfigVersionManager):
 
         self._CONFIG_FILE_FORMAT = config_file_format
 
-    def save_config_txt(self, config, file_path: str) -> str:
-        file_path += ".txt"
-        with open(file_path, "w") as txt_file:
-            txt_file.write(str(config))
-        return file_path
-
-    def save_config_json(self, config, file_path: str) -> str:
-        file_path += ".json"
-        with open(file_path, "w") as json_file:
-            json.dump(config, json_file, indent=4)
-        return file_path
-
-    def save_config_yaml(self, config, file_path: str) -> str:
-        file_path += ".yaml"
-        with open(file_path, "w") as yaml_file:
-            yaml.dump(
-                config, yaml_file, default_flow_style=False, sort_keys=False
+        # ALWAYS - every write is fsynced before it replaces the old file
+        # BATCH - files written during an update are fsynced when it ends
+        # NONE - no fsync, the OS writes the files back whenever it wants
+        try:
+            write_durability_in_cfg = file_version_manager_cfg.get(
+                "write_durability", WriteDurability.ALWAYS.name
+            )
+            write_durability = WriteDurability[write_durability_in_cfg]
+        except KeyError:
+            raise ValueError(
+                f"Invalid write durability '{write_durability_in_cfg}' in "
+                f"configuration. "
+                f"Allowed values are: "
+                f"{', '.join([e.name for e in WriteDurability])}"
             )
-        return file_path
-
-    def save_config_to_file(
-        self,
-        file_path: str,
-        config: Dict[str, Any],
-        output_format: ConfigFileFormat = None,
-    ) -> str:
+
+        self._WRITE_DURABILITY = write_durability
+
+        # held while a config is checked for duplicates and written
+        self._WRITE_LOCK = threading.RLock()
+        # digest of the last written config for every output target
+        self.__last_written_digests: Dict[str, str] = {}
+        # files written with BATCH durability that were not fsynced yet
+        self.__unsynced_file_paths: Set[str] = set()
+        self.__open_update_count = 0
+
+    def get_file_extension(self, output_format: ConfigFileFormat) -> str:
+        return f".{output_format.name.lower()}"
+
+    def serialize_config(
+        self, config: Dict[str, Any], output_format: ConfigFileFormat = None
+    ) -> bytes:
         if not output_format:
             output_format = self._CONFIG_FILE_FORMAT
 
-        match output_format:
-            case output_format.TXT:
-                return self.save_config_txt(config, file_path)
-            case output_format.JSON:
-                return self.save_config_json(config, file_path)
-            case output_format.YAML:
-                return self.save_config_yaml(config, file_path)
+        with SERIALIZE_DURATION.time(format=output_format.name):
+            return get_config_serializer(output_format)(config)
+
+    def begin_update(self, entity: RemoteEntity) -> None:
+        with self._WRITE_LOCK:
+            self.__open_update_count += 1
+
+    def end_update(self, entity: RemoteEntity) -> None:
+        with self._WRITE_LOCK:
+            self.__open_update_count -= 1
+            if self.__open_update_count <= 0:
+                self.__open_update_count = 0
+                self.sync_written_files()
+
+    def fsync_directory(self, directory_path: str) -> None:
+        # the rename of a file is durable once its directory is fsynced
+        directory_fd = os.open(directory_path, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+    def sync_written_files(self) -> None:
+        with self._WRITE_LOCK:
+            file_paths = self.__unsynced_file_paths
+            self.__unsynced_file_paths = set()
+
+            for file_path in file_paths:
+                # e.g. a snapshot removed by a compaction in the meantime
+                with suppress(FileNotFoundError):
+                    with open(file_path, "rb") as config_file:
+                        os.fsync(config_file.fileno())
+            for directory_path in {
+                os.path.dirname(file_path) or "." for file_path in file_paths
+            }:
+                self.fsync_directory(directory_path)
+
+    def write_config_file(
+        self, file_path: str, serialized_config: bytes
+    ) -> None:
+        with WRITE_DURATION.time():
+            self.__write_config_file(file_path, serialized_config)
+
+    def __write_config_file(
+        self, file_path: str, serialized_config: bytes
+    ) -> None:
+        # the config is written to a temporary file that replaces the target
+        # file at once, readers never see a partially written config
+        directory_path = os.path.dirname(file_path) or "."
+        tmp_file_path = os.path.join(
+            directory_path,
+            f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.tmp",
+        )
+        try:
+            with open(tmp_file_path, "xb") as tmp_file:
+                tmp_file.write(serialized_config)
+                if self._WRITE_DURABILITY == WriteDurability.ALWAYS:
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+            os.replace(tmp_file_path, file_path)
+        except BaseException:
+            with suppress(FileNotFoundError):
+                os.remove(tmp_file_path)
+            raise
+
+        if self._WRITE_DURABILITY == WriteDurability.ALWAYS:
+            # the content is synced already, only the rename is left
+            self.fsync_directory(directory_path)
+        else:
+            self.sync_file(file_path)
+
+    def sync_file(self, file_path: str) -> None:
+        # syncs a written file according to the configured durability
+        match self._WRITE_DURABILITY:
+            case WriteDurability.ALWAYS:
+                with open(file_path, "rb") as written_file:
+                    os.fsync(written_file.fileno())
+                self.fsync_directory(os.path.dirname(file_path) or ".")
+            case WriteDurability.BATCH:
+                with self._WRITE_LOCK:
+                    self.__unsynced_file_paths.add(file_path)
+                    # a write outside of an update is a batch of its own
+                    if not self.__open_update_count:
+                        self.sync_written_files()
+
+    def get_config_digest(self, serialized_config: bytes) -> str:
+        return sha256(serialized_config).hexdigest()
+
+    def load_last_written_config(self, output_target: str) -> bytes:
+        # the previously written config is unknown by default, managers can
+        # override this to recover it from their storage after a restart
+        return None
+
+    def is_duplicate_config(self, output_target: str, digest: str) -> bool:
+        with self._WRITE_LOCK:
+            if output_target not in self.__last_written_digests:
+                last_written_config = self.load_last_written_config(
+                    output_target
+                )
+                self.__last_written_digests[output_target] = (
+                    self.get_config_digest(last_written_config)
+                    if last_written_config is not None
+                    else None
+                )
+
+            is_duplicate = self.__last_written_digests[output_target] == digest
+
+        if is_duplicate:
+            DEDUPLICATED_UPDATES.inc(config_file_name=self._CONFIG_FILE_NAME)
+
+        return is_duplicate
+
+    def remember_written_config(self, output_target: str, digest: str):
+        with self._WRITE_LOCK:
+            self.__last_written_digests[output_target] = digest
+
+    def forget_written_config(self, output_target: str) -> None:
+        # e.g. a written config that failed to be published
+        with self._WRITE_LOCK:
+            self.__last_written_digests.pop(output_target, None)
 
     @abstractmethod
-    def save_configuration(self, config: dict[str, Any]) -> None:
+    def save_configuration(
+        self, config: dict[str, Any], entity: RemoteEntity = None
+    ) -> None:
         pass
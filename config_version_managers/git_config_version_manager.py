@@ -1,15 +1,15 @@
 import os
-from datetime import datetime
 from pathlib import Path
 from typing import Any
 
-from dulwich import porcelain
-from dulwich.errors import NotGitRepository
-from dulwich.porcelain import status
 from dulwich.repo import Repo
 
 from config_version_managers.file_config_version_manager import \
     FileConfigVersionManager
+from config_version_managers.git_push_scheduler import GitPushScheduler
+from config_version_managers.git_repository_coordinator import \
+    git_repository_coordinators
+from entities.remote_entity import RemoteEntity
 
 
 class GitConfigVersionManager(FileConfigVersionManager):
@@ -19,88 +19,81 @@ class GitConfigVersionManager(FileConfigVersionManager):
         self.__GIT_REPO_FOLDER_PATH = Path(
             git_version_manager_cfg.get("git_repo_folder_path")
         )
-        self.__GIT_BRANCH_NAME = git_version_manager_cfg.get("git_branch_name")
-        self.__COMMITTER = git_version_manager_cfg.get("committer")
-
-        self.__GIT_REPO = git_version_manager_cfg.get("git_repo")
-        self.__GIT_USERNAME = git_version_manager_cfg.get("git_username")
-        self.__GIT_TOKEN = git_version_manager_cfg.get("git_token")
-
-    def set_target_branch(self, repo: Repo) -> None:
-        branches = repo.get_refs()
-        branch_ref = f"refs/heads/{self.__GIT_BRANCH_NAME}".encode()
-
-        if branch_ref not in branches:
-            current_head = repo.head()
-            repo.refs[branch_ref] = current_head
-
-        repo.refs.set_symbolic_ref(b"HEAD", branch_ref)
-
-    # TODO refine the check of encoded/unencoded files
-    def has_file_changed(self, repo: Repo, file_path: str) -> bool:
-        repo_status = status(repo)
-
-        staged_items = [
-            item for sublist in repo_status.staged.values() for item in sublist
-        ]
-        changed_files = (
-            staged_items
-            + repo_status.unstaged  # Staged for commit
-            + repo_status.untracked
-            # Modified but not staged  # Untracked files
+        # version managers of all processors using the same repository folder
+        # share a coordinator that owns the working tree, commits and pushes
+        self.__COORDINATOR = git_repository_coordinators.get_coordinator(
+            git_version_manager_cfg
         )
 
-        file_name = os.path.basename(file_path)
-        observed_files = [file_name.encode(), file_name]
+    def get_repo(self) -> Repo:
+        return self.__COORDINATOR.get_repo()
 
-        for observed_file in observed_files:
-            if observed_file in changed_files:
-                return True
+    def get_push_scheduler(self) -> GitPushScheduler:
+        return self.__COORDINATOR.get_push_scheduler()
 
-        return False
+    def publish_pending_changes(self) -> None:
+        self.__COORDINATOR.publish_pending_changes()
 
-    def get_repo(self) -> Repo:
-        try:
-            repo = Repo(str(self.__GIT_REPO_FOLDER_PATH))
-        except NotGitRepository:
-            repo = porcelain.clone(
-                source=self.__GIT_REPO,
-                target=self.__GIT_REPO_FOLDER_PATH,
-                username=self.__GIT_USERNAME,
-                password=self.__GIT_TOKEN,
-            )
-        finally:
-            self.set_target_branch(repo)
-
-        return repo
-
-    def publish_file_to_git(self, repo: Repo, file_path: str) -> None:
-        # ADD changes
-        porcelain.add(repo=repo, paths=[file_path])
-
-        # COMMIT changes
-        datetime_stamp = datetime.now().isoformat(timespec="seconds")
-        commit_msg = f"Config change on {datetime_stamp}".encode()
-        committer = self.__COMMITTER.encode()
-        porcelain.commit(repo=repo, message=commit_msg, committer=committer)
-
-        # PUSH changes
-        porcelain.push(
-            repo,
-            remote_location=self.__GIT_REPO,
-            username=self.__GIT_USERNAME,
-            password=self.__GIT_TOKEN,
-        )
+    def begin_update(self, entity: RemoteEntity) -> None:
+        super().begin_update(entity)
+        self.__COORDINATOR.begin_update(entity.id_hash)
 
-    def save_configuration(self, config: dict[str, Any]) -> None:
-        cfg_file_path = os.path.join(
-            self.__GIT_REPO_FOLDER_PATH, self._CONFIG_FILE_NAME
+    def end_update(self, entity: RemoteEntity) -> None:
+        # the written files are synced before they are committed
+        super().end_update(entity)
+        try:
+            self.__COORDINATOR.end_update(entity.id_hash)
+        except Exception:
+            # a config that was not published is not a duplicate of a retry
+            self.forget_written_config(self.get_config_file_path())
+            raise
+
+    def load_last_written_config(self, output_target: str) -> bytes:
+        # the committed config, not the working tree file - a file written
+        # but not committed before a crash must not make a resent config a
+        # duplicate
+        return self.__COORDINATOR.get_committed_file_content(
+            self.get_repo(), output_target
         )
-        repo = self.get_repo()
 
-        saved_config_file_path = self.save_config_to_file(
-            cfg_file_path, config
+    def get_config_file_path(self) -> str:
+        return os.path.join(
+            self.__GIT_REPO_FOLDER_PATH,
+            self._CONFIG_FILE_NAME
+            + self.get_file_extension(self._CONFIG_FILE_FORMAT),
         )
 
-        if self.has_file_changed(repo, saved_config_file_path):
-            self.publish_file_to_git(repo, saved_config_file_path)
+    def save_configuration(
+        self, config: dict[str, Any], entity: RemoteEntity = None
+    ) -> None:
+        serialized_config = self.serialize_config(config)
+        digest = self.get_config_digest(serialized_config)
+
+        cfg_file_path = self.get_config_file_path()
+
+        # the working tree is shared with the other version managers of the
+        # repository and must not be written to while it is being committed
+        with self.__COORDINATOR.LOCK:
+            repo = self.get_repo()
+            # a committed config whose push failed is published again
+            has_unpushed_commits = self.__COORDINATOR.has_unpushed_commits(
+                repo
+            )
+            if not has_unpushed_commits and self.is_duplicate_config(
+                cfg_file_path, digest
+            ):
+                return
+
+            self.write_config_file(cfg_file_path, serialized_config)
+            self.remember_written_config(cfg_file_path, digest)
+
+            if has_unpushed_commits or self.__COORDINATOR.has_file_changed(
+                repo, cfg_file_path, serialized_config
+            ):
+                try:
+                    self.__COORDINATOR.add_pending_change(
+                        cfg_file_path, entity.id_hash if entity else None
+                    )
+                except Exception:
+                    self.forget_written_config(cfg_file_path)
+                    raise
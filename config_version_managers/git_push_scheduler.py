@@ -0,0 +1,257 @@
+import atexit
+import logging
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from dulwich import porcelain
+from dulwich.client import get_transport_and_path
+from dulwich.repo import Repo
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 300.0
+
+COMMITS_BEHIND = metrics.gauge(
+    "git_remote_commits_behind",
+    "Local commits of the config branch not pushed to the remote yet",
+    ("remote",),
+)
+GIT_OPERATION_DURATION = metrics.histogram(
+    "git_operation_duration_seconds",
+    "Time spent in git operations on the config repositories",
+    ("operation",),
+)
+PUSH_ATTEMPTS = metrics.counter(
+    "git_push_attempts_total",
+    "Pushes of the config branch to the remote",
+    ("remote", "status"),
+)
+
+
+class GitPushError(Exception):
+    pass
+
+
+def get_tracking_ref(branch_name: str) -> bytes:
+    # the last commit known to be on the remote, like after a git push
+    return f"refs/remotes/origin/{branch_name}".encode()
+
+
+def push_branch(
+    repo: Repo,
+    remote_location: str,
+    branch_name: str,
+    credentials: Dict[str, str],
+) -> None:
+    branch_ref = f"refs/heads/{branch_name}".encode()
+    pushed_commit_id = repo.refs[branch_ref]
+    client, path = get_transport_and_path(
+        remote_location, config=repo.get_config_stack(), **credentials
+    )
+
+    def update_refs(remote_refs):
+        # like git push, a branch that diverged on the remote is not
+        # overwritten
+        if branch_ref in remote_refs:
+            porcelain.check_diverged(
+                repo, remote_refs[branch_ref], pushed_commit_id
+            )
+        return {**remote_refs, branch_ref: pushed_commit_id}
+
+    with GIT_OPERATION_DURATION.time(operation="push"):
+        push_result = client.send_pack(
+            path, update_refs, generate_pack_data=repo.generate_pack_data
+        )
+    # refs rejected by the remote do not fail the push itself
+    ref_error = (push_result.ref_status or {}).get(branch_ref)
+    if ref_error:
+        raise GitPushError(
+            f"Push of {branch_ref.decode()} was rejected: {ref_error}"
+        )
+    repo.refs[get_tracking_ref(branch_name)] = pushed_commit_id
+
+
+class GitPushScheduler:
+    def __init__(
+        self,
+        repo_folder_path: Path,
+        branch_name: str,
+        remote_location: str,
+        credentials: Dict[str, str],
+        retry_base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+        retry_max_delay: float = DEFAULT_RETRY_MAX_DELAY,
+    ):
+        self.__REPO_FOLDER_PATH = repo_folder_path
+        self.__BRANCH_NAME = branch_name
+        self.__BRANCH_REF = f"refs/heads/{branch_name}".encode()
+        self.__REMOTE_LOCATION = remote_location
+        self.__CREDENTIALS = credentials
+        self.__RETRY_BASE_DELAY = retry_base_delay
+        self.__RETRY_MAX_DELAY = retry_max_delay
+
+        self.__CONDITION = threading.Condition()
+        self.__push_requested = False
+        self.__is_pushing = False
+        self.__stopped = False
+        self.__failed_attempt_count = 0
+        self.__next_attempt_at = 0.0
+        self.__last_error = None
+        self.__thread = None
+        # the pushing thread uses its own handle of the repository
+        self.__repo = None
+
+    def get_commits_behind(self, repo: Repo) -> int:
+        try:
+            branch_head = repo.refs[self.__BRANCH_REF]
+        except KeyError:
+            return 0
+
+        # only the commits since the last push are walked
+        excluded_commit_ids = [
+            ref_value
+            for ref_name, ref_value in repo.get_refs().items()
+            if ref_name.startswith(b"refs/remotes/")
+        ]
+        walker = repo.get_walker(
+            include=[branch_head], exclude=excluded_commit_ids
+        )
+        return sum(1 for _ in walker)
+
+    def request_push(self, repo: Repo) -> None:
+        # commits made meanwhile are pushed together by the next push
+        COMMITS_BEHIND.set(
+            self.get_commits_behind(repo), remote=self.__REMOTE_LOCATION
+        )
+        with self.__CONDITION:
+            if self.__stopped:
+                return
+            self.__push_requested = True
+            if not self.__thread:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="git-push-scheduler", daemon=True
+                )
+                self.__thread.start()
+                atexit.register(self.stop)
+            self.__CONDITION.notify_all()
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        # True once no push is requested or running, e.g. for tests
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.__CONDITION:
+            while self.__push_requested or self.__is_pushing:
+                remaining = (
+                    None if deadline is None else deadline - time.monotonic()
+                )
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.__CONDITION.wait(remaining)
+            return True
+
+    def stop(self, timeout: float = None) -> None:
+        # a requested push is attempted once more without waiting for the
+        # backoff to pass
+        with self.__CONDITION:
+            self.__stopped = True
+            thread = self.__thread
+            self.__CONDITION.notify_all()
+        if thread:
+            thread.join(timeout)
+
+    def get_status(self) -> Dict[str, Any]:
+        with self.__CONDITION:
+            return {
+                "remote": self.__REMOTE_LOCATION,
+                "commits_behind": COMMITS_BEHIND.get(
+                    remote=self.__REMOTE_LOCATION
+                ),
+                "failed_attempts": self.__failed_attempt_count,
+                "last_error": self.__last_error,
+                "next_attempt_in": (
+                    max(0.0, self.__next_attempt_at - time.monotonic())
+                    if self.__push_requested
+                    else None
+                ),
+            }
+
+    def get_retry_delay(self, failed_attempt_count: int) -> float:
+        # exponential backoff with jitter so that connectors sharing a remote
+        # do not retry in lockstep after an outage
+        delay = min(
+            self.__RETRY_MAX_DELAY,
+            self.__RETRY_BASE_DELAY * 2 ** (failed_attempt_count - 1),
+        )
+        return random.uniform(delay / 2, delay)
+
+    def __run(self) -> None:
+        while True:
+            with self.__CONDITION:
+                while not self.__stopped and (
+                    not self.__push_requested
+                    or time.monotonic() < self.__next_attempt_at
+                ):
+                    self.__CONDITION.wait(
+                        self.__next_attempt_at - time.monotonic()
+                        if self.__push_requested
+                        else None
+                    )
+                if not self.__push_requested:
+                    return
+                self.__push_requested = False
+                self.__is_pushing = True
+
+            try:
+                self.__push()
+            except Exception as e:
+                PUSH_ATTEMPTS.inc(
+                    remote=self.__REMOTE_LOCATION, status="failed"
+                )
+                with self.__CONDITION:
+                    self.__failed_attempt_count += 1
+                    retry_delay = self.get_retry_delay(
+                        self.__failed_attempt_count
+                    )
+                    self.__last_error = str(e)
+                    self.__next_attempt_at = time.monotonic() + retry_delay
+                    # the failed push is retried even without new commits
+                    self.__push_requested = not self.__stopped
+                logger.warning(
+                    "Push to %s failed (attempt %d), retrying in %.1f s: %s",
+                    self.__REMOTE_LOCATION,
+                    self.__failed_attempt_count,
+                    retry_delay,
+                    e,
+                )
+            else:
+                PUSH_ATTEMPTS.inc(
+                    remote=self.__REMOTE_LOCATION, status="succeeded"
+                )
+                with self.__CONDITION:
+                    self.__failed_attempt_count = 0
+                    self.__last_error = None
+                    self.__next_attempt_at = 0.0
+            finally:
+                with self.__CONDITION:
+                    self.__is_pushing = False
+                    self.__CONDITION.notify_all()
+
+    def __push(self) -> None:
+        if not self.__repo:
+            self.__repo = Repo(str(self.__REPO_FOLDER_PATH))
+        repo = self.__repo
+
+        push_branch(
+            repo,
+            self.__REMOTE_LOCATION,
+            self.__BRANCH_NAME,
+            self.__CREDENTIALS,
+        )
+
+        COMMITS_BEHIND.set(
+            self.get_commits_behind(repo), remote=self.__REMOTE_LOCATION
+        )
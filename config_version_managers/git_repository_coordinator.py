@@ -0,0 +1,524 @@
+import atexit
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from dulwich import porcelain
+from dulwich.client import get_transport_and_path
+from dulwich.errors import NotGitRepository
+from dulwich.object_store import tree_lookup_path
+from dulwich.objects import Blob
+from dulwich.repo import Repo
+
+from config_version_managers.git_push_scheduler import (
+    DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY, GIT_OPERATION_DURATION,
+    GitPushScheduler, get_tracking_ref, push_branch)
+from enums.git_push_mode import GitPushMode
+
+logger = logging.getLogger(__name__)
+
+# options that must be equal for all version managers sharing a repository
+REPOSITORY_OPTION_NAMES = (
+    "git_repo",
+    "git_branch_name",
+    "committer",
+    "git_username",
+    "git_token",
+    "commit_batch_max_delay",
+    "commit_batch_max_changes",
+    "push_mode",
+    "push_retry_base_delay",
+    "push_retry_max_delay",
+    "clone_depth",
+    "clone_single_branch",
+)
+
+
+class GitRepositoryCoordinator:
+    def __init__(self, git_version_manager_cfg):
+        self.__GIT_REPO_FOLDER_PATH = Path(
+            git_version_manager_cfg.get("git_repo_folder_path")
+        )
+        self.__GIT_BRANCH_NAME = git_version_manager_cfg.get("git_branch_name")
+        self.__COMMITTER = git_version_manager_cfg.get("committer")
+
+        self.__GIT_REPO = git_version_manager_cfg.get("git_repo")
+        self.__GIT_USERNAME = git_version_manager_cfg.get("git_username")
+        self.__GIT_TOKEN = git_version_manager_cfg.get("git_token")
+
+        # a missing repository folder is cloned with the last <depth>
+        # commits only and/or with the configured branch only
+        self.__CLONE_DEPTH = git_version_manager_cfg.get("clone_depth")
+        self.__CLONE_SINGLE_BRANCH = git_version_manager_cfg.get(
+            "clone_single_branch", False
+        )
+
+        # changes saved within the batching window are published in a single
+        # commit and push - the window closes after the max delay (seconds)
+        # passes or once the max number of changes is reached
+        self.__COMMIT_BATCH_MAX_DELAY = git_version_manager_cfg.get(
+            "commit_batch_max_delay", 0
+        )
+        self.__COMMIT_BATCH_MAX_CHANGES = git_version_manager_cfg.get(
+            "commit_batch_max_changes", 1
+        )
+
+        # INLINE - every commit is pushed before the update finishes
+        # BACKGROUND - commits are pushed by a scheduler thread that merges
+        # pending commits into one push and retries failed pushes
+        try:
+            push_mode_in_cfg = git_version_manager_cfg.get(
+                "push_mode", GitPushMode.INLINE.name
+            )
+            push_mode = GitPushMode[push_mode_in_cfg]
+        except KeyError:
+            raise ValueError(
+                f"Invalid push mode '{push_mode_in_cfg}' in configuration. "
+                f"Allowed values are: "
+                f"{', '.join([e.name for e in GitPushMode])}"
+            )
+
+        self.__PUSH_MODE = push_mode
+        self.__PUSH_SCHEDULER = None
+        if self.__PUSH_MODE == GitPushMode.BACKGROUND:
+            self.__PUSH_SCHEDULER = GitPushScheduler(
+                self.__GIT_REPO_FOLDER_PATH,
+                self.__GIT_BRANCH_NAME,
+                self.__GIT_REPO,
+                self.get_credentials(),
+                git_version_manager_cfg.get(
+                    "push_retry_base_delay", DEFAULT_RETRY_BASE_DELAY
+                ),
+                git_version_manager_cfg.get(
+                    "push_retry_max_delay", DEFAULT_RETRY_MAX_DELAY
+                ),
+            )
+
+        # held while the working tree is written to or committed
+        self.LOCK = threading.RLock()
+        # (file path, id_hash) of changes that were not published yet
+        self.__pending_changes: List[Tuple[str, str]] = []
+        # number of processors still updating each entity, changes of an
+        # entity are not published until all its processors are done
+        self.__open_updates: Dict[str, int] = {}
+        self.__batch_timer = None
+
+        # the repository is opened (or cloned) once and kept for the lifetime
+        # of the coordinator
+        self.__repo = None
+        # blob ids of files in the HEAD tree, valid while HEAD does not move
+        self.__head_commit_id = None
+        self.__head_blob_ids: dict[bytes, bytes] = {}
+
+        if self.__COMMIT_BATCH_MAX_DELAY > 0:
+            atexit.register(self.publish_pending_changes)
+
+    def set_target_branch(self, repo: Repo) -> None:
+        branches = repo.get_refs()
+        branch_ref = f"refs/heads/{self.__GIT_BRANCH_NAME}".encode()
+
+        # the branch of an empty repository is created by its first commit
+        if branch_ref not in branches and b"HEAD" in branches:
+            repo.refs[branch_ref] = branches[b"HEAD"]
+
+        repo.refs.set_symbolic_ref(b"HEAD", branch_ref)
+
+    def get_head_blob_id(self, repo: Repo, tree_path: bytes) -> bytes:
+        try:
+            head_commit_id = repo.head()
+        except KeyError:
+            # no commit on the branch yet
+            return None
+
+        if head_commit_id != self.__head_commit_id:
+            self.__head_commit_id = head_commit_id
+            self.__head_blob_ids = {}
+
+        if tree_path not in self.__head_blob_ids:
+            head_tree_id = repo[head_commit_id].tree
+            try:
+                _, blob_id = tree_lookup_path(
+                    repo.object_store.__getitem__, head_tree_id, tree_path
+                )
+            except KeyError:
+                blob_id = None
+            self.__head_blob_ids[tree_path] = blob_id
+
+        return self.__head_blob_ids[tree_path]
+
+    def get_tree_path(self, file_path: str) -> bytes:
+        return os.path.relpath(file_path, self.__GIT_REPO_FOLDER_PATH).encode()
+
+    def has_file_changed(
+        self, repo: Repo, file_path: str, file_content: bytes = None
+    ) -> bool:
+        # compares the file with its HEAD version only, the cost does not
+        # depend on the size of the rest of the working tree
+        if file_content is None:
+            with open(file_path, "rb") as saved_file:
+                file_content = saved_file.read()
+        blob_id = Blob.from_string(file_content).id
+
+        return blob_id != self.get_head_blob_id(
+            repo, self.get_tree_path(file_path)
+        )
+
+    def get_committed_file_content(self, repo: Repo, file_path: str) -> bytes:
+        # content of the file in HEAD, None if it was never committed
+        blob_id = self.get_head_blob_id(repo, self.get_tree_path(file_path))
+        if blob_id is None:
+            return None
+        return repo[blob_id].data
+
+    def get_credentials(self) -> dict[str, str]:
+        # local transports (e.g. a bare repository on disk) reject credentials
+        credentials = {
+            "username": self.__GIT_USERNAME,
+            "password": self.__GIT_TOKEN,
+        }
+        return {key: value for key, value in credentials.items() if value}
+
+    def get_repo(self) -> Repo:
+        with self.LOCK:
+            if self.__repo:
+                return self.__repo
+
+            try:
+                repo = Repo(str(self.__GIT_REPO_FOLDER_PATH))
+            except NotGitRepository:
+                repo = self.clone_repo()
+
+            self.set_target_branch(repo)
+            self.__repo = repo
+
+            return repo
+
+    def clone_repo(self) -> Repo:
+        if not self.__CLONE_DEPTH and not self.__CLONE_SINGLE_BRANCH:
+            return porcelain.clone(
+                source=self.__GIT_REPO,
+                target=str(self.__GIT_REPO_FOLDER_PATH),
+                **self.get_credentials(),
+            )
+
+        # porcelain clones always fetch all branches
+        is_folder_created = not self.__GIT_REPO_FOLDER_PATH.exists()
+        self.__GIT_REPO_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        repo = Repo.init(str(self.__GIT_REPO_FOLDER_PATH))
+        try:
+            self.fetch_into_new_repo(repo)
+        except BaseException:
+            repo.close()
+            if is_folder_created:
+                shutil.rmtree(self.__GIT_REPO_FOLDER_PATH)
+            else:
+                shutil.rmtree(self.__GIT_REPO_FOLDER_PATH / ".git")
+            raise
+
+        return repo
+
+    def fetch_into_new_repo(self, repo: Repo) -> None:
+        branch_ref = f"refs/heads/{self.__GIT_BRANCH_NAME}".encode()
+        fetched_branch_name = (
+            self.__GIT_BRANCH_NAME if self.__CLONE_SINGLE_BRANCH else "*"
+        )
+        repo_config = repo.get_config()
+        repo_config.set((b"remote", b"origin"), b"url", self.__GIT_REPO)
+        repo_config.set(
+            (b"remote", b"origin"),
+            b"fetch",
+            f"+refs/heads/{fetched_branch_name}:"
+            f"refs/remotes/origin/{fetched_branch_name}",
+        )
+        repo_config.write_to_path()
+
+        def determine_wants(remote_refs, depth=None):
+            if not self.__CLONE_SINGLE_BRANCH:
+                return list(
+                    {
+                        commit_id
+                        for ref_name, commit_id in remote_refs.items()
+                        if ref_name.startswith(b"refs/heads/")
+                        or ref_name == b"HEAD"
+                    }
+                )
+            # a branch missing on the remote is created from its HEAD
+            wanted_ref = branch_ref if branch_ref in remote_refs else b"HEAD"
+            if wanted_ref not in remote_refs:
+                return []
+            return [remote_refs[wanted_ref]]
+
+        client, path = get_transport_and_path(
+            self.__GIT_REPO, **self.get_credentials()
+        )
+        try:
+            fetch_result = client.fetch(
+                path,
+                repo,
+                determine_wants=determine_wants,
+                depth=self.__CLONE_DEPTH,
+            )
+        except NotImplementedError:
+            # e.g. the local transport does not support shallow fetches
+            logger.warning(
+                "Shallow clone of %s is not supported, cloning full history",
+                self.__GIT_REPO,
+            )
+            fetch_result = client.fetch(
+                path, repo, determine_wants=determine_wants
+            )
+
+        for ref_name, commit_id in fetch_result.refs.items():
+            if (
+                ref_name.startswith(b"refs/heads/")
+                and commit_id in repo.object_store
+            ):
+                repo.refs[
+                    b"refs/remotes/origin/" + ref_name[len(b"refs/heads/"):]
+                ] = commit_id
+
+        head_commit_id = fetch_result.refs.get(
+            branch_ref, fetch_result.refs.get(b"HEAD")
+        )
+        if head_commit_id:
+            repo.refs[branch_ref] = head_commit_id
+            repo.refs.set_symbolic_ref(b"HEAD", branch_ref)
+            repo.reset_index()
+
+    def get_commit_message(self, id_hashes: List[str]) -> bytes:
+        datetime_stamp = datetime.now().isoformat(timespec="seconds")
+        commit_msg = f"Config change on {datetime_stamp}"
+
+        changed_entities = [id_hash for id_hash in id_hashes if id_hash]
+        if changed_entities:
+            commit_msg += "\n\nChanged entities:\n"
+            commit_msg += "\n".join(
+                f"- {id_hash}" for id_hash in dict.fromkeys(changed_entities)
+            )
+
+        return commit_msg.encode()
+
+    def publish_files_to_git(
+        self, repo: Repo, file_paths: List[str], id_hashes: List[str]
+    ) -> None:
+        # ADD changes
+        with GIT_OPERATION_DURATION.time(operation="add"):
+            porcelain.add(repo=repo, paths=list(dict.fromkeys(file_paths)))
+
+        # a file may have been published already by an earlier commit that
+        # included it while it was being updated again
+        index_tree_id = repo.open_index().commit(repo.object_store)
+        try:
+            head_tree_id = repo[repo.head()].tree
+        except KeyError:
+            # no commit on the branch yet
+            head_tree_id = None
+        if index_tree_id != head_tree_id:
+            # COMMIT changes
+            commit_msg = self.get_commit_message(id_hashes)
+            committer = self.__COMMITTER.encode()
+            with GIT_OPERATION_DURATION.time(operation="commit"):
+                porcelain.commit(
+                    repo=repo, message=commit_msg, committer=committer
+                )
+        elif not self.has_unpushed_commits(repo):
+            return
+
+        # PUSH changes - including a commit whose push failed before
+        self.push(repo)
+
+    def push(self, repo: Repo) -> None:
+        match self.__PUSH_MODE:
+            case GitPushMode.INLINE:
+                push_branch(
+                    repo,
+                    self.__GIT_REPO,
+                    self.__GIT_BRANCH_NAME,
+                    self.get_credentials(),
+                )
+            case GitPushMode.BACKGROUND:
+                self.__PUSH_SCHEDULER.request_push(repo)
+
+    def has_unpushed_commits(self, repo: Repo) -> bool:
+        # commits left behind by a failed inline push, the push scheduler
+        # retries its failed pushes by itself
+        if self.__PUSH_MODE != GitPushMode.INLINE:
+            return False
+        branch_ref = f"refs/heads/{self.__GIT_BRANCH_NAME}".encode()
+        tracking_ref = get_tracking_ref(self.__GIT_BRANCH_NAME)
+        if branch_ref not in repo.refs:
+            return False
+        if tracking_ref not in repo.refs:
+            # the branch was never pushed
+            return True
+        return repo.refs[branch_ref] != repo.refs[tracking_ref]
+
+    def get_push_scheduler(self) -> GitPushScheduler:
+        # None unless the commits are pushed in the background
+        return self.__PUSH_SCHEDULER
+
+    def begin_update(self, id_hash: str) -> None:
+        with self.LOCK:
+            self.__open_updates[id_hash] = (
+                self.__open_updates.get(id_hash, 0) + 1
+            )
+
+    def end_update(self, id_hash: str) -> None:
+        with self.LOCK:
+            open_update_count = self.__open_updates.get(id_hash, 0) - 1
+            if open_update_count > 0:
+                self.__open_updates[id_hash] = open_update_count
+            else:
+                self.__open_updates.pop(id_hash, None)
+                self.__publish_if_due()
+
+    def add_pending_change(self, file_path: str, id_hash: str) -> None:
+        with self.LOCK:
+            self.__pending_changes.append((file_path, id_hash))
+            self.__publish_if_due()
+
+    def publish_pending_changes(self) -> None:
+        with self.LOCK:
+            if self.__batch_timer:
+                self.__batch_timer.cancel()
+                self.__batch_timer = None
+
+            ready_changes = self.__get_ready_changes()
+            if not ready_changes:
+                return
+
+            # the changes stay pending until they are published, a failed
+            # publish is repeated with the next one
+            self.publish_files_to_git(
+                self.get_repo(),
+                [file_path for file_path, _ in ready_changes],
+                [id_hash for _, id_hash in ready_changes],
+            )
+            self.__pending_changes = [
+                pending_change
+                for pending_change in self.__pending_changes
+                if pending_change not in ready_changes
+            ]
+
+    def publish_batch(self) -> None:
+        # runs in the timer thread, nobody else would see the error
+        try:
+            self.publish_pending_changes()
+        except Exception:
+            logger.exception(
+                "Failed to publish the pending changes of %s, retrying in "
+                "%s seconds",
+                self.__GIT_REPO_FOLDER_PATH,
+                self.__COMMIT_BATCH_MAX_DELAY,
+            )
+            with self.LOCK:
+                if not self.__batch_timer:
+                    self.__start_batch_timer()
+
+    def __get_ready_changes(self) -> List[Tuple[str, str]]:
+        return [
+            (file_path, id_hash)
+            for file_path, id_hash in self.__pending_changes
+            if id_hash not in self.__open_updates
+        ]
+
+    def __publish_if_due(self) -> None:
+        ready_change_count = len(self.__get_ready_changes())
+        if not ready_change_count:
+            return
+
+        if (
+            self.__COMMIT_BATCH_MAX_DELAY <= 0
+            or ready_change_count >= self.__COMMIT_BATCH_MAX_CHANGES
+        ):
+            self.publish_pending_changes()
+        elif not self.__batch_timer:
+            self.__start_batch_timer()
+
+    def __start_batch_timer(self) -> None:
+        self.__batch_timer = threading.Timer(
+            self.__COMMIT_BATCH_MAX_DELAY, self.publish_batch
+        )
+        self.__batch_timer.daemon = True
+        self.__batch_timer.start()
+
+
+class GitRepositoryCoordinatorRegistry:
+    def __init__(self):
+        self.__LOCK = threading.Lock()
+        self.__coordinators: Dict[Path, GitRepositoryCoordinator] = {}
+        self.__repository_options: Dict[Path, tuple] = {}
+
+    def get_coordinator(
+        self, git_version_manager_cfg
+    ) -> GitRepositoryCoordinator:
+        repo_folder_path = Path(
+            git_version_manager_cfg.get("git_repo_folder_path")
+        ).resolve()
+        repository_options = tuple(
+            git_version_manager_cfg.get(option_name)
+            for option_name in REPOSITORY_OPTION_NAMES
+        )
+
+        with self.__LOCK:
+            if repo_folder_path not in self.__coordinators:
+                self.__coordinators[repo_folder_path] = (
+                    GitRepositoryCoordinator(git_version_manager_cfg)
+                )
+                self.__repository_options[repo_folder_path] = (
+                    repository_options
+                )
+            elif (
+                self.__repository_options[repo_folder_path]
+                != repository_options
+            ):
+                raise ValueError(
+                    f"Version managers sharing the git repository folder "
+                    f"'{repo_folder_path}' must use the same repository "
+                    f"settings: {', '.join(REPOSITORY_OPTION_NAMES)}"
+                )
+
+            return self.__coordinators[repo_folder_path]
+
+    def open_repositories(self, max_workers: int = None) -> None:
+        # repositories are opened (or cloned) in parallel, a repository that
+        # fails to open is opened again by its first update
+        with self.__LOCK:
+            coordinators = dict(self.__coordinators)
+        if not coordinators:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or len(coordinators),
+            thread_name_prefix="git-warm-up",
+        ) as executor:
+            repo_futures = {
+                executor.submit(coordinator.get_repo): repo_folder_path
+                for repo_folder_path, coordinator in coordinators.items()
+            }
+            for repo_future in as_completed(repo_futures):
+                if repo_future.exception():
+                    logger.error(
+                        "Failed to open git repository in %s: %s",
+                        repo_futures[repo_future],
+                        repo_future.exception(),
+                    )
+
+    def get_push_statuses(self) -> List[Dict[str, Any]]:
+        with self.__LOCK:
+            coordinators = list(self.__coordinators.values())
+
+        return [
+            coordinator.get_push_scheduler().get_status()
+            for coordinator in coordinators
+            if coordinator.get_push_scheduler()
+        ]
+
+
+# one coordinator per repository folder for the whole process
+git_repository_coordinators = GitRepositoryCoordinatorRegistry()
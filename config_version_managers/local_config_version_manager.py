@@ -1,14 +1,27 @@
 import os
+import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, List, Union
 
+from config_version_managers.delta_store import (DEFAULT_KEYFRAME_INTERVAL,
+                                                 DeltaStore)
 from config_version_managers.file_config_version_manager import \
     FileConfigVersionManager
+from config_version_managers.snapshot_store import SnapshotStore
+from entities.remote_entity import RemoteEntity
 from enums.config_file_format import ConfigFileFormat
+from enums.local_storage_mode import LocalStorageMode
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
 
 class LocalConfigVersionManager(FileConfigVersionManager):
+    __SNAPSHOT_FOLDER_NAMES = {
+        LocalStorageMode.SNAPSHOTS: ".snapshots",
+        LocalStorageMode.DELTAS: ".deltas",
+    }
+
     def __init__(self, local_version_manager_cfg):
         super().__init__(local_version_manager_cfg)
 
@@ -16,15 +29,228 @@ class LocalConfigVersionManager(FileConfigVersionManager):
             local_version_manager_cfg.get("config_folder_path")
         )
 
+        try:
+            storage_mode_in_cfg = local_version_manager_cfg.get(
+                "storage_mode", LocalStorageMode.TIMESTAMPED_FILES.name
+            )
+            storage_mode = LocalStorageMode[storage_mode_in_cfg]
+        except KeyError:
+            raise ValueError(
+                f"Invalid storage mode '{storage_mode_in_cfg}' in "
+                f"configuration. "
+                f"Allowed values are: "
+                f"{', '.join([e.name for e in LocalStorageMode])}"
+            )
+
+        self.__STORAGE_MODE = storage_mode
+        # snapshots beyond the count or older than the max age (seconds) are
+        # removed, the latest snapshot is always kept
+        self.__SNAPSHOT_RETENTION_COUNT = local_version_manager_cfg.get(
+            "snapshot_retention_count"
+        )
+        self.__SNAPSHOT_RETENTION_MAX_AGE = local_version_manager_cfg.get(
+            "snapshot_retention_max_age"
+        )
+        # DELTAS store a full keyframe every <interval> snapshots, reading a
+        # snapshot applies at most <interval - 1> deltas
+        self.__DELTA_KEYFRAME_INTERVAL = local_version_manager_cfg.get(
+            "delta_keyframe_interval", DEFAULT_KEYFRAME_INTERVAL
+        )
+        self.__snapshot_stores: Dict[
+            str, Union[SnapshotStore, DeltaStore]
+        ] = {}
+
+    def get_output_target(self, output_format: ConfigFileFormat) -> str:
+        return os.path.join(
+            self.__CONFIG_FOLDER_PATH,
+            self._CONFIG_FILE_NAME + self.get_file_extension(output_format),
+        )
+
+    def get_snapshot_store(
+        self, output_target: str
+    ) -> Union[SnapshotStore, DeltaStore]:
+        # every output file has its own history
+        with self._WRITE_LOCK:
+            if output_target not in self.__snapshot_stores:
+                store_folder_path = (
+                    self.__CONFIG_FOLDER_PATH
+                    / self.__SNAPSHOT_FOLDER_NAMES[self.__STORAGE_MODE]
+                    / os.path.basename(output_target)
+                )
+                match self.__STORAGE_MODE:
+                    case LocalStorageMode.SNAPSHOTS:
+                        snapshot_store = SnapshotStore(
+                            store_folder_path,
+                            self.write_config_file,
+                            self.sync_file,
+                            self.__SNAPSHOT_RETENTION_COUNT,
+                            self.__SNAPSHOT_RETENTION_MAX_AGE,
+                        )
+                    case LocalStorageMode.DELTAS:
+                        snapshot_store = DeltaStore(
+                            store_folder_path,
+                            self.write_config_file,
+                            self.sync_file,
+                            self.__SNAPSHOT_RETENTION_COUNT,
+                            self.__SNAPSHOT_RETENTION_MAX_AGE,
+                            self.__DELTA_KEYFRAME_INTERVAL,
+                        )
+                    case _:
+                        raise ValueError(
+                            f"Storage mode '{self.__STORAGE_MODE.name}' "
+                            f"does not use a snapshot store."
+                        )
+                self.__snapshot_stores[output_target] = snapshot_store
+            return self.__snapshot_stores[output_target]
+
+    def get_timestamped_file_names(self, output_target: str) -> List[str]:
+        _, extension = os.path.splitext(output_target)
+        timestamped_file_name_regex = re.compile(
+            rf"^{re.escape(self._CONFIG_FILE_NAME)}_"
+            rf"\d{{4}}-\d{{2}}-\d{{2}}T\d{{2}}:\d{{2}}:\d{{2}}"
+            rf"{re.escape(extension)}$"
+        )
+        if not self.__CONFIG_FOLDER_PATH.is_dir():
+            return []
+
+        # ISO timestamps sort chronologically
+        return sorted(
+            file_name
+            for file_name in os.listdir(self.__CONFIG_FOLDER_PATH)
+            if timestamped_file_name_regex.match(file_name)
+        )
+
+    def load_configuration(
+        self,
+        output_format: ConfigFileFormat = None,
+        as_of: datetime = None,
+    ) -> bytes:
+        # the latest saved config, or the one that was current at <as_of>
+        output_target = self.get_output_target(
+            output_format or self._CONFIG_FILE_FORMAT
+        )
+
+        match self.__STORAGE_MODE:
+            case LocalStorageMode.SNAPSHOTS | LocalStorageMode.DELTAS:
+                snapshot_store = self.get_snapshot_store(output_target)
+                snapshot = (
+                    snapshot_store.get_as_of(as_of.timestamp())
+                    if as_of
+                    else snapshot_store.get_latest()
+                )
+                return snapshot_store.read(snapshot) if snapshot else None
+            case LocalStorageMode.TIMESTAMPED_FILES:
+                saved_file_names = self.get_timestamped_file_names(
+                    output_target
+                )
+                if as_of:
+                    # file names hold the local time without a time zone
+                    saved_at_limit = (
+                        f"{self._CONFIG_FILE_NAME}_"
+                        f"{as_of.astimezone().strftime(TIMESTAMP_FORMAT)}"
+                    )
+                    saved_file_names = [
+                        file_name
+                        for file_name in saved_file_names
+                        if os.path.splitext(file_name)[0] <= saved_at_limit
+                    ]
+                if not saved_file_names:
+                    return None
+
+                latest_file_path = (
+                    self.__CONFIG_FOLDER_PATH / saved_file_names[-1]
+                )
+                with open(latest_file_path, "rb") as latest_file:
+                    return latest_file.read()
+
+    def load_last_written_config(self, output_target: str) -> bytes:
+        _, extension = os.path.splitext(output_target)
+        output_format = ConfigFileFormat[extension[1:].upper()]
+        return self.load_configuration(output_format)
+
     def save_configuration(
-        self, config: dict[str, Any], output_format: ConfigFileFormat = None
+        self,
+        config: dict[str, Any],
+        entity: RemoteEntity = None,
+        output_format: ConfigFileFormat = None,
     ) -> None:
-        self.__CONFIG_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        if not output_format:
+            output_format = self._CONFIG_FILE_FORMAT
 
-        generic_file_path = os.path.join(
-            self.__CONFIG_FOLDER_PATH, self._CONFIG_FILE_NAME
-        )
-        datetime_stamp = datetime.now().isoformat(timespec="seconds")
-        specific_file_path = f"{generic_file_path}_{datetime_stamp}"
+        serialized_config = self.serialize_config(config, output_format)
+        digest = self.get_config_digest(serialized_config)
+        output_target = self.get_output_target(output_format)
+
+        with self._WRITE_LOCK:
+            if self.is_duplicate_config(output_target, digest):
+                return
+
+            self.__CONFIG_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+            match self.__STORAGE_MODE:
+                case LocalStorageMode.SNAPSHOTS | LocalStorageMode.DELTAS:
+                    self.get_snapshot_store(output_target).save(
+                        serialized_config
+                    )
+                    # the current config is always available under its name
+                    self.write_config_file(output_target, serialized_config)
+                case LocalStorageMode.TIMESTAMPED_FILES:
+                    generic_file_path, extension = os.path.splitext(
+                        output_target
+                    )
+                    datetime_stamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+                    self.write_config_file(
+                        f"{generic_file_path}_{datetime_stamp}{extension}",
+                        serialized_config,
+                    )
+
+            self.remember_written_config(output_target, digest)
+
+    def migrate_timestamped_files(self, remove_migrated=False) -> int:
+        # moves the history kept as timestamped files into the snapshot store
+        # of the storage mode, files already in the store are skipped
+        migrated_file_count = 0
+
+        with self._WRITE_LOCK:
+            for output_format in ConfigFileFormat:
+                output_target = self.get_output_target(output_format)
+                snapshot_store = self.get_snapshot_store(output_target)
+                latest_snapshot = snapshot_store.get_latest()
+
+                saved_file_names = self.get_timestamped_file_names(
+                    output_target
+                )
+                for file_name in saved_file_names:
+                    generic_file_name, _ = os.path.splitext(file_name)
+                    saved_at = datetime.strptime(
+                        generic_file_name[len(self._CONFIG_FILE_NAME) + 1:],
+                        TIMESTAMP_FORMAT,
+                    ).timestamp()
+                    if (
+                        latest_snapshot
+                        and saved_at <= latest_snapshot.timestamp
+                    ):
+                        continue
+
+                    with open(
+                        self.__CONFIG_FOLDER_PATH / file_name, "rb"
+                    ) as saved_file:
+                        latest_snapshot = snapshot_store.save(
+                            saved_file.read(), saved_at
+                        )
+                    migrated_file_count += 1
+
+                if not saved_file_names:
+                    continue
+
+                # the current config is written like by a regular save
+                latest_config = snapshot_store.read(latest_snapshot)
+                self.write_config_file(output_target, latest_config)
+                self.remember_written_config(
+                    output_target, self.get_config_digest(latest_config)
+                )
+
+                if remove_migrated:
+                    for file_name in saved_file_names:
+                        os.remove(self.__CONFIG_FOLDER_PATH / file_name)
 
-        self.save_config_to_file(specific_file_path, config, output_format)
+        return migrated_file_count
@@ -0,0 +1,228 @@
+import os
+import struct
+import threading
+import time
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# index records are fixed-size so that the n-th record is found by seeking:
+# unix timestamp (float64) + raw sha256 digest of the snapshot content
+INDEX_RECORD = struct.Struct(">d32s")
+
+
+class Snapshot:
+    __slots__ = ("timestamp", "digest")
+
+    def __init__(self, timestamp: float, digest: str):
+        self.timestamp = timestamp
+        self.digest = digest
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Snapshot)
+            and self.timestamp == other.timestamp
+            and self.digest == other.digest
+        )
+
+    def __repr__(self) -> str:
+        return f"Snapshot(timestamp={self.timestamp}, digest={self.digest})"
+
+
+class SnapshotStore:
+    __INDEX_FILE_NAME = "index"
+    __BLOB_FOLDER_NAME = "blobs"
+
+    def __init__(
+        self,
+        store_folder_path: Path,
+        write_file: Callable[[str, bytes], None],
+        sync_file: Callable[[str], None],
+        retention_count: int = None,
+        retention_max_age: float = None,
+    ):
+        self.__INDEX_FILE_PATH = store_folder_path / self.__INDEX_FILE_NAME
+        self.__BLOB_FOLDER_PATH = store_folder_path / self.__BLOB_FOLDER_NAME
+        # writes and syncs follow the durability of the version manager
+        self.__WRITE_FILE = write_file
+        self.__SYNC_FILE = sync_file
+        self.__RETENTION_COUNT = retention_count
+        self.__RETENTION_MAX_AGE = retention_max_age
+        self.__LOCK = threading.RLock()
+
+        self.__index_file = None
+        self.__record_count = 0
+        self.__latest_snapshot: Optional[Snapshot] = None
+
+    def open(self) -> None:
+        with self.__LOCK:
+            if self.__index_file:
+                return
+
+            self.__BLOB_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+            self.__index_file = open(self.__INDEX_FILE_PATH, "a+b")
+
+            # a torn record of a write interrupted by a crash is dropped
+            index_size = self.__index_file.seek(0, os.SEEK_END)
+            if index_size % INDEX_RECORD.size:
+                self.__index_file.truncate(
+                    index_size - index_size % INDEX_RECORD.size
+                )
+            self.__record_count = index_size // INDEX_RECORD.size
+            self.__latest_snapshot = (
+                self.__read_record(self.__record_count - 1)
+                if self.__record_count
+                else None
+            )
+
+    def close(self) -> None:
+        with self.__LOCK:
+            if self.__index_file:
+                self.__index_file.close()
+                self.__index_file = None
+
+    def __len__(self) -> int:
+        with self.__LOCK:
+            self.open()
+            return self.__record_count
+
+    def get_blob_path(self, digest: str) -> Path:
+        return self.__BLOB_FOLDER_PATH / digest[:2] / digest
+
+    def save(self, content: bytes, timestamp: float = None) -> Snapshot:
+        digest = sha256(content).hexdigest()
+
+        with self.__LOCK:
+            self.open()
+
+            # identical contents are stored once
+            blob_path = self.get_blob_path(digest)
+            if not blob_path.is_file():
+                blob_path.parent.mkdir(exist_ok=True)
+                self.__WRITE_FILE(str(blob_path), content)
+
+            # timestamps never decrease so that the index stays sorted even
+            # if the clock is set back
+            timestamp = time.time() if timestamp is None else timestamp
+            if self.__latest_snapshot:
+                timestamp = max(timestamp, self.__latest_snapshot.timestamp)
+
+            self.__index_file.write(
+                INDEX_RECORD.pack(timestamp, bytes.fromhex(digest))
+            )
+            self.__index_file.flush()
+            self.__SYNC_FILE(str(self.__INDEX_FILE_PATH))
+
+            self.__record_count += 1
+            self.__latest_snapshot = Snapshot(timestamp, digest)
+            latest_snapshot = self.__latest_snapshot
+
+            if self.__get_expired_record_count(timestamp) * 2 > max(
+                self.__record_count, 2
+            ):
+                # expired records are removed once they make up half of the
+                # index, so the cost of compaction is amortized over saves
+                self.compact(timestamp)
+
+            return latest_snapshot
+
+    def get_latest(self) -> Optional[Snapshot]:
+        with self.__LOCK:
+            self.open()
+            return self.__latest_snapshot
+
+    def get_as_of(self, timestamp: float) -> Optional[Snapshot]:
+        # the last snapshot saved at or before the timestamp
+        with self.__LOCK:
+            self.open()
+            position = self.__bisect_right(timestamp)
+            if not position:
+                return None
+            return self.__read_record(position - 1)
+
+    def get_snapshots(self) -> List[Snapshot]:
+        with self.__LOCK:
+            self.open()
+            return [
+                self.__read_record(position)
+                for position in range(self.__record_count)
+            ]
+
+    def read(self, snapshot: Snapshot) -> bytes:
+        with open(self.get_blob_path(snapshot.digest), "rb") as blob_file:
+            return blob_file.read()
+
+    def compact(self, now: float = None) -> None:
+        now = time.time() if now is None else now
+
+        with self.__LOCK:
+            self.open()
+            expired_record_count = self.__get_expired_record_count(now)
+            if expired_record_count <= 0:
+                return
+            retained_snapshots = self.get_snapshots()[expired_record_count:]
+
+            # the index is rewritten next to the old one and replaces it
+            tmp_index_file_path = self.__INDEX_FILE_PATH.with_suffix(".tmp")
+            self.__WRITE_FILE(
+                str(tmp_index_file_path),
+                b"".join(
+                    INDEX_RECORD.pack(
+                        snapshot.timestamp, bytes.fromhex(snapshot.digest)
+                    )
+                    for snapshot in retained_snapshots
+                ),
+            )
+            self.close()
+            os.replace(tmp_index_file_path, self.__INDEX_FILE_PATH)
+            self.__SYNC_FILE(str(self.__INDEX_FILE_PATH))
+            self.open()
+
+            # blobs of removed snapshots are deleted unless a retained
+            # snapshot has the same content
+            retained_digests = {
+                snapshot.digest for snapshot in retained_snapshots
+            }
+            for blob_prefix_path in self.__BLOB_FOLDER_PATH.iterdir():
+                for blob_path in blob_prefix_path.iterdir():
+                    if blob_path.name not in retained_digests:
+                        blob_path.unlink()
+                if not any(blob_prefix_path.iterdir()):
+                    blob_prefix_path.rmdir()
+
+    def __get_expired_record_count(self, now: float) -> int:
+        # the latest snapshot is always retained
+        expired_record_count = 0
+        if self.__RETENTION_COUNT:
+            expired_record_count = max(
+                0, self.__record_count - self.__RETENTION_COUNT
+            )
+        if self.__RETENTION_MAX_AGE:
+            expired_record_count = max(
+                expired_record_count,
+                self.__bisect_right(now - self.__RETENTION_MAX_AGE, True),
+            )
+        return min(expired_record_count, self.__record_count - 1)
+
+    def __bisect_right(self, timestamp: float, exclusive=False) -> int:
+        # number of records with timestamps up to the timestamp, or only
+        # before it if exclusive
+        low, high = 0, self.__record_count
+        while low < high:
+            middle = (low + high) // 2
+            middle_timestamp = self.__read_record(middle).timestamp
+            if middle_timestamp < timestamp or (
+                not exclusive and middle_timestamp == timestamp
+            ):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def __read_record(self, position: int) -> Snapshot:
+        self.__index_file.seek(position * INDEX_RECORD.size)
+        timestamp, raw_digest = INDEX_RECORD.unpack(
+            self.__index_file.read(INDEX_RECORD.size)
+        )
+        # the file is opened for appending, writes still go to its end
+        return Snapshot(timestamp, raw_digest.hex())
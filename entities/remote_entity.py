@@ -0,0 +1,91 @@
+from typing import Any, Dict, Tuple
+
+
+class RemoteEntity:
+    __slots__ = (
+        "entity_type",
+        "id_hash",
+        "name",
+        "description",
+        "is_active",
+        "updated_at",
+    )
+
+    def __init__(self, **attributes):
+        # attributes missing in the received data default to an empty string
+        # as the config processors always did
+        for attribute_name in self.get_attribute_names():
+            object.__setattr__(
+                self, attribute_name, attributes.get(attribute_name, "")
+            )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other: Any) -> bool:
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.id_hash))
+
+    def __repr__(self) -> str:
+        return (
+            f"{type(self).__name__}(id_hash={self.id_hash!r}, "
+            f"name={self.name!r})"
+        )
+
+    @classmethod
+    def get_attribute_names(cls) -> Tuple[str, ...]:
+        attribute_names = ()
+        for klass in reversed(cls.__mro__):
+            attribute_names += klass.__dict__.get("__slots__", ())
+        return attribute_names
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            attribute_name: getattr(self, attribute_name)
+            for attribute_name in self.get_attribute_names()
+        }
+
+    @staticmethod
+    def from_data(data: Dict[str, Any]) -> "RemoteEntity":
+        entity_class = ENTITY_TYPE_CLASSES.get(
+            data.get("entity_type"), RemoteEntity
+        )
+        return entity_class(**data)
+
+
+class SamlEntity(RemoteEntity):
+    __slots__ = ("entity_id", "metadata_url")
+
+
+class SamlSpEntity(SamlEntity):
+    __slots__ = ()
+
+
+class SamlIdpEntity(SamlEntity):
+    __slots__ = ()
+
+
+class OidcRpEntity(RemoteEntity):
+    __slots__ = (
+        "client_id",
+        "client_secret",
+        "redirect_uri",
+        "dynamic_registration",
+    )
+
+
+class OidcOpEntity(RemoteEntity):
+    __slots__ = ("client_id", "discovery_url")
+
+
+ENTITY_TYPE_CLASSES = {
+    "SAML_SP": SamlSpEntity,
+    "SAML_IDP": SamlIdpEntity,
+    "OIDC_RP": OidcRpEntity,
+    "OIDC_OP": OidcOpEntity,
+}
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class EntityFilterType(Enum):
+    ID_HASH = "id_hash"
+    ID_HASH_PREFIX = "id_hash_prefix"
+    ENTITY_TYPE = "entity_type"
@@ -0,0 +1,6 @@
+from enum import Enum
+
+
+class GitPushMode(Enum):
+    INLINE = 1
+    BACKGROUND = 2
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class LocalStorageMode(Enum):
+    TIMESTAMPED_FILES = 1
+    SNAPSHOTS = 2
+    DELTAS = 3
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class ProcessorUpdateStatus(Enum):
+    UPDATED = "updated"
+    FAILED = "failed"
+    TIMED_OUT = "timed_out"
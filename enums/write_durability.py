@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class WriteDurability(Enum):
+    ALWAYS = 1
+    BATCH = 2
+    NONE = 3
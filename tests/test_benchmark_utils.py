@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.benchmark_utils import (BenchmarkResult, compare_results,
+                                        load_results, save_results)
+from benchmarks.entity_generators import generate_entities
+from utils.data_validator import validate_entity_data
+
+
+class TestBenchmarkUtils(unittest.TestCase):
+    def test_saved_results_are_loaded(self):
+        results_by_suite = {"suite": [BenchmarkResult("first", 10, 0.5)]}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "results.json")
+            save_results(results_by_suite, file_path)
+            loaded_results = load_results(file_path)
+
+        self.assertEqual(["suite"], list(loaded_results))
+        self.assertEqual(
+            [{"name": "first", "operations": 10, "seconds": 0.5}],
+            [result.to_dict() for result in loaded_results["suite"]],
+        )
+
+    def test_slowdown_over_threshold_is_regression(self):
+        baseline = {
+            "suite": [
+                BenchmarkResult("slower", 100, 1.0),
+                BenchmarkResult("same", 100, 1.0),
+                BenchmarkResult("removed", 100, 1.0),
+            ]
+        }
+        current = {
+            "suite": [
+                # time per operation matters, not the number of operations
+                BenchmarkResult("slower", 50, 0.6),
+                BenchmarkResult("same", 100, 1.05),
+                BenchmarkResult("added", 100, 1.0),
+            ]
+        }
+
+        comparisons = compare_results(baseline, current, 0.1)
+
+        self.assertEqual(
+            {"suite: slower": True, "suite: same": False},
+            {c.name: c.is_regression for c in comparisons},
+        )
+        self.assertAlmostEqual(0.2, comparisons[0].change)
+
+    def test_generated_entities_are_valid(self):
+        entities_data = generate_entities(20, seed=1)
+
+        self.assertEqual(entities_data, generate_entities(20, seed=1))
+        self.assertEqual(
+            20, len({entity_data["id_hash"] for entity_data in entities_data})
+        )
+        for entity_data in entities_data:
+            self.assertTrue(validate_entity_data(entity_data).has_valid_data)
@@ -0,0 +1,95 @@
+import glob
+import os
+import unittest
+
+import yaml
+
+from config_version_managers.config_serializers import (
+    CONFIG_SERIALIZERS, serialize_config_json_orjson,
+    serialize_config_json_stdlib, serialize_config_yaml_libyaml,
+    serialize_config_yaml_pure)
+from enums.config_file_format import ConfigFileFormat
+
+TEMPLATE_FOLDER_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "..",
+    "config_processors",
+    "satosa",
+    "base_config_templates",
+)
+
+EDGE_CASE_CONFIGS = [
+    {"": "empty key", "nested": [{"": 1}], "block": {"": {"a": 1}}},
+    {"": "word " * 40, "multiline": {"": "first\nsecond"}},
+    {"floats": [0.1, 1e16, 1e-07, -2.5e300, 100.0], "exp": 1e22},
+    {"hash": "3e5d7e9e", "text": "value 1e5", 'quote": 1e5': 1},
+    {"unicode": "Žluťoučký kůň", "emoji": "\U0001f600"},
+    {"big_int": 10**30, "int_keys": {1: "a"}},
+    {"long": "word " * 100, "multiline": "first\nsecond\n"},
+    {"empty": {}, "empty_list": [], "none": None, "bool": True},
+    {"nan": float("nan"), "inf": [float("inf"), float("-inf")]},
+    {"small": [1e-05, 0.0001, 5e-324], "big": 1e15},
+    {"name": "Université Paris-Saclay " * 10, "note": "Müller " * 30},
+    {"quoted": "Zürich: " * 40, "escaped": "é\t" * 60, "spaces": "a  " * 99},
+    {"control": "a\x7fb", "tab": "a\tb", "null": "\x00", "del\x7f": 1},
+]
+
+
+def load_template_configs():
+    template_paths = glob.glob(
+        os.path.join(TEMPLATE_FOLDER_PATH, "**", "*.yaml"), recursive=True
+    )
+    template_configs = []
+    for template_path in sorted(template_paths):
+        with open(template_path) as template_file:
+            template_configs.append(yaml.safe_load(template_file))
+    return template_configs
+
+
+class TestConfigSerializers(unittest.TestCase):
+    def setUp(self):
+        self.configs = load_template_configs() + EDGE_CASE_CONFIGS
+
+    @unittest.skipIf(
+        serialize_config_yaml_libyaml is None, "PyYAML built without libyaml"
+    )
+    def test_libyaml_output_matches_pure_python_output(self):
+        for config in self.configs:
+            with self.subTest(config=config):
+                self.assertEqual(
+                    serialize_config_yaml_pure(config),
+                    serialize_config_yaml_libyaml(config),
+                )
+
+    def test_yaml_output_is_stable(self):
+        for config in self.configs:
+            with self.subTest(config=config):
+                serialized_config = CONFIG_SERIALIZERS[
+                    ConfigFileFormat.YAML
+                ](config)
+                self.assertEqual(
+                    serialized_config,
+                    serialize_config_yaml_pure(
+                        yaml.safe_load(serialized_config)
+                    ),
+                )
+
+    def test_orjson_output_matches_stdlib_output(self):
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            self.skipTest("orjson is not installed")
+
+        for config in self.configs:
+            with self.subTest(config=config):
+                self.assertEqual(
+                    serialize_config_json_stdlib(config),
+                    serialize_config_json_orjson(config),
+                )
+
+    def test_every_file_format_has_a_serializer(self):
+        self.assertEqual(set(ConfigFileFormat), set(CONFIG_SERIALIZERS))
+
+
+if __name__ == "__main__":
+    unittest.main()
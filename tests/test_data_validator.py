@@ -3,7 +3,8 @@ import unittest
 from flask import Flask, Request
 from flask.testing import EnvironBuilder
 
-from utils.data_validator import validate_data
+from utils.data_validator import (validate_data, validate_entity_data,
+                                  validate_manifest_data)
 
 FULL_VALID_SAML_DATA = {
     "id": 1,
@@ -74,6 +75,11 @@ INVALID_SAML_DATA_NO_ID_HASH = {
     "entity_type": "SAML_SP",
 }
 
+INVALID_SAML_DATA_NO_ID_HASH_NO_ENTITY_ID = {
+    "metadata_url": "https://example-metadata-url.com",
+    "entity_type": "SAML_SP",
+}
+
 INVALID_SAML_DATA_NO_ENTITY_TYPE = {
     "entity_id": "test_entityid_3",
     "metadata_url": "https://example-metadata-url.co",
@@ -228,6 +234,19 @@ class TestDataValidator(unittest.TestCase):
             str(validation_result.message),
         )
 
+    def test_invalid_saml_data_no_id_hash_no_entity_id(self):
+        validation_result = self.get_validation_result(
+            INVALID_SAML_DATA_NO_ID_HASH_NO_ENTITY_ID
+        )
+        self.assertEqual(False, validation_result.has_valid_data)
+        self.assertEqual(
+            {
+                "entity_id": ["Missing data for required field."],
+                "id_hash": ["Missing data for required field."],
+            },
+            validation_result.message,
+        )
+
     def test_invalid_saml_data_no_entity_type(self):
         validation_result = self.get_validation_result(
             INVALID_SAML_DATA_NO_ENTITY_TYPE
@@ -249,6 +268,10 @@ class TestDataValidator(unittest.TestCase):
             str(validation_result.message),
         )
 
+    def test_invalid_entity_data_not_object(self):
+        validation_result = validate_entity_data(["SAML_SP"])
+        self.assertEqual(False, validation_result.has_valid_data)
+
     def test_minimal_valid_oidc_op_data(self):
         validation_result = self.get_validation_result(
             MINIMAL_VALID_OIDC_OP_DATA
@@ -297,6 +320,21 @@ class TestDataValidator(unittest.TestCase):
         )
         self.assertEqual(True, validation_result.has_valid_data)
 
+    def test_string_booleans_are_loaded_as_booleans(self):
+        for sent_value, loaded_value in (("false", False), ("true", True)):
+            with self.subTest(sent_value=sent_value):
+                validation_result = self.get_validation_result(
+                    {
+                        **MINIMAL_VALID_OIDC_RP_STATIC_REGISTRATION_DATA,
+                        "dynamic_registration": sent_value,
+                    }
+                )
+                self.assertEqual(True, validation_result.has_valid_data)
+                self.assertIs(
+                    loaded_value,
+                    validation_result.entity.dynamic_registration,
+                )
+
     def invalid_oidc_rp_static_registration_data_no_client_secret(self):
         validation_result = self.get_validation_result(
             INVALID_OIDC_RP_STATIC_REGISTRATION_DATA_NO_CLIENT_SECRET
@@ -307,6 +345,28 @@ class TestDataValidator(unittest.TestCase):
             str(validation_result.message),
         )
 
+    def test_valid_manifest_data(self):
+        id_hash = REDUCED_VALID_SAML_DATA["id_hash"]
+        result = validate_manifest_data(
+            {"manifest": [[id_hash, "A" * 64]]}
+        )
+
+        self.assertTrue(result.has_valid_data)
+        self.assertEqual([(id_hash, "a" * 64)], result.manifest)
+
+    def test_invalid_manifest_data(self):
+        id_hash = REDUCED_VALID_SAML_DATA["id_hash"]
+        for data in (
+            None,
+            {},
+            {"manifest": {}},
+            {"manifest": [[id_hash]]},
+            {"manifest": [[id_hash, "not a digest"]]},
+            {"manifest": [{"id_hash": id_hash}]},
+        ):
+            with self.subTest(data=data):
+                self.assertFalse(validate_manifest_data(data).has_valid_data)
+
 
 if __name__ == "__main__":
     unittest.main()
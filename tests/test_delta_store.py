@@ -0,0 +1,141 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from config_version_managers.delta_store import (DeltaStore, apply_delta,
+                                                 encode_delta)
+
+
+def write_file(file_path: str, content: bytes) -> None:
+    with open(file_path, "wb") as written_file:
+        written_file.write(content)
+
+
+def sync_file(file_path: str) -> None:
+    pass
+
+
+def get_config(version: int, line_count: int = 200) -> bytes:
+    lines = [f"entity_{i}: value_{i}\n" for i in range(line_count)]
+    lines[version % line_count] = f"entity_{version}: changed_{version}\n"
+    return "".join(lines).encode()
+
+
+class TestDeltaEncoding(unittest.TestCase):
+    def test_delta_reproduces_content(self):
+        cases = [
+            (b"", b""),
+            (b"", b"a\n"),
+            (b"a\nb\nc\n", b""),
+            (b"a\nb\nc\n", b"a\nx\nc\n"),
+            (b"a\nb\nc", b"a\nb\nc\nd"),
+            (b"a\r\nb\r\n", b"b\r\na\r\n"),
+            (get_config(1), get_config(2)),
+        ]
+        for base, content in cases:
+            with self.subTest(base=base[:20], content=content[:20]):
+                self.assertEqual(
+                    content, apply_delta(base, encode_delta(base, content))
+                )
+
+    def test_delta_of_small_change_is_small(self):
+        delta = encode_delta(get_config(1), get_config(2))
+        self.assertLess(len(delta), 100)
+
+
+class TestDeltaStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_folder_path = Path(self.tmp_dir.name) / "store"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_delta_store(self, **kwargs):
+        return DeltaStore(
+            self.store_folder_path, write_file, sync_file, **kwargs
+        )
+
+    def get_segment_names(self):
+        return sorted(os.listdir(self.store_folder_path / "segments"))
+
+    def test_every_version_is_reconstructed(self):
+        delta_store = self.get_delta_store(keyframe_interval=4)
+        for version in range(10):
+            delta_store.save(get_config(version), version)
+        delta_store.close()
+
+        reopened_store = self.get_delta_store(keyframe_interval=4)
+        for version in range(10):
+            snapshot = reopened_store.get_as_of(version + 0.5)
+            self.assertEqual(
+                get_config(version), reopened_store.read(snapshot)
+            )
+        self.assertIsNone(reopened_store.get_as_of(-1))
+
+    def test_keyframes_bound_the_delta_chains(self):
+        delta_store = self.get_delta_store(keyframe_interval=4)
+        for version in range(10):
+            delta_store.save(get_config(version), version)
+
+        self.assertEqual(3, len(self.get_segment_names()))
+
+    def test_history_is_smaller_than_full_copies(self):
+        delta_store = self.get_delta_store()
+        for version in range(32):
+            delta_store.save(get_config(version), version)
+
+        segment_size = sum(
+            os.path.getsize(self.store_folder_path / "segments" / name)
+            for name in self.get_segment_names()
+        )
+        self.assertLess(segment_size * 10, len(get_config(0)) * 32)
+
+    def test_saves_continue_after_reopening(self):
+        delta_store = self.get_delta_store()
+        delta_store.save(get_config(1), 1)
+        delta_store.close()
+
+        reopened_store = self.get_delta_store()
+        reopened_store.save(get_config(2), 2)
+        self.assertEqual(
+            [get_config(1), get_config(2)],
+            [
+                reopened_store.read(snapshot)
+                for snapshot in reopened_store.get_snapshots()
+            ],
+        )
+
+    def test_torn_record_is_dropped(self):
+        delta_store = self.get_delta_store()
+        delta_store.save(get_config(1), 1)
+        delta_store.close()
+        with open(self.store_folder_path / "index", "ab") as index_file:
+            index_file.write(b"\x00" * 7)
+
+        reopened_store = self.get_delta_store()
+        self.assertEqual(1, len(reopened_store))
+        reopened_store.save(get_config(2), 2)
+        self.assertEqual(
+            get_config(2), reopened_store.read(reopened_store.get_as_of(2))
+        )
+
+    def test_retention_removes_whole_segments(self):
+        delta_store = self.get_delta_store(
+            keyframe_interval=4, retention_count=3
+        )
+        for version in range(12):
+            delta_store.save(get_config(version), version)
+        delta_store.compact(12)
+
+        # versions 8 to 11 share the segment of the last 3 snapshots
+        self.assertEqual(4, len(delta_store))
+        self.assertEqual(1, len(self.get_segment_names()))
+        self.assertEqual(
+            get_config(9), delta_store.read(delta_store.get_as_of(9))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from utils.entity_hash_tree import EntityHashTree, get_content_digest
+
+
+def get_id_hash(i):
+    return f"{i:064x}"
+
+
+class TestEntityHashTree(unittest.TestCase):
+    def setUp(self):
+        self.pairs = [
+            (get_id_hash(i), get_content_digest({"id": i})) for i in range(100)
+        ]
+
+    def test_content_digest_is_canonical(self):
+        self.assertEqual(
+            get_content_digest({"a": 1, "b": "č"}),
+            get_content_digest({"b": "č", "a": 1}),
+        )
+        self.assertNotEqual(
+            get_content_digest({"a": 1}), get_content_digest({"a": "1"})
+        )
+
+    def test_equal_trees_have_no_differences(self):
+        hash_tree = EntityHashTree.from_pairs(self.pairs, 16)
+        other_hash_tree = EntityHashTree.from_pairs(reversed(self.pairs), 16)
+
+        self.assertEqual(
+            hash_tree.get_root_hash(), other_hash_tree.get_root_hash()
+        )
+        self.assertEqual([], hash_tree.get_differing_buckets(other_hash_tree))
+        self.assertEqual((set(), set()), hash_tree.diff(other_hash_tree))
+
+    def test_only_differing_buckets_are_compared(self):
+        hash_tree = EntityHashTree.from_pairs(self.pairs, 16)
+        other_hash_tree = EntityHashTree.from_pairs(self.pairs, 16)
+        other_hash_tree.set(get_id_hash(3), "changed")
+        other_hash_tree.set(get_id_hash(1000), "added")
+        other_hash_tree.discard(get_id_hash(7))
+
+        differing_buckets = hash_tree.get_differing_buckets(other_hash_tree)
+
+        self.assertEqual(
+            {
+                hash_tree.get_bucket_index(get_id_hash(i))
+                for i in (3, 7, 1000)
+            },
+            set(differing_buckets),
+        )
+        self.assertEqual(
+            ({get_id_hash(3), get_id_hash(1000)}, {get_id_hash(7)}),
+            hash_tree.diff(other_hash_tree),
+        )
+
+    def test_root_hash_follows_changes(self):
+        hash_tree = EntityHashTree.from_pairs(self.pairs, 16)
+        root_hash = hash_tree.get_root_hash()
+
+        hash_tree.set(get_id_hash(3), "changed")
+        self.assertNotEqual(root_hash, hash_tree.get_root_hash())
+
+        hash_tree.set(get_id_hash(3), self.pairs[3][1])
+        self.assertEqual(root_hash, hash_tree.get_root_hash())
+        self.assertEqual(100, len(hash_tree))
+
+    def test_bucket_counts_must_match(self):
+        with self.assertRaises(ValueError):
+            EntityHashTree(16).get_differing_buckets(EntityHashTree(32))
+
+
+if __name__ == "__main__":
+    unittest.main()
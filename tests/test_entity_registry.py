@@ -0,0 +1,182 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+
+from entities.remote_entity import RemoteEntity
+from utils.entity_hash_tree import get_content_digest
+from utils.entity_registry import EntityRegistry
+
+SAML_SP_DATA = {
+    "entity_type": "SAML_SP",
+    "entity_id": "test_entityid_3",
+    "metadata_url": "https://example-metadata-url.com",
+    "id_hash":
+        "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9",
+}
+
+OIDC_RP_DATA = {
+    "entity_type": "OIDC_RP",
+    "client_id": "test_client",
+    "client_secret": "secret",
+    "redirect_uri": "https://example-redirect-uri.com",
+    "id_hash":
+        "ee17d43ddcbf50090b137e83569dea155a5916e212f5d760c223b76ae8ed2de2",
+}
+
+SAML_SP_ENTITY = RemoteEntity.from_data(SAML_SP_DATA)
+OIDC_RP_ENTITY = RemoteEntity.from_data(OIDC_RP_DATA)
+
+
+class TestEntityRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.registry_cfg = {"registry_folder_path": self.tmp_dir.name}
+        self.entity_registry = EntityRegistry(self.registry_cfg)
+        self.entity_registry.load()
+
+    def tearDown(self):
+        self.entity_registry.close()
+        self.tmp_dir.cleanup()
+
+    def test_entities_are_found_by_type_and_processor(self):
+        self.entity_registry.update(SAML_SP_ENTITY, ["cpcl", "satosa"])
+        self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"])
+
+        self.assertEqual(2, len(self.entity_registry.find()))
+        self.assertEqual(
+            [OIDC_RP_DATA["id_hash"]],
+            [r.id_hash for r in self.entity_registry.find("OIDC_RP")],
+        )
+        self.assertEqual(
+            [SAML_SP_DATA["id_hash"]],
+            [r.id_hash for r in self.entity_registry.find(processor="satosa")],
+        )
+        self.assertEqual([], self.entity_registry.find("OIDC_RP", "satosa"))
+
+    def test_updated_entity_is_reindexed(self):
+        self.entity_registry.update(SAML_SP_ENTITY, ["satosa"])
+        self.entity_registry.update(SAML_SP_ENTITY, ["cpcl"])
+
+        self.assertEqual([], self.entity_registry.find(processor="satosa"))
+        self.assertEqual(1, len(self.entity_registry.find(processor="cpcl")))
+
+    def test_registry_is_rebuilt_after_restart(self):
+        self.entity_registry.update(SAML_SP_ENTITY, ["satosa"])
+        self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"])
+        self.entity_registry.update(SAML_SP_ENTITY, ["cpcl"])
+        self.entity_registry.close()
+
+        restarted_registry = EntityRegistry(self.registry_cfg)
+        restarted_registry.load()
+
+        self.assertEqual(2, len(restarted_registry))
+        restarted_record = restarted_registry.get(SAML_SP_DATA["id_hash"])
+        self.assertEqual(["cpcl"], restarted_record.processors)
+        restarted_registry.close()
+
+    def test_secrets_are_not_exposed(self):
+        record = self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"])
+
+        self.assertNotIn(
+            "client_secret", record.to_public_dict()["entity_data"]
+        )
+
+    def test_secrets_are_not_stored(self):
+        self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"], ["cpcl"])
+        self.entity_registry.close()
+        registry_file_path = os.path.join(
+            self.tmp_dir.name, "entity_registry.jsonl"
+        )
+
+        with open(registry_file_path) as registry_file:
+            self.assertNotIn("secret", json.load(registry_file)["entity_data"])
+        self.assertEqual(
+            0o600, stat.S_IMODE(os.stat(registry_file_path).st_mode)
+        )
+
+        restarted_registry = EntityRegistry(self.registry_cfg)
+        restarted_registry.load()
+        oidc_rp_digest = get_content_digest(OIDC_RP_ENTITY.to_dict())
+        manifest_diff = restarted_registry.diff_manifest(
+            [(OIDC_RP_DATA["id_hash"], oidc_rp_digest)]
+        )
+        restarted_registry.close()
+        # the entity cannot be regenerated without its secret
+        self.assertEqual([], manifest_diff.failed_records)
+        self.assertEqual(
+            {OIDC_RP_DATA["id_hash"]}, manifest_diff.changed_id_hashes
+        )
+
+    def test_registry_file_is_compacted_while_running(self):
+        entity_registry = EntityRegistry(
+            {**self.registry_cfg, "compaction_ratio": 2}
+        )
+        entity_registry.load()
+        for _ in range(5000):
+            entity_registry.update(SAML_SP_ENTITY, ["cpcl"])
+        entity_registry.close()
+
+        with open(
+            os.path.join(self.tmp_dir.name, "entity_registry.jsonl")
+        ) as registry_file:
+            self.assertLessEqual(len(registry_file.readlines()), 2001)
+
+    def test_listing_etag_changes_on_update(self):
+        etag = self.entity_registry.get_listing_etag("SAML_SP", None)
+        self.assertEqual(
+            etag, self.entity_registry.get_listing_etag("SAML_SP", None)
+        )
+
+        self.entity_registry.update(SAML_SP_ENTITY, ["cpcl"])
+        self.assertNotEqual(
+            etag, self.entity_registry.get_listing_etag("SAML_SP", None)
+        )
+
+    def test_manifest_diff(self):
+        self.entity_registry.update(SAML_SP_ENTITY, ["cpcl"])
+        self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"], ["cpcl"])
+        saml_sp_digest = get_content_digest(SAML_SP_ENTITY.to_dict())
+        oidc_rp_digest = get_content_digest(OIDC_RP_ENTITY.to_dict())
+        unknown_id_hash = "a" * 64
+
+        manifest_diff = self.entity_registry.diff_manifest(
+            [
+                (SAML_SP_DATA["id_hash"], saml_sp_digest),
+                (OIDC_RP_DATA["id_hash"], oidc_rp_digest),
+            ]
+        )
+        self.assertEqual(set(), manifest_diff.changed_id_hashes)
+        self.assertEqual(set(), manifest_diff.removed_id_hashes)
+        # the failed update is regenerated from the registered data
+        self.assertEqual(
+            [OIDC_RP_DATA["id_hash"]],
+            [r.id_hash for r in manifest_diff.failed_records],
+        )
+
+        manifest_diff = self.entity_registry.diff_manifest(
+            [
+                (SAML_SP_DATA["id_hash"], "b" * 64),
+                (unknown_id_hash, "c" * 64),
+            ]
+        )
+        self.assertEqual(
+            {SAML_SP_DATA["id_hash"], unknown_id_hash},
+            manifest_diff.changed_id_hashes,
+        )
+        self.assertEqual(
+            {OIDC_RP_DATA["id_hash"]}, manifest_diff.removed_id_hashes
+        )
+        self.assertEqual([], manifest_diff.failed_records)
+
+        # a successful update clears the failure
+        self.entity_registry.update(OIDC_RP_ENTITY, ["cpcl"])
+        manifest_diff = self.entity_registry.diff_manifest(
+            [(OIDC_RP_DATA["id_hash"], oidc_rp_digest)]
+        )
+        self.assertEqual([], manifest_diff.failed_records)
+
+
+if __name__ == "__main__":
+    unittest.main()
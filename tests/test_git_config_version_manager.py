@@ -0,0 +1,280 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from dulwich import porcelain
+from dulwich.client import LocalGitClient, SendPackResult
+from dulwich.repo import Repo
+
+from config_version_managers import git_config_version_manager
+from config_version_managers.file_config_version_manager import \
+    DEDUPLICATED_UPDATES
+from config_version_managers.git_config_version_manager import \
+    GitConfigVersionManager
+from config_version_managers.git_push_scheduler import GitPushError
+from config_version_managers.git_repository_coordinator import (
+    GitRepositoryCoordinator, GitRepositoryCoordinatorRegistry)
+from entities.remote_entity import RemoteEntity
+
+FIRST_ID_HASH = "1" * 64
+SECOND_ID_HASH = "2" * 64
+FIRST_ENTITY = RemoteEntity.from_data(
+    {"entity_type": "SAML_SP", "id_hash": FIRST_ID_HASH}
+)
+SECOND_ENTITY = RemoteEntity.from_data(
+    {"entity_type": "SAML_SP", "id_hash": SECOND_ID_HASH}
+)
+
+
+def init_remote_repo(remote_path: str) -> None:
+    # the remote needs an initial commit to be cloneable with a HEAD
+    seed_path = remote_path + "_seed"
+    seed_repo = Repo.init(seed_path, mkdir=True)
+    with open(os.path.join(seed_path, "README"), "w") as readme:
+        readme.write("configs")
+    porcelain.add(seed_repo, paths=[os.path.join(seed_path, "README")])
+    porcelain.commit(
+        seed_repo, message=b"init", committer=b"Seed <seed@mail.com>"
+    )
+    porcelain.clone(
+        seed_path, remote_path, bare=True, errstream=io.BytesIO()
+    )
+
+
+class TestGitConfigVersionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.remote_path = os.path.join(self.tmp_dir.name, "remote.git")
+        init_remote_repo(self.remote_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_version_manager(
+        self, config_file_name="cpcl_json_cfg", **cfg_overrides
+    ):
+        version_manager_cfg = {
+            "git_repo": self.remote_path,
+            "git_repo_folder_path": os.path.join(self.tmp_dir.name, "local"),
+            "git_branch_name": "configs",
+            "committer": "JohnDoe <johndoe@mail.com>",
+            "config_file_name": config_file_name,
+            "config_file_format": "JSON",
+            **cfg_overrides,
+        }
+        return GitConfigVersionManager(version_manager_cfg)
+
+    def get_remote_commits(self):
+        remote_repo = Repo(self.remote_path)
+        branch_ref = b"refs/heads/configs"
+        if branch_ref not in remote_repo.refs:
+            return []
+        walker = remote_repo.get_walker(include=[remote_repo.refs[branch_ref]])
+        return [entry.commit for entry in walker]
+
+    def test_every_change_is_published_without_batching(self):
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        version_manager.save_configuration({"name": "second"}, SECOND_ENTITY)
+
+        # 2 config commits + initial commit
+        self.assertEqual(3, len(self.get_remote_commits()))
+
+    def test_unchanged_config_is_not_published(self):
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+
+        self.assertEqual(2, len(self.get_remote_commits()))
+
+    def test_resent_config_is_deduplicated(self):
+        deduplicated_updates_before = DEDUPLICATED_UPDATES.get(
+            config_file_name="cpcl_json_cfg"
+        )
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+
+        self.assertEqual(
+            deduplicated_updates_before + 1,
+            DEDUPLICATED_UPDATES.get(config_file_name="cpcl_json_cfg"),
+        )
+
+    def test_repository_handle_is_reused(self):
+        version_manager = self.get_version_manager()
+        self.assertIs(version_manager.get_repo(), version_manager.get_repo())
+
+    def test_change_detection_ignores_other_files(self):
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+
+        repo_folder_path = os.path.join(self.tmp_dir.name, "local")
+        with open(os.path.join(repo_folder_path, "unrelated.txt"), "w") as f:
+            f.write("not a config")
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+
+        self.assertEqual(2, len(self.get_remote_commits()))
+
+    def test_changes_in_batching_window_are_published_together(self):
+        version_manager = self.get_version_manager(
+            commit_batch_max_delay=60, commit_batch_max_changes=2
+        )
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        self.assertEqual([], self.get_remote_commits())
+
+        version_manager.save_configuration({"name": "second"}, SECOND_ENTITY)
+        remote_commits = self.get_remote_commits()
+        self.assertEqual(2, len(remote_commits))
+        self.assertIn(FIRST_ID_HASH.encode(), remote_commits[0].message)
+        self.assertIn(SECOND_ID_HASH.encode(), remote_commits[0].message)
+
+    def test_pending_changes_are_published_on_demand(self):
+        version_manager = self.get_version_manager(
+            commit_batch_max_delay=60, commit_batch_max_changes=100
+        )
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        version_manager.publish_pending_changes()
+
+        self.assertEqual(2, len(self.get_remote_commits()))
+
+    def test_managers_of_same_repository_publish_an_update_together(self):
+        json_manager = self.get_version_manager()
+        yaml_manager = self.get_version_manager(
+            config_file_name="cpcl_yaml_cfg", config_file_format="YAML"
+        )
+        self.assertIs(json_manager.get_repo(), yaml_manager.get_repo())
+
+        json_manager.begin_update(FIRST_ENTITY)
+        yaml_manager.begin_update(FIRST_ENTITY)
+        json_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        json_manager.end_update(FIRST_ENTITY)
+        self.assertEqual([], self.get_remote_commits())
+
+        yaml_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+        yaml_manager.end_update(FIRST_ENTITY)
+
+        remote_commits = self.get_remote_commits()
+        self.assertEqual(2, len(remote_commits))
+        remote_repo = Repo(self.remote_path)
+        tree = remote_repo[remote_commits[0].tree]
+        self.assertIn(b"cpcl_json_cfg.json", tree)
+        self.assertIn(b"cpcl_yaml_cfg.yaml", tree)
+
+    def test_uncommitted_config_is_not_a_duplicate_after_restart(self):
+        version_manager = self.get_version_manager(
+            commit_batch_max_delay=60, commit_batch_max_changes=100
+        )
+        version_manager.save_configuration({"name": "first"}, FIRST_ENTITY)
+
+        # the process stops before the batch is committed, the replayed
+        # update must publish the written file
+        with mock.patch.object(
+            git_config_version_manager,
+            "git_repository_coordinators",
+            GitRepositoryCoordinatorRegistry(),
+        ):
+            restarted_version_manager = self.get_version_manager()
+        restarted_version_manager.save_configuration(
+            {"name": "first"}, FIRST_ENTITY
+        )
+
+        self.assertEqual(2, len(self.get_remote_commits()))
+        # nothing is left for the stopped process to publish on exit
+        version_manager.publish_pending_changes()
+
+    def test_failed_batch_publish_is_retried(self):
+        version_manager = self.get_version_manager(
+            commit_batch_max_delay=0.05, commit_batch_max_changes=100
+        )
+        publish_files_to_git = GitRepositoryCoordinator.publish_files_to_git
+        publish_attempts = []
+
+        def fail_first_publish(coordinator, *args):
+            publish_attempts.append(args)
+            if len(publish_attempts) == 1:
+                raise OSError("remote unavailable")
+            publish_files_to_git(coordinator, *args)
+
+        with mock.patch.object(
+            GitRepositoryCoordinator,
+            "publish_files_to_git",
+            fail_first_publish,
+        ), self.assertLogs(
+            "config_version_managers.git_repository_coordinator",
+            level="ERROR",
+        ):
+            version_manager.save_configuration(
+                {"name": "first"}, FIRST_ENTITY
+            )
+            deadline = time.monotonic() + 5
+            while (
+                len(self.get_remote_commits()) < 2
+                and time.monotonic() < deadline
+            ):
+                time.sleep(0.01)
+
+        self.assertEqual(2, len(publish_attempts))
+        self.assertEqual(2, len(self.get_remote_commits()))
+
+    def reject_first_push(self):
+        real_send_pack = LocalGitClient.send_pack
+        rejected_pushes = []
+
+        def rejecting_send_pack(client, path, update_refs, **kwargs):
+            if rejected_pushes:
+                return real_send_pack(client, path, update_refs, **kwargs)
+            rejected_pushes.append(path)
+            return SendPackResult(
+                {}, ref_status={b"refs/heads/configs": "hook declined"}
+            )
+
+        return mock.patch.object(
+            LocalGitClient,
+            "send_pack",
+            autospec=True,
+            side_effect=rejecting_send_pack,
+        )
+
+    def save_after_failed_push(self, restart: bool) -> None:
+        version_manager = self.get_version_manager()
+        with self.reject_first_push():
+            with self.assertRaises(GitPushError):
+                version_manager.save_configuration(
+                    {"name": "first"}, FIRST_ENTITY
+                )
+            # the commit is left in the local repository only
+            self.assertEqual([], self.get_remote_commits())
+
+            if restart:
+                with mock.patch.object(
+                    git_config_version_manager,
+                    "git_repository_coordinators",
+                    GitRepositoryCoordinatorRegistry(),
+                ):
+                    version_manager = self.get_version_manager()
+            # the backend retries the failed update
+            version_manager.save_configuration(
+                {"name": "first"}, FIRST_ENTITY
+            )
+
+        self.assertEqual(2, len(self.get_remote_commits()))
+
+    def test_retried_config_is_pushed_after_failed_push(self):
+        self.save_after_failed_push(restart=False)
+
+    def test_unpushed_commit_is_pushed_after_restart(self):
+        self.save_after_failed_push(restart=True)
+
+    def test_managers_of_same_repository_must_share_settings(self):
+        self.get_version_manager()
+        with self.assertRaises(ValueError):
+            self.get_version_manager(
+                config_file_name="cpcl_yaml_cfg", git_branch_name="other"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from dulwich.client import LocalGitClient, SendPackResult
+from dulwich.repo import Repo
+
+from config_version_managers.git_config_version_manager import \
+    GitConfigVersionManager
+from config_version_managers.git_push_scheduler import GitPushScheduler
+from tests.test_git_config_version_manager import (FIRST_ENTITY, SECOND_ENTITY,
+                                                   init_remote_repo)
+
+
+class TestGitPushScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.remote_path = os.path.join(self.tmp_dir.name, "remote.git")
+        init_remote_repo(self.remote_path)
+
+        self.version_manager = GitConfigVersionManager(
+            {
+                "git_repo": self.remote_path,
+                "git_repo_folder_path": os.path.join(
+                    self.tmp_dir.name, "local"
+                ),
+                "git_branch_name": "configs",
+                "committer": "JohnDoe <johndoe@mail.com>",
+                "config_file_name": "cpcl_json_cfg",
+                "config_file_format": "JSON",
+                "push_mode": "BACKGROUND",
+                "push_retry_base_delay": 0.05,
+                "push_retry_max_delay": 0.1,
+            }
+        )
+        self.push_scheduler = self.version_manager.get_push_scheduler()
+
+    def tearDown(self):
+        self.push_scheduler.stop(10)
+        self.tmp_dir.cleanup()
+
+    def get_remote_commit_count(self):
+        remote_repo = Repo(self.remote_path)
+        branch_ref = b"refs/heads/configs"
+        if branch_ref not in remote_repo.refs:
+            return 0
+        return len(
+            list(
+                remote_repo.get_walker(include=[remote_repo.refs[branch_ref]])
+            )
+        )
+
+    def test_commits_are_pushed_in_background(self):
+        self.version_manager.save_configuration(
+            {"name": "first"}, FIRST_ENTITY
+        )
+        self.version_manager.save_configuration(
+            {"name": "second"}, SECOND_ENTITY
+        )
+
+        self.assertTrue(self.push_scheduler.wait_until_idle(10))
+        # 2 config commits + initial commit
+        self.assertEqual(3, self.get_remote_commit_count())
+        self.assertEqual(0, self.push_scheduler.get_status()["commits_behind"])
+
+    def test_commits_made_during_push_are_pushed_together(self):
+        push_started = threading.Event()
+        push_released = threading.Event()
+        real_send_pack = LocalGitClient.send_pack
+
+        def blocking_send_pack(*args, **kwargs):
+            push_started.set()
+            push_released.wait(10)
+            return real_send_pack(*args, **kwargs)
+
+        with mock.patch.object(
+            LocalGitClient,
+            "send_pack",
+            autospec=True,
+            side_effect=blocking_send_pack,
+        ) as push:
+            self.version_manager.save_configuration(
+                {"name": "first"}, FIRST_ENTITY
+            )
+            push_started.wait(10)
+            for name in ("second", "third", "fourth"):
+                self.version_manager.save_configuration(
+                    {"name": name}, SECOND_ENTITY
+                )
+            self.assertEqual(
+                4, self.push_scheduler.get_status()["commits_behind"]
+            )
+            push_released.set()
+            self.assertTrue(self.push_scheduler.wait_until_idle(10))
+
+        self.assertEqual(2, push.call_count)
+        self.assertEqual(5, self.get_remote_commit_count())
+
+    def test_failed_push_is_retried_with_backoff(self):
+        unavailable_remote_path = self.remote_path + "_unavailable"
+        self.version_manager.get_repo()
+        os.rename(self.remote_path, unavailable_remote_path)
+
+        self.version_manager.save_configuration(
+            {"name": "first"}, FIRST_ENTITY
+        )
+        self.assertFalse(self.push_scheduler.wait_until_idle(0.3))
+        push_status = self.push_scheduler.get_status()
+        self.assertGreaterEqual(push_status["failed_attempts"], 1)
+        self.assertEqual(1, push_status["commits_behind"])
+
+        os.rename(unavailable_remote_path, self.remote_path)
+        self.assertTrue(self.push_scheduler.wait_until_idle(10))
+        self.assertEqual(2, self.get_remote_commit_count())
+        self.assertEqual(
+            0, self.push_scheduler.get_status()["failed_attempts"]
+        )
+
+    def test_rejected_ref_is_retried(self):
+        real_send_pack = LocalGitClient.send_pack
+        rejected_pushes = []
+
+        def rejecting_send_pack(client, path, update_refs, **kwargs):
+            if rejected_pushes:
+                return real_send_pack(client, path, update_refs, **kwargs)
+            rejected_pushes.append(path)
+            return SendPackResult(
+                {}, ref_status={b"refs/heads/configs": "hook declined"}
+            )
+
+        with mock.patch.object(
+            LocalGitClient,
+            "send_pack",
+            autospec=True,
+            side_effect=rejecting_send_pack,
+        ):
+            self.version_manager.save_configuration(
+                {"name": "first"}, FIRST_ENTITY
+            )
+            self.assertTrue(self.push_scheduler.wait_until_idle(10))
+
+        self.assertEqual(1, len(rejected_pushes))
+        self.assertEqual(2, self.get_remote_commit_count())
+        self.assertEqual(0, self.push_scheduler.get_status()["commits_behind"])
+
+    def test_retry_delay_grows_exponentially_up_to_max(self):
+        push_scheduler = GitPushScheduler(
+            self.tmp_dir.name, "configs", self.remote_path, {}, 1, 8
+        )
+        for failed_attempt_count, min_delay, max_delay in (
+            (1, 0.5, 1),
+            (3, 2, 4),
+            (10, 4, 8),
+        ):
+            with self.subTest(failed_attempt_count=failed_attempt_count):
+                retry_delay = push_scheduler.get_retry_delay(
+                    failed_attempt_count
+                )
+                self.assertGreaterEqual(retry_delay, min_delay)
+                self.assertLessEqual(retry_delay, max_delay)
+
+
+if __name__ == "__main__":
+    unittest.main()
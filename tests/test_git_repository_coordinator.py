@@ -0,0 +1,216 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from dulwich import porcelain
+from dulwich.repo import Repo
+from dulwich.server import DictBackend
+from dulwich.web import (WSGIRequestHandlerLogger, WSGIServerLogger,
+                         make_server, make_wsgi_chain)
+
+from config_version_managers.git_repository_coordinator import (
+    GitRepositoryCoordinator, GitRepositoryCoordinatorRegistry)
+
+
+def add_remote_commit(remote_path: str, branch_name: str) -> None:
+    # the remote gets another commit on the given branch
+    work_path = remote_path + f"_{branch_name}_work"
+    work_repo = porcelain.clone(remote_path, work_path, errstream=io.BytesIO())
+    branch_ref = f"refs/heads/{branch_name}".encode()
+    work_repo.refs[branch_ref] = work_repo.head()
+    work_repo.refs.set_symbolic_ref(b"HEAD", branch_ref)
+    with open(os.path.join(work_path, branch_name), "w") as branch_file:
+        branch_file.write(branch_name)
+    porcelain.add(work_repo, paths=[os.path.join(work_path, branch_name)])
+    porcelain.commit(
+        work_repo, message=branch_name.encode(), committer=b"A <a@mail.com>"
+    )
+    porcelain.push(
+        work_repo, remote_path, refspecs=[branch_ref], errstream=io.BytesIO()
+    )
+
+
+def init_remote_repo(remote_path: str) -> None:
+    seed_path = remote_path + "_seed"
+    seed_repo = Repo.init(seed_path, mkdir=True)
+    for i in range(3):
+        with open(os.path.join(seed_path, "README"), "w") as readme:
+            readme.write(f"configs {i}")
+        porcelain.add(seed_repo, paths=[os.path.join(seed_path, "README")])
+        porcelain.commit(
+            seed_repo, message=b"init", committer=b"Seed <seed@mail.com>"
+        )
+    porcelain.clone(seed_path, remote_path, bare=True, errstream=io.BytesIO())
+
+
+class TestGitRepositoryCoordinator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.remote_path = os.path.join(self.tmp_dir.name, "remote.git")
+        init_remote_repo(self.remote_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_cfg(self, folder_name="local", **cfg_overrides):
+        return {
+            "git_repo": self.remote_path,
+            "git_repo_folder_path": os.path.join(
+                self.tmp_dir.name, folder_name
+            ),
+            "git_branch_name": "configs",
+            "committer": "JohnDoe <johndoe@mail.com>",
+            **cfg_overrides,
+        }
+
+    def serve_remote_over_http(self) -> str:
+        # the local transport cannot fetch shallow, the smart HTTP one can
+        server = make_server(
+            "127.0.0.1",
+            0,
+            make_wsgi_chain(DictBackend({"/": Repo(self.remote_path)})),
+            handler_class=WSGIRequestHandlerLogger,
+            server_class=WSGIServerLogger,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    def commit_and_push(self, coordinator: GitRepositoryCoordinator):
+        repo = coordinator.get_repo()
+        file_path = os.path.join(repo.path, "cfg.json")
+        with open(file_path, "w") as cfg_file:
+            cfg_file.write("{}")
+        coordinator.publish_files_to_git(repo, [file_path], [None])
+
+    def get_remote_commit_count(self, branch_name="configs"):
+        remote_repo = Repo(self.remote_path)
+        branch_ref = f"refs/heads/{branch_name}".encode()
+        return len(
+            list(
+                remote_repo.get_walker(include=[remote_repo.refs[branch_ref]])
+            )
+        )
+
+    def test_shallow_clone_fetches_last_commits_only(self):
+        coordinator = GitRepositoryCoordinator(
+            self.get_cfg(git_repo=self.serve_remote_over_http(), clone_depth=1)
+        )
+        # the clone must not fall back to the full history
+        with self.assertNoLogs(
+            "config_version_managers.git_repository_coordinator",
+            level="WARNING",
+        ):
+            repo = coordinator.get_repo()
+        self.assertTrue(
+            os.path.isfile(os.path.join(repo.controldir(), "shallow"))
+        )
+        self.assertEqual(1, len(repo.get_shallow()))
+        self.assertEqual(1, len(list(repo.get_walker())))
+
+        self.commit_and_push(coordinator)
+        self.assertEqual(4, self.get_remote_commit_count())
+
+    def test_shallow_clone_falls_back_to_full_clone(self):
+        coordinator = GitRepositoryCoordinator(self.get_cfg(clone_depth=1))
+        with self.assertLogs(
+            "config_version_managers.git_repository_coordinator",
+            level="WARNING",
+        ):
+            repo = coordinator.get_repo()
+        self.assertFalse(
+            os.path.exists(os.path.join(repo.controldir(), "shallow"))
+        )
+        self.assertEqual(3, len(list(repo.get_walker())))
+
+    def test_single_branch_clone_fetches_configured_branch_only(self):
+        add_remote_commit(self.remote_path, "configs")
+        add_remote_commit(self.remote_path, "other")
+        coordinator = GitRepositoryCoordinator(
+            self.get_cfg(clone_single_branch=True)
+        )
+        repo = coordinator.get_repo()
+
+        remote_repo = Repo(self.remote_path)
+        self.assertEqual(
+            remote_repo.refs[b"refs/heads/configs"], repo.refs[b"HEAD"]
+        )
+        self.assertNotIn(b"refs/remotes/origin/other", repo.refs)
+        self.assertNotIn(
+            remote_repo.refs[b"refs/heads/other"], repo.object_store
+        )
+        self.assertTrue(os.path.isfile(os.path.join(repo.path, "configs")))
+
+        self.commit_and_push(coordinator)
+        self.assertEqual(5, self.get_remote_commit_count())
+
+    def test_single_branch_clone_creates_missing_branch(self):
+        coordinator = GitRepositoryCoordinator(
+            self.get_cfg(clone_single_branch=True)
+        )
+        repo = coordinator.get_repo()
+
+        self.assertEqual(
+            b"refs/heads/configs", repo.refs.follow(b"HEAD")[0][1]
+        )
+        self.commit_and_push(coordinator)
+        self.assertEqual(4, self.get_remote_commit_count())
+
+    def test_single_branch_clone_keeps_branch_name(self):
+        add_remote_commit(self.remote_path, "config-heads")
+        coordinator = GitRepositoryCoordinator(
+            self.get_cfg(
+                clone_single_branch=True, git_branch_name="config-heads"
+            )
+        )
+        repo = coordinator.get_repo()
+
+        self.assertEqual(
+            b"+refs/heads/config-heads:refs/remotes/origin/config-heads",
+            repo.get_config().get((b"remote", b"origin"), b"fetch"),
+        )
+        self.assertIn(b"refs/remotes/origin/config-heads", repo.refs)
+
+    def test_empty_remote_gets_first_commit(self):
+        empty_remote_path = os.path.join(self.tmp_dir.name, "empty.git")
+        Repo.init_bare(empty_remote_path, mkdir=True)
+
+        for clone_single_branch in (False, True):
+            with self.subTest(clone_single_branch=clone_single_branch):
+                coordinator = GitRepositoryCoordinator(
+                    self.get_cfg(
+                        f"empty_{clone_single_branch}",
+                        git_repo=empty_remote_path,
+                        clone_single_branch=clone_single_branch,
+                    )
+                )
+                self.commit_and_push(coordinator)
+                self.assertIn(
+                    b"refs/heads/configs", Repo(empty_remote_path).refs
+                )
+
+    def test_repositories_are_opened_in_parallel(self):
+        coordinator_registry = GitRepositoryCoordinatorRegistry()
+        coordinators = [
+            coordinator_registry.get_coordinator(self.get_cfg(folder_name))
+            for folder_name in ("first", "second")
+        ]
+        coordinator_registry.get_coordinator(
+            self.get_cfg("broken", git_repo=self.remote_path + "_missing")
+        )
+
+        with self.assertLogs(level="ERROR"):
+            coordinator_registry.open_repositories()
+
+        for folder_name, coordinator in zip(("first", "second"), coordinators):
+            self.assertTrue(
+                os.path.isdir(os.path.join(self.tmp_dir.name, folder_name))
+            )
+            self.assertIs(coordinator.get_repo(), coordinator.get_repo())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,223 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from config_version_managers.local_config_version_manager import \
+    LocalConfigVersionManager
+from entities.remote_entity import RemoteEntity
+from enums.config_file_format import ConfigFileFormat
+
+ID_HASH = "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9"
+ENTITY = RemoteEntity.from_data({"entity_type": "SAML_SP", "id_hash": ID_HASH})
+
+
+class TestLocalConfigVersionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_version_manager(self, **cfg_overrides):
+        version_manager_cfg = {
+            "config_folder_path": self.tmp_dir.name,
+            "config_file_name": "cpcl_cfg",
+            "config_file_format": "YAML",
+            **cfg_overrides,
+        }
+        return LocalConfigVersionManager(version_manager_cfg)
+
+    def test_serialization_is_canonical(self):
+        version_manager = self.get_version_manager()
+        first = version_manager.serialize_config(
+            {"b": 1, "a": {"d": 2, "c": 3}}
+        )
+        second = version_manager.serialize_config(
+            {"a": {"c": 3, "d": 2}, "b": 1}
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(b"a:\n  c: 3\n  d: 2\nb: 1\n", first)
+
+    def test_identical_config_is_saved_once(self):
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "a", "id": 1}, ENTITY)
+        version_manager.save_configuration({"id": 1, "name": "a"}, ENTITY)
+
+        self.assertEqual(1, len(os.listdir(self.tmp_dir.name)))
+
+    def test_identical_config_is_detected_after_restart(self):
+        self.get_version_manager().save_configuration({"name": "a"}, ENTITY)
+        self.get_version_manager().save_configuration({"name": "a"}, ENTITY)
+
+        self.assertEqual(1, len(os.listdir(self.tmp_dir.name)))
+
+    def test_config_is_deduplicated_per_output_format(self):
+        version_manager = self.get_version_manager()
+        version_manager.save_configuration({"name": "a"}, ENTITY)
+        version_manager.save_configuration(
+            {"name": "a"}, ENTITY, ConfigFileFormat.JSON
+        )
+
+        self.assertEqual(2, len(os.listdir(self.tmp_dir.name)))
+
+    def test_failed_write_keeps_previous_config(self):
+        version_manager = self.get_version_manager()
+        file_path = os.path.join(self.tmp_dir.name, "cpcl_cfg.yaml")
+        version_manager.write_config_file(file_path, b"name: a\n")
+
+        with mock.patch("os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                version_manager.write_config_file(file_path, b"name: b\n")
+
+        with open(file_path, "rb") as config_file:
+            self.assertEqual(b"name: a\n", config_file.read())
+        self.assertEqual(["cpcl_cfg.yaml"], os.listdir(self.tmp_dir.name))
+
+    def test_batch_durability_syncs_when_update_ends(self):
+        version_manager = self.get_version_manager(write_durability="BATCH")
+        with mock.patch("os.fsync") as fsync:
+            version_manager.begin_update(ENTITY)
+            version_manager.save_configuration({"name": "a"}, ENTITY)
+            version_manager.save_configuration(
+                {"name": "a"}, ENTITY, ConfigFileFormat.JSON
+            )
+            self.assertEqual(0, fsync.call_count)
+
+            version_manager.end_update(ENTITY)
+            # 2 files + their directory
+            self.assertEqual(3, fsync.call_count)
+
+    def test_no_durability_never_syncs(self):
+        version_manager = self.get_version_manager(write_durability="NONE")
+        with mock.patch("os.fsync") as fsync:
+            version_manager.save_configuration({"name": "a"}, ENTITY)
+
+        self.assertEqual(0, fsync.call_count)
+
+    def test_invalid_write_durability_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.get_version_manager(write_durability="SOMETIMES")
+
+    def test_snapshots_keep_history_of_current_config(self):
+        version_manager = self.get_version_manager(storage_mode="SNAPSHOTS")
+        version_manager.save_configuration({"name": "a"}, ENTITY)
+        between_saves = datetime.now() + timedelta(seconds=1)
+        with mock.patch("time.time", return_value=time.time() + 2):
+            version_manager.save_configuration({"name": "b"}, ENTITY)
+
+        file_path = os.path.join(self.tmp_dir.name, "cpcl_cfg.yaml")
+        with open(file_path, "rb") as config_file:
+            self.assertEqual(b"name: b\n", config_file.read())
+        self.assertEqual(
+            b"name: b\n", version_manager.load_configuration()
+        )
+        self.assertEqual(
+            b"name: a\n",
+            version_manager.load_configuration(as_of=between_saves),
+        )
+        self.assertEqual(
+            b"name: b\n",
+            self.get_version_manager(
+                storage_mode="SNAPSHOTS"
+            ).load_last_written_config(file_path),
+        )
+
+    def test_snapshot_retention_count_is_applied(self):
+        version_manager = self.get_version_manager(
+            storage_mode="SNAPSHOTS", snapshot_retention_count=2
+        )
+        for name in "abcde":
+            version_manager.save_configuration({"name": name}, ENTITY)
+
+        snapshot_store = version_manager.get_snapshot_store(
+            os.path.join(self.tmp_dir.name, "cpcl_cfg.yaml")
+        )
+        self.assertLessEqual(len(snapshot_store), 3)
+        self.assertEqual(
+            b"name: e\n",
+            snapshot_store.read(snapshot_store.get_latest()),
+        )
+
+    def test_timestamped_files_are_loaded_as_of(self):
+        version_manager = self.get_version_manager()
+        for file_name, content in (
+            ("cpcl_cfg_2024-01-01T10:00:00.yaml", b"name: a\n"),
+            ("cpcl_cfg_2024-01-02T10:00:00.yaml", b"name: b\n"),
+        ):
+            version_manager.write_config_file(
+                os.path.join(self.tmp_dir.name, file_name), content
+            )
+
+        self.assertEqual(
+            b"name: b\n", version_manager.load_configuration()
+        )
+        self.assertEqual(
+            b"name: a\n",
+            version_manager.load_configuration(
+                as_of=datetime(2024, 1, 1, 12, 0)
+            ),
+        )
+        self.assertIsNone(
+            version_manager.load_configuration(
+                as_of=datetime(2023, 12, 31, 12, 0)
+            )
+        )
+
+    def test_deltas_keep_history_of_current_config(self):
+        version_manager = self.get_version_manager(storage_mode="DELTAS")
+        for name in "abc":
+            version_manager.save_configuration({"name": name}, ENTITY)
+
+        self.assertEqual(
+            b"name: c\n",
+            self.get_version_manager(
+                storage_mode="DELTAS"
+            ).load_configuration(),
+        )
+        self.assertEqual(
+            [".deltas", "cpcl_cfg.yaml"], sorted(os.listdir(self.tmp_dir.name))
+        )
+
+    def test_timestamped_files_are_migrated(self):
+        for file_name, content in (
+            ("cpcl_cfg_2024-01-01T10:00:00.yaml", b"name: a\n"),
+            ("cpcl_cfg_2024-01-02T10:00:00.yaml", b"name: b\n"),
+        ):
+            with open(
+                os.path.join(self.tmp_dir.name, file_name), "wb"
+            ) as config_file:
+                config_file.write(content)
+
+        version_manager = self.get_version_manager(storage_mode="DELTAS")
+        self.assertEqual(2, version_manager.migrate_timestamped_files(True))
+        self.assertEqual(0, version_manager.migrate_timestamped_files())
+
+        self.assertEqual(
+            [".deltas", "cpcl_cfg.yaml"], sorted(os.listdir(self.tmp_dir.name))
+        )
+        self.assertEqual(
+            b"name: a\n",
+            version_manager.load_configuration(
+                as_of=datetime(2024, 1, 1, 12, 0)
+            ),
+        )
+        version_manager.save_configuration({"name": "b"}, ENTITY)
+        self.assertEqual(
+            2,
+            len(
+                version_manager.get_snapshot_store(
+                    os.path.join(self.tmp_dir.name, "cpcl_cfg.yaml")
+                )
+            ),
+        )
+
+    def test_invalid_storage_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.get_version_manager(storage_mode="TAPE")
+
+
+if __name__ == "__main__":
+    unittest.main()
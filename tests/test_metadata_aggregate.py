@@ -0,0 +1,168 @@
+import io
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from unittest import mock
+
+from utils import metadata_aggregate
+from utils.metadata_aggregate import (EntityDescriptorScanner,
+                                      MetadataAggregateError,
+                                      get_entity_descriptor, get_index_path)
+from utils.metadata_fetcher import MetadataDocument
+
+MD = "urn:oasis:names:tc:SAML:2.0:metadata"
+MDUI = "urn:oasis:names:tc:SAML:metadata:ui"
+
+AGGREGATE = f"""<?xml version="1.0" encoding="UTF-8"?>
+<md:EntitiesDescriptor xmlns:md="{MD}" xmlns:mdui="{MDUI}" Name="fed">
+  <md:EntitiesDescriptor Name="nested">
+    <md:EntityDescriptor entityID="https://sp.example.com">
+      <md:SPSSODescriptor protocolSupportEnumeration="{MD}">
+        <md:Extensions>
+          <mdui:UIInfo>
+            <mdui:DisplayName xml:lang="cs">Služba &gt; "SP"</mdui:DisplayName>
+          </mdui:UIInfo>
+        </md:Extensions>
+        <md:EntityDescriptor entityID="https://not-an-entity.example.com"/>
+      </md:SPSSODescriptor>
+    </md:EntityDescriptor>
+  </md:EntitiesDescriptor>
+  <md:EntityDescriptor entityID="https://empty.example.com" note="a > b"/>
+  <EntityDescriptor xmlns="{MD}" entityID="https://idp.example.com">
+    <IDPSSODescriptor protocolSupportEnumeration="{MD}"/>
+  </EntityDescriptor >
+  <other:EntityDescriptor xmlns:other="urn:other" entityID="https://other"/>
+</md:EntitiesDescriptor>
+""".encode()
+
+
+def get_document(content=None, content_path=None):
+    return MetadataDocument(
+        "https://fed.example.com/metadata",
+        None,
+        None,
+        0,
+        0,
+        len(content or b""),
+        content=content,
+        content_path=content_path,
+    )
+
+
+class TestMetadataAggregate(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.aggregate_path = Path(self.tmp_dir.name, "aggregate.body")
+        self.aggregate_path.write_bytes(AGGREGATE)
+        self.document = get_document(content_path=self.aggregate_path)
+        # small chunks so that the elements span several of them
+        chunk_size_patch = mock.patch.object(
+            metadata_aggregate, "PARSE_CHUNK_SIZE", 7
+        )
+        chunk_size_patch.start()
+        self.addCleanup(chunk_size_patch.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_scanner_finds_entity_descriptors(self):
+        entities = EntityDescriptorScanner(io.BytesIO(AGGREGATE)).scan()
+
+        self.assertEqual(
+            [
+                "https://sp.example.com",
+                "https://empty.example.com",
+                "https://idp.example.com",
+            ],
+            [entity_id for entity_id, _ in entities],
+        )
+        for _, entity_location in entities:
+            entity_descriptor = AGGREGATE[
+                entity_location.offset:
+                entity_location.offset + entity_location.length
+            ]
+            self.assertRegex(entity_descriptor, rb"^<(md:)?EntityDescriptor")
+            self.assertRegex(entity_descriptor, rb">$")
+
+    def test_entity_descriptor_is_a_standalone_document(self):
+        entity_descriptor = get_entity_descriptor(
+            self.document, "https://sp.example.com"
+        )
+
+        root = ET.fromstring(entity_descriptor)
+        self.assertEqual(f"{{{MD}}}EntityDescriptor", root.tag)
+        self.assertEqual("https://sp.example.com", root.get("entityID"))
+        self.assertEqual(
+            'Služba > "SP"',
+            root.find(f".//{{{MDUI}}}DisplayName").text,
+        )
+
+        empty_entity_descriptor = ET.fromstring(
+            get_entity_descriptor(self.document, "https://empty.example.com")
+        )
+        self.assertEqual("a > b", empty_entity_descriptor.get("note"))
+
+        idp_entity_descriptor = ET.fromstring(
+            get_entity_descriptor(self.document, "https://idp.example.com")
+        )
+        self.assertIsNotNone(
+            idp_entity_descriptor.find(f"{{{MD}}}IDPSSODescriptor")
+        )
+
+    def test_missing_entity(self):
+        self.assertIsNone(
+            get_entity_descriptor(self.document, "https://other")
+        )
+        self.assertIsNone(
+            get_entity_descriptor(
+                get_document(content=AGGREGATE),
+                "https://missing.example.com",
+            )
+        )
+
+    def test_in_memory_document_is_scanned(self):
+        entity_descriptor = get_entity_descriptor(
+            get_document(content=AGGREGATE),
+            "https://empty.example.com",
+        )
+
+        self.assertEqual(
+            "https://empty.example.com",
+            ET.fromstring(entity_descriptor).get("entityID"),
+        )
+
+    def test_index_is_rebuilt_when_aggregate_changes(self):
+        index_path = get_index_path(self.aggregate_path)
+        get_entity_descriptor(self.document, "https://sp.example.com")
+        index_mtime = index_path.stat().st_mtime_ns
+
+        # the index is reused while the aggregate is the same
+        with mock.patch.object(
+            metadata_aggregate, "build_aggregate_index"
+        ) as build_aggregate_index:
+            get_entity_descriptor(self.document, "https://idp.example.com")
+        build_aggregate_index.assert_not_called()
+
+        self.aggregate_path.write_bytes(
+            AGGREGATE.replace(b"https://idp.", b"https://new-idp.")
+        )
+        os.utime(self.aggregate_path, ns=(index_mtime + 1, index_mtime + 1))
+
+        self.assertIsNone(
+            get_entity_descriptor(self.document, "https://idp.example.com")
+        )
+        self.assertIsNotNone(
+            get_entity_descriptor(self.document, "https://new-idp.example.com")
+        )
+
+    def test_invalid_aggregate(self):
+        self.aggregate_path.write_bytes(AGGREGATE[:200])
+
+        with self.assertRaises(MetadataAggregateError):
+            get_entity_descriptor(self.document, "https://sp.example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
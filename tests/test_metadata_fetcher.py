@@ -0,0 +1,248 @@
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.metadata_fetcher import (MetadataFetcher, MetadataFetchError,
+                                    get_freshness_lifetime)
+
+METADATA = b"<EntityDescriptor entityID='https://idp.example.com'/>"
+
+
+class MetadataRequestHandler(BaseHTTPRequestHandler):
+    # stands in for a metadata host, the served documents are set by tests
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(dict(self.headers))
+            document = server.documents.get(self.path)
+        time.sleep(server.delay)
+
+        if not document or document.get("status", 200) != 200:
+            self.send_response(
+                document.get("status", 404) if document else 404
+            )
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = document.get("etag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+        elif (
+            document.get("last_modified")
+            and self.headers.get("If-Modified-Since")
+            == document["last_modified"]
+        ):
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(document["body"])))
+            if etag:
+                self.send_header("ETag", etag)
+            if document.get("last_modified"):
+                self.send_header("Last-Modified", document["last_modified"])
+            if document.get("cache_control"):
+                self.send_header("Cache-Control", document["cache_control"])
+            self.end_headers()
+            self.wfile.write(document["body"])
+            return
+
+        if document.get("cache_control"):
+            self.send_header("Cache-Control", document["cache_control"])
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMetadataFetcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), MetadataRequestHandler
+        )
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.documents = {}
+        self.server.delay = 0
+        self.server_thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+        self.server_thread.start()
+        self.fetchers = []
+
+    def tearDown(self):
+        for fetcher in self.fetchers:
+            fetcher.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def get_url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def get_fetcher(self, **cfg_overrides):
+        fetcher = MetadataFetcher(
+            {"cache_folder_path": self.tmp_dir.name, **cfg_overrides}
+        )
+        self.fetchers.append(fetcher)
+        return fetcher
+
+    def test_fresh_document_is_not_requested_again(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "cache_control": "max-age=60",
+        }
+        fetcher = self.get_fetcher()
+
+        first_document = fetcher.fetch(self.get_url("/metadata"))
+        second_document = fetcher.fetch(self.get_url("/metadata"))
+
+        self.assertEqual(METADATA, first_document.read())
+        self.assertIs(first_document, second_document)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_expired_document_is_revalidated(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "etag": '"v1"',
+            "last_modified": "Mon, 02 Jan 2023 10:00:00 GMT",
+            "cache_control": "no-cache",
+        }
+        fetcher = self.get_fetcher()
+
+        fetcher.fetch(self.get_url("/metadata"))
+        document = fetcher.fetch(self.get_url("/metadata"))
+
+        self.assertEqual(METADATA, document.read())
+        self.assertEqual(2, len(self.server.requests))
+        self.assertEqual('"v1"', self.server.requests[1]["If-None-Match"])
+        self.assertEqual(
+            "Mon, 02 Jan 2023 10:00:00 GMT",
+            self.server.requests[1]["If-Modified-Since"],
+        )
+
+        # a changed document is downloaded again
+        self.server.documents["/metadata"] = {
+            "body": b"<changed/>",
+            "etag": '"v2"',
+            "cache_control": "no-cache",
+        }
+        document = fetcher.fetch(self.get_url("/metadata"))
+        self.assertEqual(b"<changed/>", document.read())
+        self.assertEqual('"v2"', document.etag)
+
+    def test_disk_cache_survives_restart(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "cache_control": "max-age=60",
+        }
+        self.get_fetcher().fetch(self.get_url("/metadata"))
+
+        # documents over the memory limit are read from the disk cache
+        restarted_fetcher = self.get_fetcher(max_memory_document_size=0)
+        document = restarted_fetcher.fetch(self.get_url("/metadata"))
+
+        self.assertEqual(1, len(self.server.requests))
+        self.assertIsNone(document.content)
+        self.assertEqual(METADATA, document.read())
+
+    def test_no_store_document_is_not_cached(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "cache_control": "no-store",
+        }
+        fetcher = self.get_fetcher()
+
+        self.assertEqual(
+            METADATA, fetcher.fetch(self.get_url("/metadata")).read()
+        )
+        fetcher.fetch(self.get_url("/metadata"))
+
+        self.assertEqual(2, len(self.server.requests))
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+
+    def test_concurrent_fetches_are_merged(self):
+        self.server.documents["/metadata"] = {"body": METADATA}
+        self.server.delay = 0.2
+        fetcher = self.get_fetcher()
+        barrier = threading.Barrier(5)
+        documents = []
+
+        def fetch():
+            barrier.wait()
+            documents.append(fetcher.fetch(self.get_url("/metadata")))
+
+        threads = [threading.Thread(target=fetch) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(self.server.requests))
+        self.assertEqual(5, len(documents))
+        self.assertTrue(all(d is documents[0] for d in documents))
+
+    def test_stale_document_is_served_when_host_fails(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "cache_control": "no-cache",
+        }
+        fetcher = self.get_fetcher()
+        fetcher.fetch(self.get_url("/metadata"))
+
+        self.server.documents["/metadata"] = {"status": 503}
+        with self.assertLogs("utils.metadata_fetcher", level="WARNING"):
+            document = fetcher.fetch(self.get_url("/metadata"))
+
+        self.assertEqual(METADATA, document.read())
+        with self.assertRaises(MetadataFetchError):
+            fetcher.fetch(self.get_url("/missing"))
+
+    def test_documents_are_refreshed_in_background(self):
+        self.server.documents["/metadata"] = {
+            "body": METADATA,
+            "etag": '"v1"',
+            "cache_control": "max-age=0",
+        }
+        fetcher = self.get_fetcher(refresh_interval=0.05)
+        fetcher.fetch(self.get_url("/metadata"))
+
+        deadline = time.monotonic() + 5
+        while len(self.server.requests) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertGreaterEqual(len(self.server.requests), 3)
+        self.assertEqual('"v1"', self.server.requests[-1]["If-None-Match"])
+
+    def test_freshness_lifetime(self):
+        self.assertEqual(
+            50,
+            get_freshness_lifetime(
+                {"Cache-Control": "max-age=60", "Age": "10"}, 300
+            ),
+        )
+        self.assertEqual(
+            0, get_freshness_lifetime({"Cache-Control": "no-cache"}, 300)
+        )
+        self.assertIsNone(
+            get_freshness_lifetime({"Cache-Control": "private, no-store"}, 300)
+        )
+        self.assertEqual(
+            120,
+            get_freshness_lifetime(
+                {
+                    "Date": "Mon, 02 Jan 2023 10:00:00 GMT",
+                    "Expires": "Mon, 02 Jan 2023 10:02:00 GMT",
+                },
+                300,
+            ),
+        )
+        self.assertEqual(0, get_freshness_lifetime({"Expires": "0"}, 300))
+        self.assertEqual(300, get_freshness_lifetime({}, 300))
+
+
+if __name__ == "__main__":
+    unittest.main()
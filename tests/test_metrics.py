@@ -0,0 +1,69 @@
+import unittest
+
+from utils.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_counter_is_rendered_with_labels(self):
+        counter = self.registry.counter(
+            "updates_total", "Updates", ("status",)
+        )
+        counter.inc(status="failed")
+        counter.inc(2, status='say "hi"\n')
+
+        self.assertEqual(
+            "# HELP updates_total Updates\n"
+            "# TYPE updates_total counter\n"
+            'updates_total{status="failed"} 1.0\n'
+            'updates_total{status="say \\"hi\\"\\n"} 2.0\n',
+            self.registry.render_prometheus(),
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram(
+            "stage_seconds", "Stages", ("stage",), buckets=(0.1, 1.0)
+        )
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value, stage="write")
+
+        self.assertEqual(4, histogram.get_count(stage="write"))
+        self.assertEqual(
+            "# HELP stage_seconds Stages\n"
+            "# TYPE stage_seconds histogram\n"
+            'stage_seconds_bucket{stage="write",le="0.1"} 2.0\n'
+            'stage_seconds_bucket{stage="write",le="1.0"} 3.0\n'
+            'stage_seconds_bucket{stage="write",le="+Inf"} 4.0\n'
+            'stage_seconds_sum{stage="write"} 2.65\n'
+            'stage_seconds_count{stage="write"} 4.0\n',
+            self.registry.render_prometheus(),
+        )
+
+    def test_histogram_times_failing_blocks(self):
+        histogram = self.registry.histogram("stage_seconds", "Stages")
+        with self.assertRaises(RuntimeError):
+            with histogram.time():
+                raise RuntimeError()
+
+        self.assertEqual(1, histogram.get_count())
+
+    def test_gauge_function_is_read_on_render(self):
+        gauge = self.registry.gauge("queue_depth", "Queue depth")
+        queue = [1, 2]
+        gauge.set_function(lambda: len(queue))
+        queue.append(3)
+
+        self.assertEqual(3, gauge.get())
+        self.assertIn("queue_depth 3.0\n", self.registry.render_prometheus())
+
+    def test_metric_is_registered_once(self):
+        self.assertIs(
+            self.registry.gauge("in_flight", "In flight"),
+            self.registry.gauge("in_flight", "In flight"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
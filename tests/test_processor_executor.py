@@ -0,0 +1,159 @@
+import threading
+import time
+import unittest
+
+from entities.remote_entity import RemoteEntity
+from enums.processor_update_status import ProcessorUpdateStatus
+from utils.processor_executor import (PROCESSOR_FAILED_MESSAGE,
+                                      ProcessorExecutor)
+
+ENTITY = RemoteEntity.from_data(
+    {
+        "entity_type": "SAML_SP",
+        "id_hash":
+            "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9",
+    }
+)
+
+
+class FakeConfigProcessor:
+    def __init__(self, name, update, timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self.update = update
+        self.open_updates = 0
+
+    def begin_update(self, entity):
+        self.open_updates += 1
+
+    def end_update(self, entity):
+        self.open_updates -= 1
+
+    def update_configuration(self, entity):
+        self.update(entity)
+
+
+def fail(entity):
+    raise RuntimeError("write failed")
+
+
+class TestProcessorExecutor(unittest.TestCase):
+    def setUp(self):
+        self.processor_executor = ProcessorExecutor(
+            {"max_workers": 4, "processor_timeout": 5}
+        )
+
+    def tearDown(self):
+        self.processor_executor.shutdown()
+
+    def test_processors_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        config_processors = [
+            FakeConfigProcessor(f"processor_{i}", lambda e: barrier.wait())
+            for i in range(3)
+        ]
+
+        update_result = self.processor_executor.update_configurations(
+            ENTITY, config_processors
+        )
+
+        self.assertTrue(update_result.is_successful)
+        self.assertEqual(
+            ["processor_0", "processor_1", "processor_2"],
+            [
+                processor_result["processor"]
+                for processor_result in update_result.to_dict()["processors"]
+            ],
+        )
+
+    def test_failing_processor_does_not_affect_others(self):
+        updated_entities = []
+        config_processors = [
+            FakeConfigProcessor("failing", fail),
+            FakeConfigProcessor("working", updated_entities.append),
+        ]
+
+        with self.assertLogs("utils.processor_executor", level="ERROR"):
+            update_result = self.processor_executor.update_configurations(
+                ENTITY, config_processors
+            )
+
+        self.assertFalse(update_result.is_successful)
+        self.assertEqual([ENTITY], updated_entities)
+        failing_result, working_result = update_result.processor_results
+        self.assertEqual(ProcessorUpdateStatus.FAILED, failing_result.status)
+        # the details of the error are only logged
+        self.assertEqual(PROCESSOR_FAILED_MESSAGE, failing_result.message)
+        self.assertEqual(ProcessorUpdateStatus.UPDATED, working_result.status)
+        self.assertEqual(
+            [0, 0],
+            [
+                config_processor.open_updates
+                for config_processor in config_processors
+            ],
+        )
+
+    def test_slow_processor_times_out(self):
+        release = threading.Event()
+        config_processors = [
+            FakeConfigProcessor("slow", lambda e: release.wait(5), 0.05),
+            FakeConfigProcessor("fast", lambda e: None),
+        ]
+
+        started_at = time.monotonic()
+        update_result = self.processor_executor.update_configurations(
+            ENTITY, config_processors
+        )
+        release.set()
+
+        self.assertLess(time.monotonic() - started_at, 1)
+        slow_result, fast_result = update_result.processor_results
+        self.assertEqual(ProcessorUpdateStatus.TIMED_OUT, slow_result.status)
+        self.assertEqual(ProcessorUpdateStatus.UPDATED, fast_result.status)
+
+    def test_timed_out_update_is_not_overtaken(self):
+        release = threading.Event()
+        updates = []
+
+        def update(entity):
+            if not updates:
+                release.wait(5)
+            updates.append(len(updates))
+
+        config_processor = FakeConfigProcessor("slow", update, 0.05)
+        for _ in range(2):
+            update_result = self.processor_executor.update_configurations(
+                ENTITY, [config_processor]
+            )
+            self.assertEqual(
+                ProcessorUpdateStatus.TIMED_OUT,
+                update_result.processor_results[0].status,
+            )
+        # the second update waits for the first one that still runs
+        self.assertEqual([], updates)
+
+        release.set()
+        deadline = time.monotonic() + 5
+        while len(updates) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([0, 1], updates)
+        self.assertEqual(0, config_processor.open_updates)
+
+    def test_update_ends_when_it_cannot_be_submitted(self):
+        config_processor = FakeConfigProcessor("working", lambda e: None)
+        self.processor_executor.shutdown()
+
+        with self.assertLogs("utils.processor_executor", level="ERROR"):
+            update_result = self.processor_executor.update_configurations(
+                ENTITY, [config_processor]
+            )
+
+        self.assertEqual(
+            ProcessorUpdateStatus.FAILED,
+            update_result.processor_results[0].status,
+        )
+        self.assertEqual(0, config_processor.open_updates)
+
+
+if __name__ == "__main__":
+    unittest.main()
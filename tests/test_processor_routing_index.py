@@ -0,0 +1,106 @@
+import unittest
+
+from config_processors.config_processors_initializer import \
+    ConfigProcessorsInitializer
+from entities.remote_entity import RemoteEntity
+
+FIRST_ID_HASH = (
+    "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9"
+)
+SECOND_ID_HASH = (
+    "ee17d43ddcbf50090b137e83569dea155a5916e212f5d760c223b76ae8ed2de2"
+)
+
+VERSION_MANAGER_CFG = {
+    "type": "LOCAL",
+    "config_folder_path": "/tmp/ti_wizard_configs",
+    "config_file_name": "cfg",
+    "config_file_format": "JSON",
+}
+
+
+def get_processor_cfg(filters=None):
+    processor_cfg = {"type": "CPCL", "version_manager": VERSION_MANAGER_CFG}
+    if filters is not None:
+        processor_cfg["filters"] = filters
+    return processor_cfg
+
+
+class TestProcessorRoutingIndex(unittest.TestCase):
+    def get_relevant_processor_names(
+        self, processors_cfg, id_hash, entity_type
+    ):
+        initializer = ConfigProcessorsInitializer(
+            {"processor_specific_settings": processors_cfg}
+        )
+        config_processors = initializer.get_processors()
+        routing_index = initializer.get_routing_index(config_processors)
+
+        entity = RemoteEntity.from_data(
+            {"id_hash": id_hash, "entity_type": entity_type}
+        )
+        return [p.name for p in routing_index.get_relevant_processors(entity)]
+
+    def test_unfiltered_processor_is_always_relevant(self):
+        processors_cfg = {"all": get_processor_cfg()}
+        self.assertEqual(
+            ["all"],
+            self.get_relevant_processor_names(
+                processors_cfg, FIRST_ID_HASH, "SAML_SP"
+            ),
+        )
+
+    def test_processors_are_routed_by_id_hash(self):
+        processors_cfg = {
+            "first": get_processor_cfg([FIRST_ID_HASH]),
+            "second": get_processor_cfg([{"id_hash": SECOND_ID_HASH}]),
+        }
+        self.assertEqual(
+            ["second"],
+            self.get_relevant_processor_names(
+                processors_cfg, SECOND_ID_HASH, "SAML_SP"
+            ),
+        )
+
+    def test_filter_kinds_are_combined_in_configured_order(self):
+        processors_cfg = {
+            "by_type": get_processor_cfg([{"entity_type": "OIDC_RP"}]),
+            "by_prefix": get_processor_cfg([{"id_hash_prefix": "b94"}]),
+            "unfiltered": get_processor_cfg(),
+            "by_id_hash": get_processor_cfg(
+                [FIRST_ID_HASH, {"id_hash_prefix": "b9"}]
+            ),
+            "other": get_processor_cfg([SECOND_ID_HASH]),
+        }
+        self.assertEqual(
+            ["by_type", "by_prefix", "unfiltered", "by_id_hash"],
+            self.get_relevant_processor_names(
+                processors_cfg, FIRST_ID_HASH, "OIDC_RP"
+            ),
+        )
+        self.assertEqual(
+            ["unfiltered", "other"],
+            self.get_relevant_processor_names(
+                processors_cfg, SECOND_ID_HASH, "SAML_SP"
+            ),
+        )
+
+    def test_invalid_filter_is_rejected(self):
+        processors_cfg = {"invalid": get_processor_cfg([{"unknown": "x"}])}
+        with self.assertRaises(ValueError):
+            self.get_relevant_processor_names(
+                processors_cfg, FIRST_ID_HASH, "SAML_SP"
+            )
+
+    def test_invalid_entity_type_filter_is_rejected(self):
+        processors_cfg = {
+            "invalid": get_processor_cfg([{"entity_type": "SAML"}])
+        }
+        with self.assertRaises(ValueError):
+            self.get_relevant_processor_names(
+                processors_cfg, FIRST_ID_HASH, "SAML_SP"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
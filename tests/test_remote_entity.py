@@ -0,0 +1,56 @@
+import unittest
+
+from entities.remote_entity import OidcRpEntity, RemoteEntity, SamlSpEntity
+
+OIDC_RP_DATA = {
+    "entity_type": "OIDC_RP",
+    "name": "Test RP",
+    "client_id": "test_client",
+    "client_secret": "secret",
+    "redirect_uri": "https://example-redirect-uri.com",
+    "id_hash":
+        "ee17d43ddcbf50090b137e83569dea155a5916e212f5d760c223b76ae8ed2de2",
+    "unknown_attribute": "ignored",
+}
+
+
+class TestRemoteEntity(unittest.TestCase):
+    def test_entity_class_is_chosen_by_entity_type(self):
+        self.assertIsInstance(
+            RemoteEntity.from_data({"entity_type": "SAML_SP"}), SamlSpEntity
+        )
+        self.assertIsInstance(
+            RemoteEntity.from_data(OIDC_RP_DATA), OidcRpEntity
+        )
+        self.assertIs(
+            RemoteEntity,
+            type(RemoteEntity.from_data({"entity_type": "UNKNOWN"})),
+        )
+
+    def test_missing_attributes_default_to_empty_string(self):
+        entity = RemoteEntity.from_data(OIDC_RP_DATA)
+
+        self.assertEqual("test_client", entity.client_id)
+        self.assertEqual("", entity.description)
+        self.assertEqual("", entity.dynamic_registration)
+
+    def test_entity_is_immutable(self):
+        entity = RemoteEntity.from_data(OIDC_RP_DATA)
+
+        with self.assertRaises(AttributeError):
+            entity.name = "changed"
+        with self.assertRaises(AttributeError):
+            del entity.name
+        with self.assertRaises(AttributeError):
+            entity.unknown_attribute = "value"
+
+    def test_entity_round_trips_through_dict(self):
+        entity = RemoteEntity.from_data(OIDC_RP_DATA)
+        entity_dict = entity.to_dict()
+
+        self.assertNotIn("unknown_attribute", entity_dict)
+        self.assertEqual(entity, RemoteEntity.from_data(entity_dict))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from entities.remote_entity import RemoteEntity
+from utils.processor_executor import ProcessorExecutor
+from utils.request_profiler import RequestProfiler, get_collapsed_stack
+
+ENTITY = RemoteEntity.from_data(
+    {
+        "entity_type": "SAML_SP",
+        "id_hash":
+            "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9",
+    }
+)
+
+
+class FakeConfigProcessor:
+    def __init__(self, name, update):
+        self.name = name
+        self.timeout = None
+        self.update = update
+
+    def begin_update(self, entity):
+        pass
+
+    def end_update(self, entity):
+        pass
+
+    def update_configuration(self, entity):
+        self.update(entity)
+
+
+def render_slowly(entity):
+    time.sleep(0.1)
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.processor_executor = ProcessorExecutor({"max_workers": 2})
+
+    def tearDown(self):
+        self.processor_executor.shutdown()
+        self.tmp_dir.cleanup()
+
+    def get_request_profiler(self, **cfg_overrides):
+        return RequestProfiler(
+            {
+                "profile_folder_path": self.tmp_dir.name,
+                "sampling_interval": 0.001,
+                **cfg_overrides,
+            }
+        )
+
+    def handle_request(self, request_profiler, update, is_requested=False):
+        # the request thread hands the entity over to a worker thread
+        request_profiler.start(is_requested)
+        request_profiler.attach(ENTITY)
+
+        def work():
+            with request_profiler.profile_update(ENTITY):
+                self.processor_executor.update_configurations(
+                    ENTITY, [FakeConfigProcessor("slow_processor", update)]
+                )
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        request_profiler.release()
+        worker.join()
+
+    def get_modified_at(self, file_name):
+        return os.stat(os.path.join(self.tmp_dir.name, file_name)).st_mtime_ns
+
+    def get_profiles(self):
+        profiles = []
+        # a profile being written is a .tmp file until it is complete
+        for file_path in sorted(
+            glob.glob(os.path.join(self.tmp_dir.name, "profile_*.json"))
+        ):
+            with open(file_path) as f:
+                profiles.append(json.load(f))
+        return profiles
+
+    def test_requested_profile_follows_update_to_processors(self):
+        request_profiler = self.get_request_profiler()
+        self.handle_request(request_profiler, render_slowly, True)
+
+        profiles = self.get_profiles()
+        self.assertEqual(1, len(profiles))
+        self.assertEqual("header", profiles[0]["trigger"])
+        self.assertEqual(ENTITY.id_hash, profiles[0]["id_hash"])
+        self.assertEqual("SAML_SP", profiles[0]["entity_type"])
+        self.assertEqual(["slow_processor"], profiles[0]["processors"])
+        self.assertGreater(profiles[0]["sample_count"], 0)
+        self.assertTrue(
+            any(
+                "test_request_profiler.render_slowly" in stack
+                for stack in profiles[0]["stacks"]
+            )
+        )
+
+    def test_requests_are_not_profiled_unless_enabled(self):
+        request_profiler = self.get_request_profiler(sample_rate=1.0)
+        self.handle_request(request_profiler, render_slowly)
+
+        self.assertEqual([], self.get_profiles())
+
+    def test_only_slow_requests_are_captured(self):
+        request_profiler = self.get_request_profiler(
+            enabled=True, latency_threshold=0.05
+        )
+        self.handle_request(request_profiler, lambda entity: None)
+        self.assertEqual([], self.get_profiles())
+
+        self.handle_request(request_profiler, render_slowly)
+        profiles = self.get_profiles()
+        self.assertEqual(["slow"], [p["trigger"] for p in profiles])
+        self.assertGreaterEqual(profiles[0]["busy_seconds"], 0.05)
+
+    def test_profile_ends_with_timed_out_processor(self):
+        request_profiler = self.get_request_profiler()
+        processor_finished = threading.Event()
+
+        def render_too_slowly(entity):
+            time.sleep(0.2)
+            processor_finished.set()
+
+        request_profiler.start(True)
+        request_profiler.attach(ENTITY)
+        slow_processor = FakeConfigProcessor("slow", render_too_slowly)
+        slow_processor.timeout = 0.01
+
+        def work():
+            with request_profiler.profile_update(ENTITY):
+                self.processor_executor.update_configurations(
+                    ENTITY, [slow_processor]
+                )
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        request_profiler.release()
+        worker.join()
+        # the update is over, the processor thread still works on it
+        self.assertEqual([], self.get_profiles())
+
+        processor_finished.wait(5)
+        deadline = time.monotonic() + 5
+        while not self.get_profiles() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(
+            ["header"], [p["trigger"] for p in self.get_profiles()]
+        )
+
+    def test_detached_profile_ends_with_request(self):
+        request_profiler = self.get_request_profiler()
+        request_profiler.start(True)
+        request_profiler.attach(ENTITY)
+
+        # e.g. the update could not be enqueued
+        request_profiler.detach(ENTITY)
+        request_profiler.release()
+
+        self.assertEqual(1, len(self.get_profiles()))
+
+    def test_collapsed_stack_without_qualified_names(self):
+        # Python 3.10 code objects have no co_qualname
+        class Code:
+            co_name = "render"
+
+        class Frame:
+            f_code = Code()
+            f_globals = {"__name__": "processors"}
+            f_back = None
+
+        self.assertEqual("processors.render", get_collapsed_stack(Frame()))
+
+    def test_profiles_are_written_to_bounded_ring(self):
+        request_profiler = self.get_request_profiler(
+            enabled=True, sample_rate=1.0, max_profile_count=2
+        )
+        for _ in range(3):
+            self.handle_request(request_profiler, lambda entity: None)
+
+        self.assertEqual(
+            ["profile_0000.json", "profile_0001.json"],
+            sorted(os.listdir(self.tmp_dir.name)),
+        )
+        # the third profile overwrote the first one, a restarted connector
+        # continues after it
+        restarted_profiler = self.get_request_profiler(
+            enabled=True, sample_rate=1.0, max_profile_count=2
+        )
+        self.handle_request(restarted_profiler, lambda entity: None)
+        self.assertGreater(
+            self.get_modified_at("profile_0001.json"),
+            self.get_modified_at("profile_0000.json"),
+        )
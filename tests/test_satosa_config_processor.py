@@ -0,0 +1,180 @@
+import copy
+import tempfile
+import unittest
+
+from config_processors.satosa.satosa_config_processor import \
+    SatosaConfigProcessor
+from config_version_managers.config_serializers import CONFIG_SERIALIZERS
+from entities.remote_entity import RemoteEntity
+from utils.frozen_config import FrozenDict
+
+FIRST_ID_HASH = (
+    "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9"
+)
+SECOND_ID_HASH = (
+    "ee17d43ddcbf50090b137e83569dea155a5916e212f5d760c223b76ae8ed2de2"
+)
+
+
+def get_saml_sp(id_hash: str, name: str) -> RemoteEntity:
+    return RemoteEntity.from_data(
+        {
+            "entity_type": "SAML_SP",
+            "id_hash": id_hash,
+            "name": name,
+            "description": f"{name} description",
+            "entity_id": f"https://{name}.example.com/shibboleth",
+            "metadata_url": f"https://{name}.example.com/metadata",
+        }
+    )
+
+
+def thaw(config):
+    if isinstance(config, dict):
+        return {key: thaw(value) for key, value in config.items()}
+    if isinstance(config, list):
+        return [thaw(item) for item in config]
+    return config
+
+
+class TestSatosaConfigProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_processor = SatosaConfigProcessor(
+            {
+                "name": "satosa_processor",
+                "type": "SATOSA",
+                "version_manager": {
+                    "type": "LOCAL",
+                    "config_folder_path": self.tmp_dir.name,
+                    "config_file_name": "satosa",
+                    "config_file_format": "YAML",
+                },
+            }
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_entity_values_are_overlaid_on_template(self):
+        config = self.config_processor.prepare_configuration(
+            get_saml_sp(FIRST_ID_HASH, "first")
+        )
+
+        self.assertEqual(
+            "satosa.frontends.saml2.SAMLFrontend", config["module"]
+        )
+        self.assertEqual("Saml2IDP_b943ca408d3a2a4f", config["name"])
+        idp_config = config["config"]["idp_config"]
+        self.assertEqual(
+            {"remote": [{"url": "https://first.example.com/metadata"}]},
+            idp_config["metadata"],
+        )
+        self.assertEqual(
+            [{"lang": "en", "text": "first"}],
+            idp_config["service"]["idp"]["ui_info"]["display_name"],
+        )
+        # values next to the overridden ones are kept
+        self.assertEqual("frontend.key", idp_config["key_file"])
+        self.assertEqual(
+            "urn:oasis:names:tc:SAML:2.0:attrname-format:uri",
+            idp_config["service"]["idp"]["policy"]["default"]["name_form"],
+        )
+
+    def test_configs_share_values_not_overridden(self):
+        first_config = self.config_processor.prepare_configuration(
+            get_saml_sp(FIRST_ID_HASH, "first")
+        )
+        second_config = self.config_processor.prepare_configuration(
+            get_saml_sp(SECOND_ID_HASH, "second")
+        )
+
+        first_idp_config = first_config["config"]["idp_config"]
+        second_idp_config = second_config["config"]["idp_config"]
+        self.assertIs(
+            first_idp_config["contact_person"],
+            second_idp_config["contact_person"],
+        )
+        self.assertIsNot(first_idp_config, second_idp_config)
+        self.assertEqual(
+            [{"url": "https://second.example.com/metadata"}],
+            second_idp_config["metadata"]["remote"],
+        )
+
+    def test_configs_are_immutable(self):
+        config = self.config_processor.prepare_configuration(
+            get_saml_sp(FIRST_ID_HASH, "first")
+        )
+
+        self.assertIsInstance(config, FrozenDict)
+        with self.assertRaises(TypeError):
+            config["config"]["idp_config"]["contact_person"].append({})
+        with self.assertRaises(TypeError):
+            config["name"] = "changed"
+        self.assertIs(config, copy.deepcopy(config))
+
+    def test_configs_of_all_entity_types_are_serialized(self):
+        entities = [
+            get_saml_sp(FIRST_ID_HASH, "first"),
+            RemoteEntity.from_data(
+                {
+                    "entity_type": "SAML_IDP",
+                    "id_hash": FIRST_ID_HASH,
+                    "name": "idp",
+                    "metadata_url": "https://idp.example.com/metadata",
+                }
+            ),
+            RemoteEntity.from_data(
+                {
+                    "entity_type": "OIDC_RP",
+                    "id_hash": FIRST_ID_HASH,
+                    "name": "rp",
+                    "client_id": "rp_client",
+                    "client_secret": "secret",
+                    "redirect_uri": "https://rp.example.com/redirect",
+                }
+            ),
+            RemoteEntity.from_data(
+                {
+                    "entity_type": "OIDC_OP",
+                    "id_hash": FIRST_ID_HASH,
+                    "name": "op",
+                    "description": "op description",
+                    "client_id": "op_client",
+                    "discovery_url": "https://op.example.com"
+                    "/.well-known/openid-configuration",
+                }
+            ),
+        ]
+
+        for entity in entities:
+            config = self.config_processor.prepare_configuration(entity)
+            for config_file_format, serializer in CONFIG_SERIALIZERS.items():
+                with self.subTest(
+                    entity_type=entity.entity_type,
+                    config_file_format=config_file_format.name,
+                ):
+                    # frozen configs are written like plain ones
+                    self.assertEqual(
+                        serializer(thaw(config)), serializer(config)
+                    )
+
+        oidc_op_config = self.config_processor.prepare_configuration(
+            entities[3]
+        )
+        self.assertEqual(
+            "https://op.example.com",
+            oidc_op_config["config"]["provider_metadata"]["issuer"],
+        )
+        # the same format as the ui_info of the template
+        self.assertEqual(
+            {
+                "display_name": [["op", "en"]],
+                "description": [["op description", "en"]],
+            },
+            thaw(oidc_op_config["config"]["entity_info"]["ui_info"]),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import hmac
+import unittest
+from hashlib import sha256
+
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from utils.signature_validator import SignatureValidator
+
+BODY = b'{"object": {"entity_type": "SAML_SP"}}'
+TIMESTAMP = "1697818014"
+
+
+def sign(secret: str, body: bytes = BODY, timestamp: str = TIMESTAMP) -> str:
+    return hmac.new(
+        secret.encode(), timestamp.encode() + b":" + body, sha256
+    ).hexdigest()
+
+
+def get_headers(*signatures: str) -> Headers:
+    return Headers(
+        {
+            "Django-Webhook-Signature-v1": ",".join(signatures),
+            "Django-Webhook-Request-Timestamp": TIMESTAMP,
+        }
+    )
+
+
+def get_chunks(body: bytes, chunk_size: int = 5):
+    body_chunks = []
+    for start in range(0, len(body), chunk_size):
+        body_chunks.append(body[start:start + chunk_size])
+    return body_chunks
+
+
+class TestSignatureValidator(unittest.TestCase):
+    def get_signature_validator(self, **shared_settings):
+        return SignatureValidator({"shared_settings": shared_settings})
+
+    def test_valid_signature(self):
+        signature_validator = self.get_signature_validator(
+            webhook_secret="secret"
+        )
+        self.assertTrue(
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("secret")), get_chunks(BODY)
+            )
+        )
+
+    def test_invalid_signature(self):
+        signature_validator = self.get_signature_validator(
+            webhook_secret="secret"
+        )
+        self.assertFalse(
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("other secret")), get_chunks(BODY)
+            )
+        )
+        self.assertFalse(
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("secret")), get_chunks(BODY + b" ")
+            )
+        )
+        self.assertFalse(
+            signature_validator.has_valid_body_signature(
+                get_headers(), get_chunks(BODY)
+            )
+        )
+
+    def test_rotated_secrets(self):
+        signature_validator = self.get_signature_validator(
+            webhook_secrets=["new secret", "old secret"]
+        )
+        # the backend signs with all of its secrets during the rotation
+        self.assertTrue(
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("old secret"), sign("unknown secret")),
+                get_chunks(BODY),
+            )
+        )
+        self.assertTrue(
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("new secret")), get_chunks(BODY)
+            )
+        )
+
+    def test_missing_secret_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.get_signature_validator()
+
+    def test_body_exceeding_max_size_is_rejected(self):
+        signature_validator = self.get_signature_validator(
+            webhook_secret="secret", webhook_max_body_size=16
+        )
+        with self.assertRaises(RequestEntityTooLarge):
+            signature_validator.has_valid_body_signature(
+                get_headers(sign("secret")), get_chunks(BODY)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+    def test_header_signature_covers_timestamp_and_value(self):
+        signature_validator = self.get_signature_validator(
+            webhook_secret="secret"
+        )
+        headers = get_headers()
+        headers["Profile-Signature"] = sign("secret", b"profile")
+
+        self.assertTrue(
+            signature_validator.has_valid_header_signature(
+                headers, "Profile-Signature", b"profile"
+            )
+        )
+        self.assertFalse(
+            signature_validator.has_valid_header_signature(
+                headers, "Profile-Signature", b"other"
+            )
+        )
+        headers["Django-Webhook-Request-Timestamp"] = "1697818015"
+        self.assertFalse(
+            signature_validator.has_valid_header_signature(
+                headers, "Profile-Signature", b"profile"
+            )
+        )
+        self.assertFalse(
+            signature_validator.has_valid_header_signature(
+                get_headers(), "Profile-Signature", b"profile"
+            )
+        )
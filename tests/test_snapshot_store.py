@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from config_version_managers.snapshot_store import (INDEX_RECORD, Snapshot,
+                                                    SnapshotStore)
+
+
+def write_file(file_path: str, content: bytes) -> None:
+    with open(file_path, "wb") as written_file:
+        written_file.write(content)
+
+
+def sync_file(file_path: str) -> None:
+    pass
+
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_folder_path = Path(self.tmp_dir.name) / "store"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_snapshot_store(self, **kwargs):
+        return SnapshotStore(
+            self.store_folder_path, write_file, sync_file, **kwargs
+        )
+
+    def get_blob_count(self):
+        return sum(
+            len(file_names)
+            for _, _, file_names in os.walk(self.store_folder_path / "blobs")
+        )
+
+    def test_identical_content_is_stored_once(self):
+        snapshot_store = self.get_snapshot_store()
+        snapshot_store.save(b"a", 1)
+        snapshot_store.save(b"b", 2)
+        snapshot_store.save(b"a", 3)
+
+        self.assertEqual(3, len(snapshot_store))
+        self.assertEqual(2, self.get_blob_count())
+
+    def test_latest_and_as_of_lookups(self):
+        snapshot_store = self.get_snapshot_store()
+        self.assertIsNone(snapshot_store.get_latest())
+        for timestamp, content in ((10, b"a"), (20, b"b"), (30, b"c")):
+            snapshot_store.save(content, timestamp)
+
+        self.assertEqual(
+            b"c", snapshot_store.read(snapshot_store.get_latest())
+        )
+        self.assertIsNone(snapshot_store.get_as_of(9))
+        self.assertEqual(
+            b"a", snapshot_store.read(snapshot_store.get_as_of(10))
+        )
+        self.assertEqual(
+            b"b", snapshot_store.read(snapshot_store.get_as_of(29))
+        )
+        self.assertEqual(
+            b"c", snapshot_store.read(snapshot_store.get_as_of(99))
+        )
+
+    def test_timestamps_never_decrease(self):
+        snapshot_store = self.get_snapshot_store()
+        snapshot_store.save(b"a", 20)
+        snapshot = snapshot_store.save(b"b", 10)
+
+        self.assertEqual(20, snapshot.timestamp)
+        self.assertEqual(snapshot, snapshot_store.get_as_of(20))
+
+    def test_index_survives_reopening(self):
+        snapshot_store = self.get_snapshot_store()
+        snapshot_store.save(b"a", 1)
+        snapshot_store.save(b"b", 2)
+        snapshot_store.close()
+
+        reopened_store = self.get_snapshot_store()
+        self.assertEqual(
+            [snapshot_store.get_as_of(1), snapshot_store.get_as_of(2)],
+            reopened_store.get_snapshots(),
+        )
+
+    def test_torn_record_is_dropped(self):
+        snapshot_store = self.get_snapshot_store()
+        snapshot_store.save(b"a", 1)
+        snapshot_store.close()
+        with open(self.store_folder_path / "index", "ab") as index_file:
+            index_file.write(b"\x00" * (INDEX_RECORD.size // 2))
+
+        reopened_store = self.get_snapshot_store()
+        self.assertEqual(1, len(reopened_store))
+        snapshot = reopened_store.save(b"b", 2)
+        self.assertEqual([snapshot], reopened_store.get_snapshots()[1:])
+
+    def test_retention_count_compacts_index_and_blobs(self):
+        snapshot_store = self.get_snapshot_store(retention_count=2)
+        for timestamp in range(10):
+            snapshot_store.save(str(timestamp).encode(), timestamp)
+        snapshot_store.compact(10)
+
+        self.assertEqual(
+            [Snapshot(8, snapshot_store.get_as_of(8).digest)],
+            snapshot_store.get_snapshots()[:1],
+        )
+        self.assertEqual(2, len(snapshot_store))
+        self.assertEqual(2, self.get_blob_count())
+
+    def test_retention_max_age_keeps_latest_snapshot(self):
+        snapshot_store = self.get_snapshot_store(retention_max_age=5)
+        snapshot_store.save(b"a", 1)
+        snapshot_store.save(b"b", 2)
+        snapshot_store.compact(100)
+
+        self.assertEqual(1, len(snapshot_store))
+        self.assertEqual(
+            b"b", snapshot_store.read(snapshot_store.get_latest())
+        )
+
+    def test_compaction_keeps_blobs_of_retained_content(self):
+        snapshot_store = self.get_snapshot_store(retention_count=1)
+        snapshot_store.save(b"a", 1)
+        snapshot_store.save(b"a", 2)
+        snapshot_store.compact(3)
+
+        self.assertEqual(1, len(snapshot_store))
+        self.assertEqual(
+            b"a", snapshot_store.read(snapshot_store.get_latest())
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
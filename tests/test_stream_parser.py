@@ -0,0 +1,79 @@
+import io
+import json
+import unittest
+
+from utils.stream_parser import (StreamParseError, iter_json_array_objects,
+                                 iter_ndjson_objects)
+
+ENTITIES = [
+    {"entity_type": "SAML_SP", "name": "first", "tags": ["a", "b"]},
+    {"entity_type": "OIDC_RP", "name": "druhý ☃", "nested": {"x": [1, {}]}},
+    {"entity_type": "OIDC_OP", "name": "third"},
+]
+
+
+class TestStreamParser(unittest.TestCase):
+    def parse_array(self, body: bytes, chunk_size: int = 7):
+        return list(iter_json_array_objects(io.BytesIO(body), chunk_size))
+
+    def parse_ndjson(self, body: bytes, chunk_size: int = 7):
+        return list(iter_ndjson_objects(io.BytesIO(body), chunk_size))
+
+    def test_json_array_is_parsed_across_chunks(self):
+        body = json.dumps(ENTITIES, ensure_ascii=False, indent=2).encode()
+        for chunk_size in (1, 3, 7, 1024):
+            self.assertEqual(ENTITIES, self.parse_array(body, chunk_size))
+
+    def test_empty_json_array(self):
+        self.assertEqual([], self.parse_array(b" [ ] \n"))
+
+    def test_ndjson_is_parsed_across_chunks(self):
+        body = "\n".join(
+            json.dumps(entity, ensure_ascii=False) for entity in ENTITIES
+        ).encode()
+        for chunk_size in (1, 3, 7, 1024):
+            self.assertEqual(ENTITIES, self.parse_ndjson(body, chunk_size))
+
+    def test_elements_before_invalid_element_are_yielded(self):
+        body = b'[{"name": "first"}, {"name": }]'
+        parsed_objects = []
+        with self.assertRaises(StreamParseError):
+            for parsed_object in iter_json_array_objects(io.BytesIO(body)):
+                parsed_objects.append(parsed_object)
+        self.assertEqual([{"name": "first"}], parsed_objects)
+
+    def test_invalid_json_arrays_are_rejected(self):
+        invalid_bodies = [
+            b'{"name": "not an array"}',
+            b'[{"name": "first"} {"name": "second"}]',
+            b'[{"name": "first"}, 1]',
+            b'[{"name": "unterminated"',
+            b'[{"name": "first"}] trailing',
+        ]
+        for invalid_body in invalid_bodies:
+            with self.assertRaises(StreamParseError):
+                self.parse_array(invalid_body)
+
+    def test_oversized_element_is_rejected(self):
+        body = b'[{"name": "' + b"x" * 100 + b"}]"
+        with self.assertRaises(StreamParseError):
+            list(iter_json_array_objects(io.BytesIO(body), 8, 32))
+
+    def test_ndjson_line_must_be_object(self):
+        with self.assertRaises(StreamParseError):
+            self.parse_ndjson(b'{"name": "first"}\n[1, 2]\n')
+
+    def test_invalid_utf8_is_rejected(self):
+        invalid_bodies = [
+            b'[{"name": "\xff"}]',
+            # a multi-byte character cut off at the end of the stream
+            b'[{"name": "first"}]\xc3',
+        ]
+        for invalid_body in invalid_bodies:
+            for parse in (self.parse_array, self.parse_ndjson):
+                with self.assertRaises(StreamParseError):
+                    parse(invalid_body, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
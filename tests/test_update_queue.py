@@ -0,0 +1,111 @@
+import os
+import stat
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from entities.remote_entity import RemoteEntity
+from utils.update_journal import UpdateJournal
+from utils.update_queue import UpdateQueue
+
+ID_HASH = "b943ca408d3a2a4f13b9db8db10afe4c9bf0e323173f498ac188590b0843d8d9"
+
+
+def get_entity(id_hash, name):
+    return RemoteEntity.from_data(
+        {"entity_type": "SAML_SP", "id_hash": id_hash, "name": name}
+    )
+
+
+class TestUpdateQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.queue_cfg = {
+            "journal_folder_path": self.tmp_dir.name,
+            "worker_count": 2,
+        }
+        self.processed = []
+        self.processed_lock = threading.Lock()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def record_update(self, entity):
+        with self.processed_lock:
+            self.processed.append(entity.name)
+
+    def test_updates_are_processed_in_order_per_entity(self):
+        update_queue = UpdateQueue(self.queue_cfg, self.record_update)
+        update_queue.start()
+        for i in range(20):
+            update_queue.enqueue(get_entity(ID_HASH, str(i)))
+        update_queue.join()
+        update_queue.stop()
+
+        self.assertEqual([str(i) for i in range(20)], self.processed)
+        self.assertEqual(0, update_queue.depth())
+
+    def test_unacknowledged_updates_are_replayed(self):
+        # simulate a crash - updates are journaled but never processed
+        journal = UpdateJournal(Path(self.tmp_dir.name))
+        journal.open()
+        processed_seq = journal.append(
+            get_entity(ID_HASH, "done").to_dict()
+        )
+        journal.append(get_entity(ID_HASH, "pending_1").to_dict())
+        journal.append(get_entity(ID_HASH, "pending_2").to_dict())
+        journal.acknowledge(processed_seq)
+        journal.close()
+
+        update_queue = UpdateQueue(self.queue_cfg, self.record_update)
+        update_queue.start()
+        update_queue.join()
+        update_queue.stop()
+
+        self.assertEqual(["pending_1", "pending_2"], self.processed)
+
+    def test_journal_is_readable_by_owner_only(self):
+        journal = UpdateJournal(Path(self.tmp_dir.name))
+        for _ in range(2):
+            # the journal is created, then rewritten on the next open
+            journal.open()
+            journal.append(get_entity(ID_HASH, "pending").to_dict())
+            journal.close()
+
+            journal_file_path = os.path.join(
+                self.tmp_dir.name, "update_journal.jsonl"
+            )
+            self.assertEqual(
+                0o600, stat.S_IMODE(os.stat(journal_file_path).st_mode)
+            )
+
+    def test_update_future_resolves_to_handler_result(self):
+        update_queue = UpdateQueue(self.queue_cfg, lambda entity: entity.name)
+        update_queue.start()
+        update_future = update_queue.enqueue(get_entity(ID_HASH, "done"))
+
+        self.assertEqual("done", update_future.result(timeout=5))
+        update_queue.stop()
+
+    def test_failing_update_is_acknowledged(self):
+        def failing_update(entity):
+            raise RuntimeError("processing failed")
+
+        update_queue = UpdateQueue(self.queue_cfg, failing_update)
+        update_queue.start()
+        with self.assertLogs("utils.update_queue", level="ERROR"):
+            update_queue.enqueue(get_entity(ID_HASH, "failing"))
+            update_queue.join()
+        update_queue.stop()
+
+        replay_queue = UpdateQueue(self.queue_cfg, self.record_update)
+        replay_queue.start()
+        replay_queue.join()
+        replay_queue.stop()
+
+        self.assertEqual([], self.processed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import argparse
+from typing import List
+
+from config_version_managers.local_config_version_manager import \
+    LocalConfigVersionManager
+from enums.config_version_manager_type import ConfigVersionManagerType
+from enums.local_storage_mode import LocalStorageMode
+from utils.config_loader import ConfigLoader
+
+
+def parse_args(args: List[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Migrates the timestamped config files of LOCAL version "
+        "managers into the snapshot stores of their storage mode."
+    )
+    parser.add_argument(
+        "--storage-mode",
+        choices=[
+            LocalStorageMode.SNAPSHOTS.name,
+            LocalStorageMode.DELTAS.name,
+        ],
+        help="storage mode to migrate to, defaults to the configured one",
+    )
+    parser.add_argument(
+        "--processor",
+        action="append",
+        dest="processor_names",
+        help="name of a processor to migrate, defaults to all of them",
+    )
+    parser.add_argument(
+        "--remove-migrated",
+        action="store_true",
+        help="remove the timestamped files once they are migrated",
+    )
+    return parser.parse_args(args)
+
+
+def main(args: List[str] = None) -> None:
+    parsed_args = parse_args(args)
+    processors_cfg = ConfigLoader.load_config()
+    processor_specific_settings = processors_cfg.get(
+        "processor_specific_settings", {}
+    )
+
+    for processor_name, cfg_values in processor_specific_settings.items():
+        if (
+            parsed_args.processor_names
+            and processor_name not in parsed_args.processor_names
+        ):
+            continue
+
+        version_manager_cfg = dict(cfg_values.get("version_manager", {}))
+        if (
+            version_manager_cfg.get("type")
+            != ConfigVersionManagerType.LOCAL.name
+        ):
+            continue
+        if parsed_args.storage_mode:
+            version_manager_cfg["storage_mode"] = parsed_args.storage_mode
+        storage_mode = version_manager_cfg.get(
+            "storage_mode", LocalStorageMode.TIMESTAMPED_FILES.name
+        )
+        if storage_mode == LocalStorageMode.TIMESTAMPED_FILES.name:
+            print(
+                f"{processor_name}: skipped, storage mode is {storage_mode}"
+            )
+            continue
+
+        version_manager = LocalConfigVersionManager(version_manager_cfg)
+        migrated_file_count = version_manager.migrate_timestamped_files(
+            parsed_args.remove_migrated
+        )
+        print(
+            f"{processor_name}: migrated {migrated_file_count} files to "
+            f"{storage_mode}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import re
+from typing import Any, Dict, List, Tuple
 
 from flask import Request
 from marshmallow import Schema, ValidationError, fields, validates_schema
 from marshmallow.validate import OneOf, Regexp
 
+from entities.remote_entity import RemoteEntity
 from enums.entity_type import EntityType
 
 entity_types = [e.name for e in EntityType]
@@ -40,7 +42,6 @@ class OidcOpSchema(BaseSchema):
 
 
 class OidcRpSchema(BaseSchema):
-    print()
     client_id = fields.Str(required=True)
     redirect_uri = fields.Url(required=True)
     dynamic_registration = fields.Bool(required=False)
@@ -61,36 +62,91 @@ class OidcRpSchema(BaseSchema):
 
 
 class ValidationResult:
-    def __init__(self, has_valid_data: bool, message: str = None):
+    def __init__(
+        self,
+        has_valid_data: bool,
+        message: str = None,
+        entity: RemoteEntity = None,
+        manifest: List[Tuple[str, str]] = None,
+    ):
         self.has_valid_data = has_valid_data
         self.message = message
+        # the valid data parsed into an entity, used by the rest of the
+        # pipeline instead of the raw request data
+        self.entity = entity
+        # (id_hash, content digest) pairs of a valid reconcile manifest
+        self.manifest = manifest
 
 
-def validate_data(request: Request) -> ValidationResult:
-    data = request.json.get("object")
+# schemas are built once and shared between threads - marshmallow schemas
+# keep no per-load state, so concurrent loads on one instance are safe
+BASE_SCHEMA = BaseSchema()
+SAML_SCHEMA = SamlSchema()
+ENTITY_TYPE_SCHEMAS = {
+    "SAML_SP": SAML_SCHEMA,
+    "SAML_IDP": SAML_SCHEMA,
+    "OIDC_RP": OidcRpSchema(),
+    "OIDC_OP": OidcOpSchema(),
+}
+
+
+def get_entity_schema(data: Dict[str, Any]) -> Schema:
+    entity_type = data.get("entity_type")
+    # entity-specific schemas contain all base fields, the base schema only
+    # reports the missing or unknown entity type
+    if not isinstance(entity_type, str):
+        return BASE_SCHEMA
+
+    return ENTITY_TYPE_SCHEMAS.get(entity_type, BASE_SCHEMA)
+
 
-    if not data:
+def validate_entity_data(data: Dict[str, Any]) -> ValidationResult:
+    if not data or not isinstance(data, dict):
         return ValidationResult(
             has_valid_data=False,
             message="Request must contain remote entity data.",
         )
 
     try:
-        base_schema = BaseSchema()
-        result = base_schema.load(data)
-        entity_type = result.get("entity_type")
-
-        match entity_type:
-            case "SAML_SP" | "SAML_IDP":
-                saml_schema = SamlSchema()
-                saml_schema.load(data)
-            case "OIDC_RP":
-                oidc_rp_schema = OidcRpSchema()
-                oidc_rp_schema.load(data)
-            case "OIDC_OP":
-                oidc_op_schema = OidcOpSchema()
-                oidc_op_schema.load(data)
+        loaded_data = get_entity_schema(data).load(data)
     except ValidationError as err:
         return ValidationResult(has_valid_data=False, message=err.messages)
 
-    return ValidationResult(has_valid_data=True)
+    # the typed values of the schema (e.g. "false" loaded as False) replace
+    # the received ones, attributes unknown to the schema are kept as sent
+    return ValidationResult(
+        has_valid_data=True,
+        entity=RemoteEntity.from_data({**data, **loaded_data}),
+    )
+
+
+def validate_manifest_data(data: Dict[str, Any]) -> ValidationResult:
+    manifest_data = data.get("manifest") if isinstance(data, dict) else None
+    if not isinstance(manifest_data, list):
+        return ValidationResult(
+            has_valid_data=False,
+            message="Request must contain a manifest list.",
+        )
+
+    # the manifest lists every entity of the backend, so its pairs are
+    # checked without building a schema object per entity
+    manifest = []
+    for index, pair in enumerate(manifest_data):
+        if not (
+            isinstance(pair, list)
+            and len(pair) == 2
+            and all(isinstance(value, str) for value in pair)
+            and all(SHA_256_HASH_REGEX.match(value) for value in pair)
+        ):
+            return ValidationResult(
+                has_valid_data=False,
+                message=f"Manifest item {index} must be a pair of an "
+                "id_hash and a content digest (SHA256 hashes).",
+            )
+        manifest.append((pair[0], pair[1].lower()))
+
+    return ValidationResult(has_valid_data=True, manifest=manifest)
+
+
+def validate_data(request: Request) -> ValidationResult:
+    return validate_entity_data(request.json.get("object"))
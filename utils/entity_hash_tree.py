@@ -0,0 +1,113 @@
+import json
+import zlib
+from hashlib import sha256
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_BUCKET_COUNT = 1024
+
+
+def get_content_digest(entity_data: Dict[str, Any]) -> str:
+    # the backend computes the same digest of the entity attributes, so the
+    # serialization must not depend on the order of the keys or the spacing
+    return sha256(
+        json.dumps(
+            entity_data,
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        ).encode()
+    ).hexdigest()
+
+
+class EntityHashTree:
+    # content digests of the entities grouped into buckets by their id_hash,
+    # two trees with the same bucket count are compared bucket by bucket and
+    # only the entities of the buckets with a different hash are compared
+    def __init__(self, bucket_count: int = DEFAULT_BUCKET_COUNT):
+        self.bucket_count = bucket_count
+        self.__buckets: List[Dict[str, str]] = [
+            {} for _ in range(bucket_count)
+        ]
+        # bucket hashes are computed lazily, None marks a changed bucket
+        self.__bucket_hashes: List[Optional[bytes]] = [None] * bucket_count
+        self.__root_hash: Optional[bytes] = None
+
+    @staticmethod
+    def from_pairs(
+        pairs: Iterable[Tuple[str, str]],
+        bucket_count: int = DEFAULT_BUCKET_COUNT,
+    ) -> "EntityHashTree":
+        hash_tree = EntityHashTree(bucket_count)
+        for id_hash, content_digest in pairs:
+            hash_tree.set(id_hash, content_digest)
+        return hash_tree
+
+    def get_bucket_index(self, id_hash: str) -> int:
+        return zlib.crc32(id_hash.encode()) % self.bucket_count
+
+    def set(self, id_hash: str, content_digest: str) -> None:
+        bucket_index = self.get_bucket_index(id_hash)
+        self.__buckets[bucket_index][id_hash] = content_digest
+        self.__bucket_hashes[bucket_index] = None
+        self.__root_hash = None
+
+    def discard(self, id_hash: str) -> None:
+        bucket_index = self.get_bucket_index(id_hash)
+        if self.__buckets[bucket_index].pop(id_hash, None) is not None:
+            self.__bucket_hashes[bucket_index] = None
+            self.__root_hash = None
+
+    def get(self, id_hash: str) -> Optional[str]:
+        return self.__buckets[self.get_bucket_index(id_hash)].get(id_hash)
+
+    def get_bucket_hash(self, bucket_index: int) -> bytes:
+        bucket_hash = self.__bucket_hashes[bucket_index]
+        if bucket_hash is None:
+            bucket = self.__buckets[bucket_index]
+            bucket_hash = sha256(
+                "".join(
+                    f"{id_hash}:{bucket[id_hash]}\n"
+                    for id_hash in sorted(bucket)
+                ).encode()
+            ).digest()
+            self.__bucket_hashes[bucket_index] = bucket_hash
+        return bucket_hash
+
+    def get_root_hash(self) -> str:
+        if self.__root_hash is None:
+            self.__root_hash = sha256(
+                b"".join(
+                    self.get_bucket_hash(bucket_index)
+                    for bucket_index in range(self.bucket_count)
+                )
+            ).digest()
+        return self.__root_hash.hex()
+
+    def get_differing_buckets(self, other: "EntityHashTree") -> List[int]:
+        if self.bucket_count != other.bucket_count:
+            raise ValueError("Hash trees must have the same bucket count.")
+        if self.get_root_hash() == other.get_root_hash():
+            return []
+        return [
+            bucket_index
+            for bucket_index in range(self.bucket_count)
+            if self.get_bucket_hash(bucket_index)
+            != other.get_bucket_hash(bucket_index)
+        ]
+
+    def diff(self, other: "EntityHashTree") -> Tuple[Set[str], Set[str]]:
+        # entities of the other tree missing in this tree or with another
+        # digest, and entities of this tree missing in the other tree
+        changed_id_hashes = set()
+        removed_id_hashes = set()
+        for bucket_index in self.get_differing_buckets(other):
+            bucket = self.__buckets[bucket_index]
+            other_bucket = other.__buckets[bucket_index]
+            for id_hash, content_digest in other_bucket.items():
+                if bucket.get(id_hash) != content_digest:
+                    changed_id_hashes.add(id_hash)
+            removed_id_hashes.update(bucket.keys() - other_bucket.keys())
+        return changed_id_hashes, removed_id_hashes
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.__buckets)
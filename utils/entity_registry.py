@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, List, Set, Tuple
+
+from entities.remote_entity import RemoteEntity
+from utils.entity_hash_tree import (DEFAULT_BUCKET_COUNT, EntityHashTree,
+                                    get_content_digest)
+
+# entity attributes that must never be exposed through the read API or
+# stored in the registry file
+SECRET_ENTITY_ATTRIBUTES = {"client_secret"}
+# the registry file is compacted once it holds more than <ratio> times as
+# many records as there are entities
+DEFAULT_COMPACTION_RATIO = 4
+MIN_COMPACTED_RECORD_COUNT = 1000
+
+
+class EntityRecord:
+    __slots__ = (
+        "id_hash",
+        "entity_type",
+        "entity_data",
+        "processors",
+        "failed_processors",
+        "updated_at",
+        "etag",
+        "content_digest",
+        "omitted_attributes",
+    )
+
+    def __init__(
+        self,
+        id_hash: str,
+        entity_type: str,
+        entity_data: Dict[str, Any],
+        processors: List[str],
+        updated_at: str,
+        failed_processors: List[str] = None,
+        content_digest: str = None,
+        omitted_attributes: List[str] = None,
+    ):
+        self.id_hash = id_hash
+        self.entity_type = entity_type
+        self.entity_data = entity_data
+        self.processors = processors
+        # processors that failed to update the config of the entity
+        self.failed_processors = failed_processors or []
+        self.updated_at = updated_at
+        self.etag = sha256(
+            json.dumps(self.to_public_dict(), sort_keys=True).encode()
+        ).hexdigest()
+        # the digest of the full data, a record read from the registry file
+        # misses its secret attributes
+        self.content_digest = content_digest or get_content_digest(
+            entity_data
+        )
+        self.omitted_attributes = omitted_attributes or []
+
+    @property
+    def is_complete(self) -> bool:
+        # an entity can be regenerated from the data of a complete record only
+        return not self.omitted_attributes
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id_hash": self.id_hash,
+            "entity_type": self.entity_type,
+            "entity_data": self.entity_data,
+            "processors": self.processors,
+            "failed_processors": self.failed_processors,
+            "updated_at": self.updated_at,
+        }
+
+    def to_public_dict(self) -> Dict[str, Any]:
+        public_dict = self.to_dict()
+        public_dict["entity_data"] = {
+            key: value
+            for key, value in self.entity_data.items()
+            if key not in SECRET_ENTITY_ATTRIBUTES
+        }
+        return public_dict
+
+    def to_stored_dict(self) -> Dict[str, Any]:
+        stored_dict = self.to_public_dict()
+        stored_dict["content_digest"] = self.content_digest
+        stored_dict["omitted_attributes"] = sorted(
+            set(self.omitted_attributes)
+            | {
+                key
+                for key in SECRET_ENTITY_ATTRIBUTES
+                if self.entity_data.get(key)
+            }
+        )
+        return stored_dict
+
+    @staticmethod
+    def from_dict(record_dict: Dict[str, Any]) -> "EntityRecord":
+        return EntityRecord(
+            id_hash=record_dict["id_hash"],
+            entity_type=record_dict["entity_type"],
+            entity_data=record_dict["entity_data"],
+            processors=record_dict["processors"],
+            updated_at=record_dict["updated_at"],
+            failed_processors=record_dict.get("failed_processors"),
+            content_digest=record_dict.get("content_digest"),
+            omitted_attributes=record_dict.get("omitted_attributes"),
+        )
+
+
+class ManifestDiff:
+    __slots__ = (
+        "changed_id_hashes",
+        "removed_id_hashes",
+        "failed_records",
+    )
+
+    def __init__(
+        self,
+        changed_id_hashes: Set[str],
+        removed_id_hashes: Set[str],
+        failed_records: List[EntityRecord],
+    ):
+        # entities of the manifest that are unknown or have another digest
+        self.changed_id_hashes = changed_id_hashes
+        # entities of the registry missing in the manifest
+        self.removed_id_hashes = removed_id_hashes
+        # entities with the digest of the manifest whose last update failed
+        # and that can be regenerated from the registered data
+        self.failed_records = failed_records
+
+
+class EntityRegistry:
+    __REGISTRY_FILE_NAME = "entity_registry.jsonl"
+
+    def __init__(self, entity_registry_cfg):
+        self.__REGISTRY_FOLDER_PATH = Path(
+            entity_registry_cfg.get(
+                "registry_folder_path", "/var/lib/ti_wizard/entity_registry"
+            )
+        )
+        self.__REGISTRY_FILE_PATH = (
+            self.__REGISTRY_FOLDER_PATH / self.__REGISTRY_FILE_NAME
+        )
+        self.__LOCK = threading.RLock()
+        # identifies this registry instance in ETags, the generation counter
+        # starts from zero after every restart
+        self.__INSTANCE_ID = uuid.uuid4().hex
+        self.__HASH_TREE_BUCKET_COUNT = entity_registry_cfg.get(
+            "hash_tree_bucket_count", DEFAULT_BUCKET_COUNT
+        )
+        self.__COMPACTION_RATIO = entity_registry_cfg.get(
+            "compaction_ratio", DEFAULT_COMPACTION_RATIO
+        )
+
+        self.__records: Dict[str, EntityRecord] = {}
+        self.__id_hashes_by_entity_type: Dict[str, Set[str]] = {}
+        self.__id_hashes_by_processor: Dict[str, Set[str]] = {}
+        self.__failed_id_hashes: Set[str] = set()
+        self.__hash_tree = EntityHashTree(self.__HASH_TREE_BUCKET_COUNT)
+        self.__generation = 0
+        self.__registry_file = None
+        # records in the registry file, including the replaced ones
+        self.__stored_record_count = 0
+
+    def load(self) -> None:
+        self.__REGISTRY_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+
+        with self.__LOCK:
+            if self.__REGISTRY_FILE_PATH.is_file():
+                with open(self.__REGISTRY_FILE_PATH, "r") as registry_file:
+                    for line in registry_file:
+                        try:
+                            record_dict = json.loads(line)
+                        except json.JSONDecodeError:
+                            # torn write of the last record before a crash
+                            continue
+                        self.__index(EntityRecord.from_dict(record_dict))
+
+            self.__compact()
+
+    def close(self) -> None:
+        with self.__LOCK:
+            if self.__registry_file:
+                self.__registry_file.close()
+                self.__registry_file = None
+
+    def update(
+        self,
+        entity: RemoteEntity,
+        processors: List[str],
+        failed_processors: List[str] = None,
+    ) -> EntityRecord:
+        record = EntityRecord(
+            id_hash=entity.id_hash,
+            entity_type=entity.entity_type,
+            entity_data=entity.to_dict(),
+            processors=processors,
+            updated_at=datetime.now(timezone.utc).isoformat(),
+            failed_processors=failed_processors,
+        )
+
+        with self.__LOCK:
+            self.__index(record)
+            if self.__registry_file:
+                self.__registry_file.write(
+                    json.dumps(record.to_stored_dict()) + "\n"
+                )
+                self.__registry_file.flush()
+                self.__stored_record_count += 1
+                if self.__stored_record_count > self.__COMPACTION_RATIO * max(
+                    len(self.__records), MIN_COMPACTED_RECORD_COUNT
+                ):
+                    self.__compact()
+
+        return record
+
+    def get(self, id_hash: str) -> EntityRecord:
+        with self.__LOCK:
+            return self.__records.get(id_hash)
+
+    def find(
+        self, entity_type: str = None, processor: str = None
+    ) -> List[EntityRecord]:
+        with self.__LOCK:
+            candidate_sets = []
+            if entity_type:
+                candidate_sets.append(
+                    self.__id_hashes_by_entity_type.get(entity_type, set())
+                )
+            if processor:
+                candidate_sets.append(
+                    self.__id_hashes_by_processor.get(processor, set())
+                )
+
+            if candidate_sets:
+                id_hashes = set.intersection(*candidate_sets)
+            else:
+                id_hashes = self.__records.keys()
+
+            return [self.__records[id_hash] for id_hash in sorted(id_hashes)]
+
+    def get_listing_etag(self, *query) -> str:
+        # changes whenever any record changes, without serializing the listing
+        with self.__LOCK:
+            etag_source = f"{self.__INSTANCE_ID}:{self.__generation}:{query}"
+        return sha256(etag_source.encode()).hexdigest()
+
+    def diff_manifest(self, manifest: List[Tuple[str, str]]) -> ManifestDiff:
+        # the manifest tree is built outside of the lock, updates are only
+        # blocked while the trees are compared
+        manifest_hash_tree = EntityHashTree.from_pairs(
+            manifest, self.__HASH_TREE_BUCKET_COUNT
+        )
+
+        with self.__LOCK:
+            changed_id_hashes, removed_id_hashes = self.__hash_tree.diff(
+                manifest_hash_tree
+            )
+            failed_records = []
+            for id_hash in sorted(self.__failed_id_hashes):
+                record = self.__records[id_hash]
+                if manifest_hash_tree.get(id_hash) != record.content_digest:
+                    continue
+                # secrets are not stored, the backend resends the entity
+                if record.is_complete:
+                    failed_records.append(record)
+                else:
+                    changed_id_hashes.add(id_hash)
+
+        return ManifestDiff(
+            changed_id_hashes, removed_id_hashes, failed_records
+        )
+
+    def __len__(self) -> int:
+        with self.__LOCK:
+            return len(self.__records)
+
+    def __compact(self) -> None:
+        # the log is rewritten to the latest record of every entity, the file
+        # is readable by its owner only
+        if self.__registry_file:
+            self.__registry_file.close()
+
+        tmp_file_path = self.__REGISTRY_FILE_PATH.with_suffix(".tmp")
+        tmp_fd = os.open(
+            tmp_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with open(tmp_fd, "w") as tmp_file:
+            for record in self.__records.values():
+                tmp_file.write(json.dumps(record.to_stored_dict()) + "\n")
+        os.replace(tmp_file_path, self.__REGISTRY_FILE_PATH)
+
+        self.__registry_file = open(
+            os.open(
+                self.__REGISTRY_FILE_PATH,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o600,
+            ),
+            "a",
+        )
+        self.__stored_record_count = len(self.__records)
+
+    def __index(self, record: EntityRecord) -> None:
+        previous_record = self.__records.get(record.id_hash)
+        if previous_record:
+            self.__id_hashes_by_entity_type.get(
+                previous_record.entity_type, set()
+            ).discard(record.id_hash)
+            for processor in previous_record.processors:
+                self.__id_hashes_by_processor.get(processor, set()).discard(
+                    record.id_hash
+                )
+
+        self.__records[record.id_hash] = record
+        self.__hash_tree.set(record.id_hash, record.content_digest)
+        if record.failed_processors:
+            self.__failed_id_hashes.add(record.id_hash)
+        else:
+            self.__failed_id_hashes.discard(record.id_hash)
+        self.__id_hashes_by_entity_type.setdefault(
+            record.entity_type, set()
+        ).add(record.id_hash)
+        for processor in record.processors:
+            self.__id_hashes_by_processor.setdefault(processor, set()).add(
+                record.id_hash
+            )
+        self.__generation += 1
@@ -0,0 +1,69 @@
+from typing import Any, Dict
+
+
+def raise_immutable(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is immutable")
+
+
+class FrozenDict(dict):
+    # a dict subclass so that the config serializers accept it as it is
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __ior__ = raise_immutable
+    clear = pop = popitem = setdefault = update = raise_immutable
+
+    def __copy__(self) -> "FrozenDict":
+        return self
+
+    def __deepcopy__(self, memo) -> "FrozenDict":
+        return self
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    __slots__ = ()
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = raise_immutable
+    append = extend = insert = pop = remove = raise_immutable
+    clear = sort = reverse = raise_immutable
+
+    def __copy__(self) -> "FrozenList":
+        return self
+
+    def __deepcopy__(self, memo) -> "FrozenList":
+        return self
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(config: Any) -> Any:
+    if isinstance(config, (FrozenDict, FrozenList)):
+        return config
+    if isinstance(config, dict):
+        return FrozenDict(
+            (key, freeze(value)) for key, value in config.items()
+        )
+    if isinstance(config, (list, tuple)):
+        return FrozenList(freeze(item) for item in config)
+    return config
+
+
+def apply_overlay(base: FrozenDict, overlay: Dict[str, Any]) -> FrozenDict:
+    # only the mappings on the paths of the overlay are copied, all other
+    # values are shared with the base - nested plain dicts of the overlay are
+    # merged into the base, any other value (including a frozen mapping)
+    # replaces the base value
+    merged = dict(base)
+    for key, value in overlay.items():
+        if (
+            isinstance(value, dict)
+            and not isinstance(value, FrozenDict)
+            and isinstance(merged.get(key), dict)
+        ):
+            merged[key] = apply_overlay(merged[key], value)
+        else:
+            merged[key] = freeze(value)
+    return FrozenDict(merged)
@@ -0,0 +1,343 @@
+import json
+import os
+import struct
+import threading
+from collections import ChainMap
+from hashlib import sha256
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Tuple
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+
+from utils.metadata_fetcher import MetadataDocument
+
+SAML_METADATA_NAMESPACE = "urn:oasis:names:tc:SAML:2.0:metadata"
+PARSE_CHUNK_SIZE = 256 * 1024
+TAG_SCAN_CHUNK_SIZE = 4096
+
+INDEX_MAGIC = b"TIMDIDX1"
+INDEX_HEADER_SIZE = struct.Struct(">I")
+# index records are fixed-size and sorted by the digest of the entityID, so
+# that a lookup is a binary search over seeks: sha256 digest of the entityID,
+# byte offset and length of the EntityDescriptor in the aggregate and the
+# namespace declarations in scope of it
+INDEX_RECORD = struct.Struct(">32sQQI")
+
+
+class MetadataAggregateError(Exception):
+    pass
+
+
+class EntityLocation:
+    __slots__ = ("offset", "length", "namespace_declarations")
+
+    def __init__(
+        self,
+        offset: int,
+        length: int,
+        namespace_declarations: Dict[str, str],
+    ):
+        self.offset = offset
+        self.length = length
+        # declarations of the ancestors the EntityDescriptor relies on
+        self.namespace_declarations = namespace_declarations
+
+
+def get_entity_id_digest(entity_id: str) -> bytes:
+    return sha256(entity_id.encode()).digest()
+
+
+def scan_tag_end(source: IO[bytes], offset: int) -> Tuple[int, bool]:
+    # offset after the tag starting at the offset and whether it is an
+    # empty-element tag - ">" in quoted attribute values does not end it
+    source.seek(offset)
+    quote = None
+    position = offset
+    previous_byte = None
+    while True:
+        chunk = source.read(TAG_SCAN_CHUNK_SIZE)
+        if not chunk:
+            raise MetadataAggregateError(f"Unterminated tag at {offset}.")
+        for byte in chunk:
+            position += 1
+            if quote:
+                if byte == quote:
+                    quote = None
+            elif byte in b"\"'":
+                quote = byte
+            elif byte == ord(">"):
+                return position, previous_byte == ord("/")
+            previous_byte = byte
+
+
+class EntityDescriptorScanner:
+    # streams the aggregate through expat and records where every
+    # EntityDescriptor starts and ends, the memory used does not depend on
+    # the size of the aggregate but on the number of entities
+    def __init__(self, source: IO[bytes]):
+        self.__SOURCE = source
+        self.__PARSER = expat.ParserCreate()
+        self.__PARSER.buffer_text = True
+        self.__PARSER.StartElementHandler = self.__start_element
+        self.__PARSER.EndElementHandler = self.__end_element
+
+        self.__namespaces = ChainMap()
+        self.__declaring_elements: List[bool] = []
+        self.__entity_depth = None
+        self.__entity_start = None
+        self.__entity_id = None
+        self.__entity_namespace_declarations = None
+        self.entities: List[Tuple[str, EntityLocation]] = []
+
+    def scan(self) -> List[Tuple[str, EntityLocation]]:
+        self.__SOURCE.seek(0)
+        # the scanner seeks in the source, the parser reads its own stream
+        parse_offset = 0
+        while True:
+            self.__SOURCE.seek(parse_offset)
+            chunk = self.__SOURCE.read(PARSE_CHUNK_SIZE)
+            parse_offset += len(chunk)
+            try:
+                self.__PARSER.Parse(chunk, not chunk)
+            except expat.ExpatError as err:
+                raise MetadataAggregateError(
+                    f"Invalid metadata aggregate: {err}"
+                ) from err
+            if not chunk:
+                return self.entities
+
+    def __is_entity_descriptor(self, name: str) -> bool:
+        prefix, _, local_name = name.rpartition(":")
+        return (
+            local_name == "EntityDescriptor"
+            and self.__namespaces.get(prefix) == SAML_METADATA_NAMESPACE
+        )
+
+    def __start_element(self, name: str, attributes: Dict[str, str]) -> None:
+        declarations = {
+            attribute_name.partition(":")[2]: value
+            for attribute_name, value in attributes.items()
+            if attribute_name == "xmlns" or attribute_name.startswith("xmlns:")
+        }
+        # the ancestors' declarations, taken before the element's own
+        ancestor_namespaces = self.__namespaces
+        if declarations:
+            self.__namespaces = self.__namespaces.new_child(declarations)
+        self.__declaring_elements.append(bool(declarations))
+
+        if self.__entity_depth is not None:
+            return
+        if not self.__is_entity_descriptor(name):
+            return
+
+        start = self.__PARSER.CurrentByteIndex
+        self.__entity_depth = len(self.__declaring_elements)
+        self.__entity_start = start
+        self.__entity_id = attributes.get("entityID", "")
+        self.__entity_namespace_declarations = {
+            prefix: uri
+            for prefix, uri in ancestor_namespaces.items()
+            if prefix not in declarations
+        }
+
+    def __end_element(self, name: str) -> None:
+        if self.__entity_depth == len(self.__declaring_elements):
+            # expat reports the end of an empty-element tag after the tag
+            # and the end of other elements at the start of the end tag
+            tag_end, is_empty = scan_tag_end(
+                self.__SOURCE, self.__entity_start
+            )
+            if not is_empty:
+                tag_end, _ = scan_tag_end(
+                    self.__SOURCE, self.__PARSER.CurrentByteIndex
+                )
+            self.entities.append(
+                (
+                    self.__entity_id,
+                    EntityLocation(
+                        self.__entity_start,
+                        tag_end - self.__entity_start,
+                        self.__entity_namespace_declarations,
+                    ),
+                )
+            )
+            self.__entity_depth = None
+
+        if self.__declaring_elements.pop():
+            self.__namespaces = self.__namespaces.parents
+
+
+def build_aggregate_index(source: IO[bytes], index_path: Path) -> int:
+    entities = EntityDescriptorScanner(source).scan()
+
+    # the namespace declarations are mostly the same for all entities, each
+    # distinct set is stored once in the header
+    namespace_contexts: Dict[tuple, int] = {}
+    records = []
+    for entity_id, entity_location in entities:
+        namespace_context = tuple(
+            sorted(entity_location.namespace_declarations.items())
+        )
+        context_index = namespace_contexts.setdefault(
+            namespace_context, len(namespace_contexts)
+        )
+        records.append(
+            INDEX_RECORD.pack(
+                get_entity_id_digest(entity_id),
+                entity_location.offset,
+                entity_location.length,
+                context_index,
+            )
+        )
+    records.sort()
+
+    source_stat = os.fstat(source.fileno())
+    header = json.dumps(
+        {
+            "source_size": source_stat.st_size,
+            "source_mtime_ns": source_stat.st_mtime_ns,
+            "namespace_contexts": [
+                dict(namespace_context)
+                for namespace_context in namespace_contexts
+            ],
+        }
+    ).encode()
+
+    tmp_index_path = index_path.with_suffix(f".{threading.get_ident()}.tmp")
+    with open(tmp_index_path, "wb") as index_file:
+        index_file.write(INDEX_MAGIC)
+        index_file.write(INDEX_HEADER_SIZE.pack(len(header)))
+        index_file.write(header)
+        index_file.write(b"".join(records))
+    os.replace(tmp_index_path, index_path)
+    return len(records)
+
+
+class MetadataAggregateIndex:
+    def __init__(self, index_path: Path):
+        self.__INDEX_PATH = index_path
+
+    def read_header(self, index_file: IO[bytes]) -> Tuple[dict, int]:
+        index_file.seek(0)
+        if index_file.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise MetadataAggregateError(
+                f"'{self.__INDEX_PATH}' is not a metadata aggregate index."
+            )
+        (header_size,) = INDEX_HEADER_SIZE.unpack(
+            index_file.read(INDEX_HEADER_SIZE.size)
+        )
+        header = json.loads(index_file.read(header_size))
+        return header, index_file.tell()
+
+    def is_current(self, source_stat: os.stat_result) -> bool:
+        # the index belongs to the source it was built from
+        try:
+            with open(self.__INDEX_PATH, "rb") as index_file:
+                header, _ = self.read_header(index_file)
+        except (OSError, ValueError, MetadataAggregateError):
+            return False
+        return (
+            header.get("source_size") == source_stat.st_size
+            and header.get("source_mtime_ns") == source_stat.st_mtime_ns
+        )
+
+    def find(self, entity_id: str) -> Optional[EntityLocation]:
+        digest = get_entity_id_digest(entity_id)
+        with open(self.__INDEX_PATH, "rb") as index_file:
+            header, records_offset = self.read_header(index_file)
+            records_size = index_file.seek(0, os.SEEK_END) - records_offset
+
+            low, high = 0, records_size // INDEX_RECORD.size
+            while low < high:
+                middle = (low + high) // 2
+                index_file.seek(records_offset + middle * INDEX_RECORD.size)
+                record_digest, offset, length, context_index = (
+                    INDEX_RECORD.unpack(index_file.read(INDEX_RECORD.size))
+                )
+                if record_digest < digest:
+                    low = middle + 1
+                elif record_digest > digest:
+                    high = middle
+                else:
+                    return EntityLocation(
+                        offset,
+                        length,
+                        header["namespace_contexts"][context_index],
+                    )
+        return None
+
+
+def wrap_entity_descriptor(
+    entity_descriptor: bytes, namespace_declarations: Dict[str, str]
+) -> bytes:
+    # the extracted element is made a standalone document by declaring the
+    # namespaces of its ancestors on it
+    if not namespace_declarations:
+        return entity_descriptor
+
+    name_end = 1
+    while entity_descriptor[name_end:name_end + 1] not in b" \t\r\n/>":
+        name_end += 1
+    declarations = "".join(
+        f" xmlns:{prefix}={quoteattr(uri)}" if prefix else
+        f" xmlns={quoteattr(uri)}"
+        for prefix, uri in sorted(namespace_declarations.items())
+    ).encode()
+    return (
+        entity_descriptor[:name_end]
+        + declarations
+        + entity_descriptor[name_end:]
+    )
+
+
+def read_entity_descriptor(
+    source: IO[bytes], entity_location: EntityLocation
+) -> bytes:
+    source.seek(entity_location.offset)
+    return wrap_entity_descriptor(
+        source.read(entity_location.length),
+        entity_location.namespace_declarations,
+    )
+
+
+# an index is built by one thread at a time, other lookups of the same
+# aggregate wait for it
+index_build_locks: Dict[Path, threading.Lock] = {}
+index_build_locks_lock = threading.Lock()
+
+
+def get_index_path(source_path: Path) -> Path:
+    return source_path.with_suffix(source_path.suffix + ".index")
+
+
+def get_entity_descriptor(
+    document: MetadataDocument, entity_id: str
+) -> Optional[bytes]:
+    # the EntityDescriptor of the entity in a fetched metadata document,
+    # a single entity or an aggregate of any size
+    if not document.content_path:
+        # documents that must not be stored are scanned in memory
+        source = document.open()
+        for scanned_entity_id, entity_location in EntityDescriptorScanner(
+            source
+        ).scan():
+            if scanned_entity_id == entity_id:
+                return read_entity_descriptor(source, entity_location)
+        return None
+
+    # the source stays open, so the index is checked against the same file
+    # the entity is read from even if the fetcher replaces it meanwhile
+    index_path = get_index_path(document.content_path)
+    aggregate_index = MetadataAggregateIndex(index_path)
+    with index_build_locks_lock:
+        index_build_lock = index_build_locks.setdefault(
+            index_path, threading.Lock()
+        )
+    with open(document.content_path, "rb") as source:
+        with index_build_lock:
+            if not aggregate_index.is_current(os.fstat(source.fileno())):
+                build_aggregate_index(source, index_path)
+            entity_location = aggregate_index.find(entity_id)
+        if not entity_location:
+            return None
+        return read_entity_descriptor(source, entity_location)
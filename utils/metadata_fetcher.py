@@ -0,0 +1,480 @@
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+from hashlib import sha256
+from pathlib import Path
+from typing import IO, Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 300
+DEFAULT_REQUEST_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_MEMORY_DOCUMENTS = 256
+# larger documents (e.g. metadata aggregates) are read from the disk cache
+DEFAULT_MAX_MEMORY_DOCUMENT_SIZE = 1024 * 1024
+DEFAULT_MAX_DOCUMENT_SIZE = 1024 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+METADATA_FETCHES = metrics.counter(
+    "metadata_fetches_total",
+    "Metadata documents requested from the fetcher by how they were served - "
+    "cached, revalidated (304), downloaded, stale (after an error) or failed",
+    ("status",),
+)
+
+
+class MetadataFetchError(Exception):
+    pass
+
+
+def parse_cache_control(cache_control: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for directive in cache_control.split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name.strip().lower()] = value.strip().strip('"') or None
+    return directives
+
+
+def get_freshness_lifetime(
+    headers: Dict[str, str], default_max_age: float
+) -> Optional[float]:
+    # seconds the response may be served without revalidation, None if it
+    # must not be stored at all
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+
+    lifetime = default_max_age
+    try:
+        if "max-age" in directives:
+            lifetime = float(directives["max-age"])
+        elif headers.get("Expires"):
+            expires = parsedate_to_datetime(headers["Expires"]).timestamp()
+            date = (
+                parsedate_to_datetime(headers["Date"]).timestamp()
+                if headers.get("Date")
+                else time.time()
+            )
+            lifetime = expires - date
+    except (TypeError, ValueError):
+        # an invalid Expires means already expired
+        lifetime = 0.0
+
+    try:
+        age = float(headers.get("Age", 0))
+    except ValueError:
+        age = 0.0
+    return max(0.0, lifetime - age)
+
+
+class MetadataDocument:
+    __slots__ = (
+        "url",
+        "etag",
+        "last_modified",
+        "fetched_at",
+        "expires_at",
+        "size",
+        "content",
+        "content_path",
+    )
+
+    def __init__(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        fetched_at: float,
+        expires_at: float,
+        size: int,
+        content: Optional[bytes] = None,
+        content_path: Optional[Path] = None,
+    ):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+        self.size = size
+        # the content is kept in memory, read from the disk cache or both
+        self.content = content
+        self.content_path = content_path
+
+    def is_fresh(self, now: float = None) -> bool:
+        return (time.time() if now is None else now) < self.expires_at
+
+    def open(self) -> IO[bytes]:
+        if self.content_path:
+            return open(self.content_path, "rb")
+        return io.BytesIO(self.content)
+
+    def read(self) -> bytes:
+        if self.content is not None:
+            return self.content
+        with self.open() as content_file:
+            return content_file.read()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "fetched_at": self.fetched_at,
+            "expires_at": self.expires_at,
+            "size": self.size,
+        }
+
+
+class MetadataFetcher:
+    def __init__(self, metadata_fetcher_cfg):
+        self.__CACHE_FOLDER_PATH = Path(
+            metadata_fetcher_cfg.get(
+                "cache_folder_path", "/tmp/ti_wizard_metadata_cache"
+            )
+        )
+        self.__DEFAULT_MAX_AGE = metadata_fetcher_cfg.get(
+            "default_max_age", DEFAULT_MAX_AGE
+        )
+        self.__REQUEST_TIMEOUT = metadata_fetcher_cfg.get(
+            "request_timeout", DEFAULT_REQUEST_TIMEOUT
+        )
+        self.__MAX_MEMORY_DOCUMENTS = metadata_fetcher_cfg.get(
+            "max_memory_documents", DEFAULT_MAX_MEMORY_DOCUMENTS
+        )
+        self.__MAX_MEMORY_DOCUMENT_SIZE = metadata_fetcher_cfg.get(
+            "max_memory_document_size", DEFAULT_MAX_MEMORY_DOCUMENT_SIZE
+        )
+        self.__MAX_DOCUMENT_SIZE = metadata_fetcher_cfg.get(
+            "max_document_size", DEFAULT_MAX_DOCUMENT_SIZE
+        )
+        # documents in memory are revalidated before they expire if set
+        self.__REFRESH_INTERVAL = metadata_fetcher_cfg.get("refresh_interval")
+
+        # connections to the metadata hosts are kept open and reused
+        pool_size = metadata_fetcher_cfg.get("pool_size", DEFAULT_POOL_SIZE)
+        self.__SESSION = requests.Session()
+        for scheme in ("http://", "https://"):
+            self.__SESSION.mount(
+                scheme,
+                HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size
+                ),
+            )
+
+        self.__LOCK = threading.Lock()
+        self.__documents: OrderedDict[str, MetadataDocument] = OrderedDict()
+        # fetches in progress, concurrent requests of a url wait for them
+        self.__fetches: Dict[str, Future] = {}
+        self.__STOPPED = threading.Event()
+        self.__refresh_thread = None
+
+    def get_cache_file_path(self, url: str, suffix: str) -> Path:
+        return self.__CACHE_FOLDER_PATH / (
+            sha256(url.encode()).hexdigest() + suffix
+        )
+
+    def fetch(self, url: str, force: bool = False) -> MetadataDocument:
+        # a fresh cached document is returned without a request, otherwise
+        # the cached document is revalidated or the document is downloaded
+        with self.__LOCK:
+            document = self.__documents.get(url)
+            if document:
+                self.__documents.move_to_end(url)
+            if document and not force and document.is_fresh():
+                METADATA_FETCHES.inc(status="cached")
+                return document
+
+            fetch_future = self.__fetches.get(url)
+            is_fetching = fetch_future is None
+            if is_fetching:
+                fetch_future = Future()
+                self.__fetches[url] = fetch_future
+
+        if not is_fetching:
+            return fetch_future.result()
+
+        if self.__REFRESH_INTERVAL and not self.__refresh_thread:
+            self.__start_refreshing()
+
+        try:
+            document = self.__revalidate(url, document, force)
+        except Exception as err:
+            fetch_future.set_exception(err)
+            raise
+        else:
+            fetch_future.set_result(document)
+        finally:
+            with self.__LOCK:
+                del self.__fetches[url]
+        return document
+
+    def stop(self) -> None:
+        self.__STOPPED.set()
+        if self.__refresh_thread:
+            self.__refresh_thread.join()
+        self.__SESSION.close()
+
+    def __revalidate(
+        self, url: str, document: Optional[MetadataDocument], force: bool
+    ) -> MetadataDocument:
+        if not document:
+            document = self.__load_cached_document(url)
+            if document and not force and document.is_fresh():
+                self.__remember_document(document)
+                METADATA_FETCHES.inc(status="cached")
+                return document
+
+        request_headers = {}
+        if document and document.etag:
+            request_headers["If-None-Match"] = document.etag
+        if document and document.last_modified:
+            request_headers["If-Modified-Since"] = document.last_modified
+
+        try:
+            with self.__SESSION.get(
+                url,
+                headers=request_headers,
+                timeout=self.__REQUEST_TIMEOUT,
+                stream=True,
+            ) as response:
+                if response.status_code == 304 and document:
+                    document = self.__get_revalidated_document(
+                        document, response
+                    )
+                    METADATA_FETCHES.inc(status="revalidated")
+                elif response.status_code == 200:
+                    document = self.__download_document(url, response)
+                    METADATA_FETCHES.inc(status="downloaded")
+                else:
+                    raise MetadataFetchError(
+                        f"Fetching '{url}' failed with HTTP status "
+                        f"{response.status_code}."
+                    )
+        except (requests.RequestException, MetadataFetchError, OSError) as err:
+            # an outage of the metadata host does not stop the updates that
+            # already have a copy of its document
+            if document:
+                METADATA_FETCHES.inc(status="stale")
+                logger.warning(
+                    f"Serving a stale copy of '{url}', fetching it failed: "
+                    f"{err}"
+                )
+                return document
+            METADATA_FETCHES.inc(status="failed")
+            if isinstance(err, MetadataFetchError):
+                raise
+            raise MetadataFetchError(
+                f"Fetching '{url}' failed: {err}"
+            ) from err
+
+        return document
+
+    def __get_revalidated_document(
+        self, document: MetadataDocument, response: requests.Response
+    ) -> MetadataDocument:
+        # the cached content is still valid, only its freshness is updated
+        now = time.time()
+        lifetime = get_freshness_lifetime(
+            response.headers, self.__DEFAULT_MAX_AGE
+        )
+        revalidated_document = MetadataDocument(
+            document.url,
+            response.headers.get("ETag", document.etag),
+            response.headers.get("Last-Modified", document.last_modified),
+            now,
+            now + (lifetime or 0.0),
+            document.size,
+            document.content,
+            document.content_path,
+        )
+        if revalidated_document.content is None and (
+            revalidated_document.size <= self.__MAX_MEMORY_DOCUMENT_SIZE
+        ):
+            revalidated_document.content = revalidated_document.read()
+        if lifetime is not None and revalidated_document.content_path:
+            self.__write_cache_file(
+                self.get_cache_file_path(document.url, ".json"),
+                json.dumps(revalidated_document.to_dict()).encode(),
+            )
+        self.__remember_document(
+            revalidated_document, is_stored=lifetime is not None
+        )
+        return revalidated_document
+
+    def __download_document(
+        self, url: str, response: requests.Response
+    ) -> MetadataDocument:
+        now = time.time()
+        lifetime = get_freshness_lifetime(
+            response.headers, self.__DEFAULT_MAX_AGE
+        )
+
+        # the body is streamed to the disk, only small documents are also
+        # kept in memory
+        self.__CACHE_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        content_path = self.get_cache_file_path(url, ".body")
+        tmp_content_path = content_path.with_suffix(
+            f".{threading.get_ident()}.tmp"
+        )
+        content_chunks = []
+        size = 0
+        try:
+            with open(tmp_content_path, "wb") as tmp_content_file:
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.__MAX_DOCUMENT_SIZE:
+                        raise MetadataFetchError(
+                            f"Document '{url}' exceeds the maximum size of "
+                            f"{self.__MAX_DOCUMENT_SIZE} bytes."
+                        )
+                    tmp_content_file.write(chunk)
+                    if size <= self.__MAX_MEMORY_DOCUMENT_SIZE:
+                        content_chunks.append(chunk)
+            content = (
+                b"".join(content_chunks)
+                if size <= self.__MAX_MEMORY_DOCUMENT_SIZE
+                else None
+            )
+
+            document = MetadataDocument(
+                url,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                now,
+                now + (lifetime or 0.0),
+                size,
+                content,
+            )
+            # the description of the cached content is removed first, so
+            # that an interrupted download never describes another content
+            self.get_cache_file_path(url, ".json").unlink(missing_ok=True)
+            if lifetime is None:
+                # the document must not be stored, it is only returned
+                if content is None:
+                    with open(tmp_content_path, "rb") as tmp_content_file:
+                        document.content = tmp_content_file.read()
+                content_path.unlink(missing_ok=True)
+                self.__remember_document(document, is_stored=False)
+                return document
+
+            os.replace(tmp_content_path, content_path)
+            document.content_path = content_path
+        finally:
+            if tmp_content_path.exists():
+                tmp_content_path.unlink()
+
+        self.__write_cache_file(
+            self.get_cache_file_path(url, ".json"),
+            json.dumps(document.to_dict()).encode(),
+        )
+        self.__remember_document(document)
+        return document
+
+    def __remember_document(
+        self, document: MetadataDocument, is_stored: bool = True
+    ) -> None:
+        with self.__LOCK:
+            if not is_stored:
+                self.__documents.pop(document.url, None)
+                return
+            self.__documents[document.url] = document
+            self.__documents.move_to_end(document.url)
+            while len(self.__documents) > self.__MAX_MEMORY_DOCUMENTS:
+                self.__documents.popitem(last=False)
+
+    def __load_cached_document(self, url: str) -> Optional[MetadataDocument]:
+        # documents cached on the disk survive restarts of the connector
+        try:
+            with open(self.get_cache_file_path(url, ".json"), "rb") as f:
+                cached_document = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        content_path = self.get_cache_file_path(url, ".body")
+        if (
+            cached_document.get("url") != url
+            or not content_path.is_file()
+            or content_path.stat().st_size != cached_document.get("size")
+        ):
+            return None
+        return MetadataDocument(
+            url,
+            cached_document.get("etag"),
+            cached_document.get("last_modified"),
+            cached_document.get("fetched_at", 0.0),
+            cached_document.get("expires_at", 0.0),
+            cached_document["size"],
+            content_path=content_path,
+        )
+
+    def __write_cache_file(self, file_path: Path, content: bytes) -> None:
+        tmp_file_path = file_path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_file_path, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_file_path, file_path)
+
+    def __start_refreshing(self) -> None:
+        with self.__LOCK:
+            if self.__refresh_thread:
+                return
+            self.__refresh_thread = threading.Thread(
+                target=self.__refresh, name="metadata-refresh", daemon=True
+            )
+            self.__refresh_thread.start()
+
+    def __refresh(self) -> None:
+        # documents that would expire before the next round are revalidated
+        # ahead of time, so updates rarely wait for a metadata host
+        while not self.__STOPPED.wait(self.__REFRESH_INTERVAL):
+            refresh_until = time.time() + self.__REFRESH_INTERVAL
+            with self.__LOCK:
+                expiring_urls = [
+                    url
+                    for url, document in self.__documents.items()
+                    if document.expires_at <= refresh_until
+                ]
+            for url in expiring_urls:
+                try:
+                    self.fetch(url, force=True)
+                except MetadataFetchError as err:
+                    logger.warning(f"Refreshing '{url}' failed: {err}")
+
+
+class MetadataFetcherRegistry:
+    def __init__(self):
+        self.__LOCK = threading.Lock()
+        self.__fetchers: Dict[str, MetadataFetcher] = {}
+
+    def get_fetcher(self, metadata_fetcher_cfg) -> MetadataFetcher:
+        # processors sharing a cache folder share the fetcher, its cache and
+        # its connections
+        cache_folder_path = os.path.abspath(
+            metadata_fetcher_cfg.get(
+                "cache_folder_path", "/tmp/ti_wizard_metadata_cache"
+            )
+        )
+        with self.__LOCK:
+            if cache_folder_path not in self.__fetchers:
+                self.__fetchers[cache_folder_path] = MetadataFetcher(
+                    metadata_fetcher_cfg
+                )
+            return self.__fetchers[cache_folder_path]
+
+
+# process-wide fetchers shared by all config processors
+metadata_fetchers = MetadataFetcherRegistry()
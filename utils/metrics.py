@@ -0,0 +1,272 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+# upper bounds (seconds) of the latency buckets, the stages of an update
+# take from microseconds (validation) to seconds (git push)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    return repr(float(value))
+
+
+def format_labels(label_names: Tuple[str, ...], label_values: tuple) -> str:
+    if not label_names:
+        return ""
+    escaped_values = (
+        str(label_value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        for label_value in label_values
+    )
+    return (
+        "{"
+        + ",".join(
+            f'{label_name}="{label_value}"'
+            for label_name, label_value in zip(label_names, escaped_values)
+        )
+        + "}"
+    )
+
+
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.__LOCK = threading.Lock()
+        self.__values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            self.__values[label_values] = (
+                self.__values.get(label_values, 0) + amount
+            )
+
+    def get(self, **labels) -> float:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            return self.__values.get(label_values, 0)
+
+    def get_values(self) -> Dict[Tuple[str, ...], float]:
+        with self.__LOCK:
+            return dict(self.__values)
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        return [
+            (self.name, format_labels(self.label_names, label_values), value)
+            for label_values, value in sorted(self.get_values().items())
+        ]
+
+
+class Gauge:
+    type_name = "gauge"
+
+    def __init__(self, name: str, description: str, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.__LOCK = threading.Lock()
+        self.__values: Dict[Tuple[str, ...], float] = {}
+        # values computed when the metrics are read, e.g. a queue length
+        self.__functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            self.__values[label_values] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            self.__values[label_values] = (
+                self.__values.get(label_values, 0) + amount
+            )
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            self.__functions[label_values] = function
+
+    def get(self, **labels) -> float:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            function = self.__functions.get(label_values)
+            if not function:
+                return self.__values.get(label_values, 0)
+        return function()
+
+    def get_values(self) -> Dict[Tuple[str, ...], float]:
+        with self.__LOCK:
+            values = dict(self.__values)
+            functions = dict(self.__functions)
+        for label_values, function in functions.items():
+            values[label_values] = function()
+        return values
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        return [
+            (self.name, format_labels(self.label_names, label_values), value)
+            for label_values, value in sorted(self.get_values().items())
+        ]
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.__LOCK = threading.Lock()
+        # per label values: [observations in every bucket (not cumulative,
+        # the last bucket is +Inf), sum of the observed values]
+        self.__values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        bucket_index = bisect_left(self.buckets, value)
+        with self.__LOCK:
+            if label_values not in self.__values:
+                self.__values[label_values] = [
+                    [0] * (len(self.buckets) + 1),
+                    0.0,
+                ]
+            histogram_values = self.__values[label_values]
+            histogram_values[0][bucket_index] += 1
+            histogram_values[1] += value
+
+    def time(self, **labels) -> "HistogramTimer":
+        return HistogramTimer(self, labels)
+
+    def get_count(self, **labels) -> int:
+        label_values = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self.__LOCK:
+            if label_values not in self.__values:
+                return 0
+            return sum(self.__values[label_values][0])
+
+    def get_values(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        with self.__LOCK:
+            return {
+                label_values: (list(bucket_counts), value_sum)
+                for label_values, (bucket_counts, value_sum) in (
+                    self.__values.items()
+                )
+            }
+
+    def get_samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        for label_values, (bucket_counts, value_sum) in sorted(
+            self.get_values().items()
+        ):
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(
+                self.buckets + (float("inf"),), bucket_counts
+            ):
+                cumulative_count += bucket_count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        format_labels(
+                            self.label_names + ("le",),
+                            label_values + (format_value(upper_bound),),
+                        ),
+                        cumulative_count,
+                    )
+                )
+            labels = format_labels(self.label_names, label_values)
+            samples.append((f"{self.name}_sum", labels, value_sum))
+            samples.append((f"{self.name}_count", labels, cumulative_count))
+        return samples
+
+
+class HistogramTimer:
+    # a plain class is cheaper than a generator based context manager
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> None:
+        self.start = perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.histogram.observe(perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.__LOCK = threading.Lock()
+        self.__metrics = {}
+
+    def counter(self, name: str, description: str, label_names=()) -> Counter:
+        with self.__LOCK:
+            if name not in self.__metrics:
+                self.__metrics[name] = Counter(name, description, label_names)
+            return self.__metrics[name]
+
+    def gauge(self, name: str, description: str, label_names=()) -> Gauge:
+        with self.__LOCK:
+            if name not in self.__metrics:
+                self.__metrics[name] = Gauge(name, description, label_names)
+            return self.__metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names=(),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        with self.__LOCK:
+            if name not in self.__metrics:
+                self.__metrics[name] = Histogram(
+                    name, description, label_names, buckets
+                )
+            return self.__metrics[name]
+
+    def get_metrics(self) -> list:
+        with self.__LOCK:
+            return list(self.__metrics.values())
+
+    def render_prometheus(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in sorted(self.get_metrics(), key=lambda m: m.name):
+            description = metric.description.replace("\\", "\\\\").replace(
+                "\n", "\\n"
+            )
+            lines.append(f"# HELP {metric.name} {description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for sample_name, labels, value in metric.get_samples():
+                lines.append(f"{sample_name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# process-wide registry shared by all components
+metrics = MetricsRegistry()
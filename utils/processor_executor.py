@@ -0,0 +1,285 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Tuple
+
+from config_processors.config_processor import ConfigProcessor
+from entities.remote_entity import RemoteEntity
+from enums.processor_update_status import ProcessorUpdateStatus
+from utils.metrics import metrics
+from utils.request_profiler import RequestProfile, get_current_request_profile
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESSOR_TIMEOUT = 60
+# details of processor errors are only logged, not sent to the caller
+PROCESSOR_FAILED_MESSAGE = "Processor failed to update its configuration."
+
+PROCESSOR_UPDATES = metrics.counter(
+    "processor_updates_total",
+    "Entity updates handled by config processors by their outcome",
+    ("processor", "status"),
+)
+
+
+class ProcessorResult:
+    __slots__ = ("processor_name", "status", "message", "duration")
+
+    def __init__(
+        self,
+        processor_name: str,
+        status: ProcessorUpdateStatus,
+        duration: float,
+        message: str = None,
+    ):
+        self.processor_name = processor_name
+        self.status = status
+        self.duration = duration
+        self.message = message
+
+    def to_dict(self) -> Dict[str, Any]:
+        result_dict = {
+            "processor": self.processor_name,
+            "status": self.status.value,
+            "duration": round(self.duration, 3),
+        }
+        if self.message:
+            result_dict["message"] = self.message
+        return result_dict
+
+
+class UpdateResult:
+    __slots__ = ("entity", "processor_results")
+
+    def __init__(
+        self, entity: RemoteEntity, processor_results: List[ProcessorResult]
+    ):
+        self.entity = entity
+        self.processor_results = processor_results
+
+    @property
+    def is_successful(self) -> bool:
+        return all(
+            processor_result.status == ProcessorUpdateStatus.UPDATED
+            for processor_result in self.processor_results
+        )
+
+    @property
+    def failed_processor_names(self) -> List[str]:
+        return [
+            processor_result.processor_name
+            for processor_result in self.processor_results
+            if processor_result.status != ProcessorUpdateStatus.UPDATED
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id_hash": self.entity.id_hash,
+            "processors": [
+                processor_result.to_dict()
+                for processor_result in self.processor_results
+            ],
+        }
+
+
+class ProcessorExecutor:
+    def __init__(self, processor_executor_cfg):
+        self.__DEFAULT_TIMEOUT = processor_executor_cfg.get(
+            "processor_timeout", DEFAULT_PROCESSOR_TIMEOUT
+        )
+        self.__EXECUTOR = ThreadPoolExecutor(
+            max_workers=max(1, processor_executor_cfg.get("max_workers", 8)),
+            thread_name_prefix="config_processor",
+        )
+        # the last update of every (id_hash, processor name) - an update
+        # starts only after the previous one of the same processor and entity
+        # finished, even if that one timed out and still runs
+        self.__LOCK = threading.Lock()
+        self.__last_futures: Dict[Tuple[str, str], Future] = {}
+
+    def get_timeout(self, config_processor: ConfigProcessor) -> float:
+        if config_processor.timeout is None:
+            return self.__DEFAULT_TIMEOUT
+        return config_processor.timeout
+
+    def update_configurations(
+        self, entity: RemoteEntity, config_processors: List[ConfigProcessor]
+    ) -> UpdateResult:
+        # all processors begin the update before any of them can end it, so
+        # that shared repositories publish their changes of the update at once
+        for config_processor in config_processors:
+            config_processor.begin_update(entity)
+
+        # a profiled update is followed to the threads of its processors
+        request_profile = get_current_request_profile()
+        if request_profile:
+            request_profile.processors = [
+                config_processor.name for config_processor in config_processors
+            ]
+
+        started_at = time.monotonic()
+        futures = [
+            self.__submit(config_processor, entity, request_profile)
+            for config_processor in config_processors
+        ]
+
+        processor_results = [
+            self.__get_processor_result(config_processor, future, started_at)
+            for config_processor, future in zip(config_processors, futures)
+        ]
+
+        return UpdateResult(entity, processor_results)
+
+    def shutdown(self) -> None:
+        self.__EXECUTOR.shutdown(wait=True)
+
+    def __submit(
+        self,
+        config_processor: ConfigProcessor,
+        entity: RemoteEntity,
+        request_profile: RequestProfile = None,
+    ) -> Future:
+        key = (entity.id_hash, config_processor.name)
+        with self.__LOCK:
+            previous_future = self.__last_futures.get(key)
+            if previous_future and not previous_future.done():
+                future = Future()
+            else:
+                previous_future = None
+                future = self.__submit_now(
+                    config_processor, entity, request_profile
+                )
+            self.__last_futures[key] = future
+
+        if previous_future:
+            previous_future.add_done_callback(
+                lambda _: self.__submit_chained(
+                    future, config_processor, entity, request_profile
+                )
+            )
+        future.add_done_callback(
+            lambda done_future: self.__forget_future(key, done_future)
+        )
+        return future
+
+    def __submit_now(
+        self,
+        config_processor: ConfigProcessor,
+        entity: RemoteEntity,
+        request_profile: RequestProfile = None,
+    ) -> Future:
+        try:
+            return self.__EXECUTOR.submit(
+                self.__update_configuration,
+                config_processor,
+                entity,
+                request_profile,
+            )
+        except Exception as err:
+            # e.g. the executor was shut down, the update began already
+            config_processor.end_update(entity)
+            future = Future()
+            future.set_exception(err)
+            return future
+
+    def __submit_chained(
+        self,
+        future: Future,
+        config_processor: ConfigProcessor,
+        entity: RemoteEntity,
+        request_profile: RequestProfile = None,
+    ) -> None:
+        # runs once the previous update of the processor and entity is done
+        if not future.set_running_or_notify_cancel():
+            config_processor.end_update(entity)
+            return
+
+        def copy_outcome(submitted_future: Future) -> None:
+            if submitted_future.exception():
+                future.set_exception(submitted_future.exception())
+            else:
+                future.set_result(submitted_future.result())
+
+        self.__submit_now(
+            config_processor, entity, request_profile
+        ).add_done_callback(copy_outcome)
+
+    def __forget_future(
+        self, key: Tuple[str, str], done_future: Future
+    ) -> None:
+        with self.__LOCK:
+            if self.__last_futures.get(key) is done_future:
+                del self.__last_futures[key]
+
+    def __update_configuration(
+        self,
+        config_processor: ConfigProcessor,
+        entity: RemoteEntity,
+        request_profile: RequestProfile = None,
+    ) -> None:
+        if request_profile:
+            request_profile.add_thread()
+        try:
+            config_processor.update_configuration(entity)
+        finally:
+            config_processor.end_update(entity)
+            # a processor that timed out may be the last thread of the update
+            if request_profile and request_profile.remove_thread():
+                request_profile.complete()
+
+    def __get_processor_result(
+        self,
+        config_processor: ConfigProcessor,
+        future: Future,
+        started_at: float,
+    ) -> ProcessorResult:
+        # all processors run concurrently, so every timeout is measured from
+        # the moment the update was submitted
+        deadline = started_at + self.get_timeout(config_processor)
+        message = None
+        try:
+            future.result(timeout=max(0.0, deadline - time.monotonic()))
+            status = ProcessorUpdateStatus.UPDATED
+        except FutureTimeoutError:
+            # a running thread cannot be interrupted, the late outcome is
+            # only logged
+            status = ProcessorUpdateStatus.TIMED_OUT
+            message = "Processor did not finish in time."
+            future.add_done_callback(
+                lambda done_future: self.__log_late_result(
+                    config_processor, done_future
+                )
+            )
+        except Exception as err:
+            status = ProcessorUpdateStatus.FAILED
+            message = PROCESSOR_FAILED_MESSAGE
+            logger.error(
+                f"Processor '{config_processor.name}' failed to update its "
+                f"configuration",
+                exc_info=err,
+            )
+
+        PROCESSOR_UPDATES.inc(
+            processor=config_processor.name, status=status.value
+        )
+        return ProcessorResult(
+            config_processor.name,
+            status,
+            time.monotonic() - started_at,
+            message,
+        )
+
+    def __log_late_result(
+        self, config_processor: ConfigProcessor, future: Future
+    ) -> None:
+        if future.exception():
+            logger.error(
+                f"Timed out processor '{config_processor.name}' failed",
+                exc_info=future.exception(),
+            )
+        else:
+            logger.warning(
+                f"Timed out processor '{config_processor.name}' finished"
+            )
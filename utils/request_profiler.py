@@ -0,0 +1,340 @@
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from entities.remote_entity import RemoteEntity
+
+logger = logging.getLogger(__name__)
+
+# a profile of a single update is requested by this header signed with the
+# webhook secret over the request timestamp and PROFILE_SIGNED_VALUE
+PROFILE_SIGNATURE_HEADER = "Connector-Profile-Signature"
+PROFILE_SIGNED_VALUE = b"profile"
+DEFAULT_SAMPLING_INTERVAL = 0.005
+DEFAULT_MAX_PROFILE_COUNT = 50
+# deeper frames are cut off, the profiled code never recurses that deep
+MAX_STACK_DEPTH = 128
+
+# profile of the update handled by the current thread, if any
+current_profiles = threading.local()
+
+
+def get_current_request_profile() -> Optional["RequestProfile"]:
+    return getattr(current_profiles, "profile", None)
+
+
+def get_collapsed_stack(frame) -> str:
+    # "caller;callee" frames from the root, the input format of flame graph
+    # tools
+    frame_names = []
+    while frame and len(frame_names) < MAX_STACK_DEPTH:
+        # qualified names (Class.method) are available since Python 3.11
+        code = frame.f_code
+        frame_names.append(
+            f"{frame.f_globals.get('__name__', '?')}."
+            f"{getattr(code, 'co_qualname', code.co_name)}"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(frame_names))
+
+
+class RequestProfile:
+    def __init__(
+        self,
+        trigger: Optional[str],
+        on_complete: Callable[["RequestProfile"], None] = None,
+    ):
+        # "header" or "sampled" profiles are always written, profiles
+        # without a trigger only if the update turns out to be slow
+        self.trigger = trigger
+        # called by the thread that removes the last thread of the update
+        self.__ON_COMPLETE = on_complete
+        self.id_hash = None
+        self.entity_type = None
+        self.processors: List[str] = []
+        self.started_at = datetime.now(timezone.utc)
+        self.samples: Dict[str, int] = {}
+        self.__LOCK = threading.Lock()
+        self.__thread_counts: Dict[int, int] = {}
+        # time the threads of the update were running, the time the update
+        # waited in the queue does not count
+        self.__busy_seconds = 0.0
+        self.__busy_since = None
+        self.__is_handed_over = False
+
+    def set_entity(self, entity: RemoteEntity) -> None:
+        self.id_hash = entity.id_hash
+        self.entity_type = entity.entity_type
+
+    def add_thread(self, is_handed_over: bool = False) -> None:
+        thread_id = threading.get_ident()
+        with self.__LOCK:
+            if is_handed_over:
+                self.__is_handed_over = False
+            if not self.__thread_counts:
+                self.__busy_since = time.monotonic()
+            self.__thread_counts[thread_id] = (
+                self.__thread_counts.get(thread_id, 0) + 1
+            )
+
+    def hand_over(self) -> None:
+        # the profile continues in another thread that has not started yet
+        with self.__LOCK:
+            self.__is_handed_over = True
+
+    def take_back(self) -> None:
+        # the hand-over failed, the profile ends with the current threads
+        with self.__LOCK:
+            self.__is_handed_over = False
+
+    def complete(self) -> None:
+        if self.__ON_COMPLETE:
+            self.__ON_COMPLETE(self)
+
+    def remove_thread(self) -> bool:
+        # True once no thread works on the update anymore
+        thread_id = threading.get_ident()
+        with self.__LOCK:
+            self.__thread_counts[thread_id] -= 1
+            if not self.__thread_counts[thread_id]:
+                del self.__thread_counts[thread_id]
+            if not self.__thread_counts:
+                self.__busy_seconds += time.monotonic() - self.__busy_since
+                self.__busy_since = None
+            return not self.__thread_counts and not self.__is_handed_over
+
+    def get_thread_ids(self) -> List[int]:
+        with self.__LOCK:
+            return list(self.__thread_counts)
+
+    def get_busy_seconds(self) -> float:
+        with self.__LOCK:
+            if self.__busy_since is None:
+                return self.__busy_seconds
+            return self.__busy_seconds + time.monotonic() - self.__busy_since
+
+    def add_sample(self, collapsed_stack: str) -> None:
+        with self.__LOCK:
+            self.samples[collapsed_stack] = (
+                self.samples.get(collapsed_stack, 0) + 1
+            )
+
+    def get_samples(self) -> Dict[str, int]:
+        with self.__LOCK:
+            return dict(self.samples)
+
+    def to_dict(self, sampling_interval: float) -> Dict[str, Any]:
+        samples = self.get_samples()
+        return {
+            "id_hash": self.id_hash,
+            "entity_type": self.entity_type,
+            "processors": self.processors,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "busy_seconds": round(self.get_busy_seconds(), 6),
+            "sampling_interval": sampling_interval,
+            "sample_count": sum(samples.values()),
+            "stacks": dict(sorted(samples.items(), key=lambda s: -s[1])),
+        }
+
+
+class RequestProfiler:
+    def __init__(self, request_profiler_cfg):
+        # sampled and slow updates are profiled only if enabled, a signed
+        # header requests a profile regardless
+        self.__ENABLED = request_profiler_cfg.get("enabled", False)
+        self.__SAMPLE_RATE = request_profiler_cfg.get("sample_rate", 0.0)
+        self.__LATENCY_THRESHOLD = request_profiler_cfg.get(
+            "latency_threshold"
+        )
+        self.__SAMPLING_INTERVAL = request_profiler_cfg.get(
+            "sampling_interval", DEFAULT_SAMPLING_INTERVAL
+        )
+        self.__PROFILE_FOLDER_PATH = Path(
+            request_profiler_cfg.get(
+                "profile_folder_path", "/tmp/ti_wizard_profiles"
+            )
+        )
+        self.__MAX_PROFILE_COUNT = max(
+            1,
+            request_profiler_cfg.get(
+                "max_profile_count", DEFAULT_MAX_PROFILE_COUNT
+            ),
+        )
+
+        self.__CONDITION = threading.Condition()
+        self.__active_profiles: List[RequestProfile] = []
+        # profiles handed from the request to the worker of the update
+        self.__attached_profiles: Dict[int, tuple] = {}
+        self.__next_slot = None
+        self.__thread = None
+
+    def start(self, is_requested: bool = False) -> Optional[RequestProfile]:
+        # the request thread is profiled until release
+        if is_requested:
+            trigger = "header"
+        elif self.__ENABLED and random.random() < self.__SAMPLE_RATE:
+            trigger = "sampled"
+        elif self.__ENABLED and self.__LATENCY_THRESHOLD is not None:
+            trigger = None
+        else:
+            return None
+
+        profile = RequestProfile(trigger, self.__complete)
+        profile.add_thread()
+        current_profiles.profile = profile
+        with self.__CONDITION:
+            self.__active_profiles.append(profile)
+            if not self.__thread:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="request-profiler", daemon=True
+                )
+                self.__thread.start()
+            self.__CONDITION.notify_all()
+        return profile
+
+    def attach(self, entity: RemoteEntity) -> None:
+        # the profile of the request continues in the worker that processes
+        # the update of the entity
+        profile = get_current_request_profile()
+        if not profile:
+            return
+        profile.set_entity(entity)
+        profile.hand_over()
+        with self.__CONDITION:
+            # the entity is kept so that its id cannot be reused meanwhile
+            self.__attached_profiles[id(entity)] = (entity, profile)
+
+    def detach(self, entity: RemoteEntity) -> None:
+        # the update of the entity was not handed to a worker after all
+        with self.__CONDITION:
+            _, profile = self.__attached_profiles.pop(
+                id(entity), (None, None)
+            )
+        if profile:
+            profile.take_back()
+
+    def release(self) -> None:
+        # the request thread is done with the profile
+        profile = get_current_request_profile()
+        if not profile:
+            return
+        current_profiles.profile = None
+        if profile.remove_thread():
+            profile.complete()
+
+    @contextmanager
+    def profile_update(self, entity: RemoteEntity) -> Iterator[None]:
+        with self.__CONDITION:
+            _, profile = self.__attached_profiles.pop(
+                id(entity), (None, None)
+            )
+        if not profile:
+            yield
+            return
+
+        profile.add_thread(is_handed_over=True)
+        current_profiles.profile = profile
+        try:
+            yield
+        finally:
+            current_profiles.profile = None
+            if profile.remove_thread():
+                profile.complete()
+
+    def write_profile(self, profile: RequestProfile) -> Path:
+        # profiles are written to a fixed number of files, the oldest one is
+        # overwritten when all of them are used
+        with self.__CONDITION:
+            if self.__next_slot is None:
+                self.__PROFILE_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+                self.__next_slot = self.__find_next_slot()
+            slot = self.__next_slot
+            self.__next_slot = (slot + 1) % self.__MAX_PROFILE_COUNT
+
+            profile_file_path = self.get_profile_file_path(slot)
+            tmp_file_path = profile_file_path.with_suffix(".tmp")
+            with open(tmp_file_path, "w") as tmp_file:
+                json.dump(
+                    profile.to_dict(self.__SAMPLING_INTERVAL),
+                    tmp_file,
+                    indent=2,
+                )
+            os.replace(tmp_file_path, profile_file_path)
+        return profile_file_path
+
+    def get_profile_file_path(self, slot: int) -> Path:
+        return self.__PROFILE_FOLDER_PATH / f"profile_{slot:04d}.json"
+
+    def __complete(self, profile: RequestProfile) -> None:
+        with self.__CONDITION:
+            self.__active_profiles.remove(profile)
+
+        if profile.trigger is None:
+            if profile.get_busy_seconds() < self.__LATENCY_THRESHOLD:
+                return
+            profile.trigger = "slow"
+        try:
+            self.write_profile(profile)
+        except OSError:
+            logger.exception("Failed to write a request profile")
+
+    def __find_next_slot(self) -> int:
+        # the slot after the most recently written profile
+        written_slots = [
+            (self.get_profile_file_path(slot).stat().st_mtime_ns, slot)
+            for slot in range(self.__MAX_PROFILE_COUNT)
+            if self.get_profile_file_path(slot).is_file()
+        ]
+        if not written_slots:
+            return 0
+        return (max(written_slots)[1] + 1) % self.__MAX_PROFILE_COUNT
+
+    def __get_sampled_profiles(self) -> tuple:
+        # profiles to sample now and the seconds until the next one of the
+        # other profiles may cross the latency threshold
+        sampled_profiles = []
+        wait_time = None
+        for profile in self.__active_profiles:
+            if profile.trigger is not None:
+                sampled_profiles.append(profile)
+                continue
+            remaining = self.__LATENCY_THRESHOLD - profile.get_busy_seconds()
+            if remaining <= 0:
+                sampled_profiles.append(profile)
+            elif wait_time is None or remaining < wait_time:
+                wait_time = remaining
+        if sampled_profiles:
+            wait_time = self.__SAMPLING_INTERVAL
+        elif wait_time is not None:
+            wait_time = max(wait_time, self.__SAMPLING_INTERVAL)
+        return sampled_profiles, wait_time
+
+    def __run(self) -> None:
+        # a single thread samples the stacks of all profiled threads, the
+        # profiled code itself is not instrumented
+        while True:
+            with self.__CONDITION:
+                sampled_profiles, wait_time = self.__get_sampled_profiles()
+                if not sampled_profiles:
+                    # idle until a profile starts or may become slow
+                    self.__CONDITION.wait(wait_time)
+                    continue
+
+            frames = sys._current_frames()
+            for profile in sampled_profiles:
+                for thread_id in profile.get_thread_ids():
+                    frame = frames.get(thread_id)
+                    if frame:
+                        profile.add_sample(get_collapsed_stack(frame))
+            del frames
+
+            time.sleep(wait_time)
@@ -1,31 +1,126 @@
 import hmac
 from hashlib import sha256
+from typing import Iterable, List
 
 from flask import Request
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import RequestEntityTooLarge
+
+DEFAULT_MAX_BODY_SIZE = 1024 * 1024
 
 
 class SignatureValidator:
     def __init__(self, processors_cfg):
         self.__PROCESSORS_CFG = processors_cfg
-        self.__WEBHOOK_SECRET = processors_cfg.get("shared_settings", {}).get(
-            "webhook_secret"
+        shared_settings = processors_cfg.get("shared_settings", {})
+
+        # several secrets can be active at once so that the secret shared
+        # with the backend can be rotated without downtime
+        webhook_secrets = list(shared_settings.get("webhook_secrets", []))
+        if shared_settings.get("webhook_secret"):
+            webhook_secrets.append(shared_settings.get("webhook_secret"))
+        if not webhook_secrets:
+            raise ValueError(
+                "Missing 'webhook_secret' or 'webhook_secrets' in the "
+                "shared settings of the configuration."
+            )
+
+        # HMAC states keyed once on startup, every request only copies them
+        self.__KEYED_DIGESTS = [
+            hmac.new(key=webhook_secret.encode(), digestmod=sha256)
+            for webhook_secret in webhook_secrets
+        ]
+        self.__MAX_BODY_SIZE = shared_settings.get(
+            "webhook_max_body_size", DEFAULT_MAX_BODY_SIZE
         )
 
     def has_valid_signature(self, request: Request) -> bool:
-        signatures_str = request.headers.get("Django-Webhook-Signature-v1", "")
-        signatures = signatures_str.split(",")
-        timestamp = request.headers.get("Django-Webhook-Request-Timestamp", "")
+        self.check_content_length(request.headers)
+        return self.has_valid_body_signature(
+            request.headers, [request.get_data(cache=True)]
+        )
 
-        has_valid_signature = True
-        for signature in signatures:
-            digest_payload = bytes(timestamp, "utf8") + b":" + request.data
-            digest = hmac.new(
-                key=self.__WEBHOOK_SECRET.encode(),
-                msg=digest_payload,
-                digestmod=sha256,
-            )
-            has_valid_signature &= hmac.compare_digest(
-                digest.hexdigest(), signature
+    def check_content_length(
+        self, headers: Headers, max_body_size: int = None
+    ) -> None:
+        max_body_size = max_body_size or self.__MAX_BODY_SIZE
+        content_length = headers.get("Content-Length", type=int)
+        if content_length is not None and content_length > max_body_size:
+            raise RequestEntityTooLarge(
+                f"Request body exceeds the maximum size of {max_body_size} "
+                f"bytes."
             )
 
+    def get_hex_digests(
+        self,
+        timestamp: str,
+        body_chunks: Iterable[bytes],
+        max_body_size: int = None,
+    ) -> List[str]:
+        max_body_size = max_body_size or self.__MAX_BODY_SIZE
+        digests = [
+            keyed_digest.copy() for keyed_digest in self.__KEYED_DIGESTS
+        ]
+        digest_prefix = bytes(timestamp, "utf8") + b":"
+        for digest in digests:
+            digest.update(digest_prefix)
+
+        # the body is read chunk by chunk, every chunk is fed to all digests
+        body_size = 0
+        for body_chunk in body_chunks:
+            body_size += len(body_chunk)
+            if body_size > max_body_size:
+                raise RequestEntityTooLarge(
+                    f"Request body exceeds the maximum size of "
+                    f"{max_body_size} bytes."
+                )
+            for digest in digests:
+                digest.update(body_chunk)
+
+        return [digest.hexdigest() for digest in digests]
+
+    def has_valid_header_signature(
+        self, headers: Headers, header_name: str, signed_value: bytes
+    ) -> bool:
+        # headers that change how a request is handled are signed like the
+        # body - over the request timestamp and the value they stand for
+        signature = headers.get(header_name, "").strip()
+        if not signature:
+            return False
+
+        timestamp = headers.get("Django-Webhook-Request-Timestamp", "")
+        return any(
+            hmac.compare_digest(hex_digest, signature)
+            for hex_digest in self.get_hex_digests(timestamp, [signed_value])
+        )
+
+    def has_valid_body_signature(
+        self,
+        headers: Headers,
+        body_chunks: Iterable[bytes],
+        max_body_size: int = None,
+    ) -> bool:
+        signatures_str = headers.get("Django-Webhook-Signature-v1", "")
+        signatures = [
+            signature.strip()
+            for signature in signatures_str.split(",")
+            if signature.strip()
+        ]
+        timestamp = headers.get("Django-Webhook-Request-Timestamp", "")
+
+        self.check_content_length(headers, max_body_size)
+        hex_digests = self.get_hex_digests(
+            timestamp, body_chunks, max_body_size
+        )
+
+        # the backend signs the body with each of its active secrets, the
+        # request is valid when any of the signatures was made with any of
+        # the secrets known to the connector
+        has_valid_signature = False
+        for signature in signatures:
+            for hex_digest in hex_digests:
+                has_valid_signature |= hmac.compare_digest(
+                    hex_digest, signature
+                )
+
         return has_valid_signature
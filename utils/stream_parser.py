@@ -0,0 +1,145 @@
+import codecs
+import json
+from typing import IO, Any, Dict, Iterator
+
+CHUNK_SIZE = 64 * 1024
+# an invalid element must not make the parser buffer the rest of the stream
+MAX_ELEMENT_SIZE = 1024 * 1024
+JSON_DECODER = json.JSONDecoder()
+WHITESPACE = " \t\n\r"
+
+
+class StreamParseError(ValueError):
+    pass
+
+
+def iter_text_chunks(stream: IO[bytes], chunk_size: int) -> Iterator[str]:
+    # multi-byte characters may be split between two chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while chunk := stream.read(chunk_size):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+    except UnicodeDecodeError as err:
+        raise StreamParseError(f"Invalid UTF-8 data: {err.reason}.")
+
+
+def spool_stream(
+    stream: IO[bytes], spool_file: IO[bytes], chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    # copies the stream into the spool file while handing out its chunks
+    while chunk := stream.read(chunk_size):
+        spool_file.write(chunk)
+        yield chunk
+
+
+def iter_ndjson_objects(
+    stream: IO[bytes],
+    chunk_size: int = CHUNK_SIZE,
+    max_element_size: int = MAX_ELEMENT_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    buffer = ""
+    line_number = 0
+    for text_chunk in iter_text_chunks(stream, chunk_size):
+        buffer += text_chunk
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_number += 1
+            yield parse_ndjson_line(line, line_number)
+
+        if len(buffer) > max_element_size:
+            raise StreamParseError(
+                f"Line {line_number + 1} exceeds the maximum size of "
+                f"{max_element_size} characters."
+            )
+
+    if buffer.strip():
+        yield parse_ndjson_line(buffer, line_number + 1)
+
+
+def parse_ndjson_line(line: str, line_number: int) -> Dict[str, Any]:
+    try:
+        parsed_object = json.loads(line)
+    except json.JSONDecodeError as err:
+        raise StreamParseError(f"Invalid JSON on line {line_number}: {err}")
+
+    if not isinstance(parsed_object, dict):
+        raise StreamParseError(f"Line {line_number} is not a JSON object.")
+
+    return parsed_object
+
+
+def iter_json_array_objects(
+    stream: IO[bytes],
+    chunk_size: int = CHUNK_SIZE,
+    max_element_size: int = MAX_ELEMENT_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    # only the currently parsed element is kept in memory, the array itself
+    # is never materialized
+    text_chunks = iter_text_chunks(stream, chunk_size)
+    buffer = ""
+    position = 0
+
+    def read_more() -> bool:
+        nonlocal buffer, position
+        text_chunk = next(text_chunks, None)
+        if text_chunk is None:
+            return False
+        buffer = buffer[position:] + text_chunk
+        position = 0
+        return True
+
+    def next_token() -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                return ""
+
+    if next_token() != "[":
+        raise StreamParseError("Request body must be a JSON array.")
+    position += 1
+
+    if next_token() == "]":
+        position += 1
+    else:
+        element_index = 0
+        while True:
+            if next_token() != "{":
+                raise StreamParseError(
+                    f"Array element {element_index} is not a JSON object."
+                )
+
+            while True:
+                try:
+                    parsed_object, position = JSON_DECODER.raw_decode(
+                        buffer, position
+                    )
+                    break
+                except json.JSONDecodeError as err:
+                    # the element may continue in the next chunk
+                    if (
+                        len(buffer) - position > max_element_size
+                        or not read_more()
+                    ):
+                        raise StreamParseError(
+                            f"Invalid array element {element_index}: {err}"
+                        )
+            yield parsed_object
+            element_index += 1
+
+            separator = next_token()
+            position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise StreamParseError(
+                    f"Expected ',' or ']' after array element "
+                    f"{element_index - 1}."
+                )
+
+    if next_token():
+        raise StreamParseError("Unexpected data after the JSON array.")
@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+
+class UpdateJournal:
+    __JOURNAL_FILE_NAME = "update_journal.jsonl"
+    # the journal is truncated once it is fully drained and exceeds this size
+    __COMPACTION_THRESHOLD_BYTES = 1024 * 1024
+
+    def __init__(self, journal_folder_path: Path):
+        self.__JOURNAL_FOLDER_PATH = journal_folder_path
+        self.__JOURNAL_FILE_PATH = (
+            journal_folder_path / self.__JOURNAL_FILE_NAME
+        )
+        self.__LOCK = threading.Lock()
+
+        self.__pending_sequence_numbers = set()
+        self.__next_sequence_number = 1
+        self.__journal_file = None
+
+    def open(self) -> List[Tuple[int, Dict[str, Any]]]:
+        self.__JOURNAL_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        pending_entries = self.__read_pending_entries()
+        self.__rewrite_journal(pending_entries)
+
+        self.__pending_sequence_numbers = {seq for seq, _ in pending_entries}
+        if pending_entries:
+            self.__next_sequence_number = pending_entries[-1][0] + 1
+        # the payloads contain client secrets, the journal is readable by
+        # its owner only
+        self.__journal_file = open(
+            os.open(
+                self.__JOURNAL_FILE_PATH,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                0o600,
+            ),
+            "a",
+        )
+
+        return pending_entries
+
+    def close(self) -> None:
+        with self.__LOCK:
+            if self.__journal_file:
+                self.__journal_file.close()
+                self.__journal_file = None
+
+    def append(self, payload: Dict[str, Any]) -> int:
+        return self.append_many([payload])[0]
+
+    def append_many(self, payloads: List[Dict[str, Any]]) -> List[int]:
+        # all payloads are made durable by a single fsync
+        with self.__LOCK:
+            sequence_numbers = []
+            for payload in payloads:
+                sequence_number = self.__next_sequence_number
+                self.__next_sequence_number += 1
+                record = {"seq": sequence_number, "payload": payload}
+                self.__journal_file.write(
+                    json.dumps(record, separators=(",", ":")) + "\n"
+                )
+                sequence_numbers.append(sequence_number)
+
+            self.__sync()
+            self.__pending_sequence_numbers.update(sequence_numbers)
+
+        return sequence_numbers
+
+    def acknowledge(self, sequence_number: int) -> None:
+        with self.__LOCK:
+            self.__write_record({"ack": sequence_number})
+            self.__pending_sequence_numbers.discard(sequence_number)
+
+            if (
+                not self.__pending_sequence_numbers
+                and self.__journal_file.tell()
+                > self.__COMPACTION_THRESHOLD_BYTES
+            ):
+                self.__journal_file.truncate(0)
+                self.__journal_file.seek(0)
+                self.__sync()
+
+    def pending_count(self) -> int:
+        with self.__LOCK:
+            return len(self.__pending_sequence_numbers)
+
+    def __write_record(self, record: Dict[str, Any]) -> None:
+        self.__journal_file.write(
+            json.dumps(record, separators=(",", ":")) + "\n"
+        )
+        self.__sync()
+
+    def __sync(self) -> None:
+        self.__journal_file.flush()
+        os.fsync(self.__journal_file.fileno())
+
+    def __read_pending_entries(self) -> List[Tuple[int, Dict[str, Any]]]:
+        if not self.__JOURNAL_FILE_PATH.is_file():
+            return []
+
+        entries = {}
+        with open(self.__JOURNAL_FILE_PATH, "r") as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn write of the last record before a crash - the
+                    # update was never acknowledged to the sender
+                    continue
+
+                if "ack" in record:
+                    entries.pop(record["ack"], None)
+                else:
+                    entries[record["seq"]] = record["payload"]
+
+        return sorted(entries.items())
+
+    def __rewrite_journal(
+        self, pending_entries: List[Tuple[int, Dict[str, Any]]]
+    ) -> None:
+        tmp_file_path = self.__JOURNAL_FILE_PATH.with_suffix(".tmp")
+        tmp_fd = os.open(
+            tmp_file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with open(tmp_fd, "w") as tmp_file:
+            for sequence_number, payload in pending_entries:
+                record = {"seq": sequence_number, "payload": payload}
+                tmp_file.write(json.dumps(record, separators=(",", ":")))
+                tmp_file.write("\n")
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+
+        os.replace(tmp_file_path, self.__JOURNAL_FILE_PATH)
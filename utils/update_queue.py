@@ -0,0 +1,115 @@
+import logging
+import threading
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from queue import Queue
+from typing import Any, Callable, List
+
+from entities.remote_entity import RemoteEntity
+from utils.update_journal import UpdateJournal
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    def __init__(
+        self,
+        update_queue_cfg,
+        update_handler: Callable[[RemoteEntity], Any],
+    ):
+        self.__JOURNAL = UpdateJournal(
+            Path(
+                update_queue_cfg.get(
+                    "journal_folder_path",
+                    "/var/lib/ti_wizard/update_journal",
+                )
+            )
+        )
+        self.__WORKER_COUNT = max(1, update_queue_cfg.get("worker_count", 4))
+        self.__UPDATE_HANDLER = update_handler
+
+        # every entity is always handled by the same worker so that updates
+        # of a single entity are applied in the order they were received
+        self.__WORKER_QUEUES: List[Queue] = [
+            Queue() for _ in range(self.__WORKER_COUNT)
+        ]
+        self.__workers: List[threading.Thread] = []
+
+    def start(self) -> None:
+        pending_entries = self.__JOURNAL.open()
+        for sequence_number, entity_data in pending_entries:
+            self.__dispatch(
+                sequence_number, RemoteEntity.from_data(entity_data)
+            )
+
+        for worker_queue in self.__WORKER_QUEUES:
+            worker = threading.Thread(
+                target=self.__work, args=(worker_queue,), daemon=True
+            )
+            worker.start()
+            self.__workers.append(worker)
+
+    def stop(self) -> None:
+        for worker_queue in self.__WORKER_QUEUES:
+            worker_queue.put(None)
+
+        for worker in self.__workers:
+            worker.join()
+
+        self.__workers = []
+        self.__JOURNAL.close()
+
+    def enqueue(self, entity: RemoteEntity) -> Future:
+        return self.enqueue_many([entity])[0]
+
+    def enqueue_many(self, entities: List[RemoteEntity]) -> List[Future]:
+        # the futures resolve to the result of the update handler once the
+        # update is processed
+        sequence_numbers = self.__JOURNAL.append_many(
+            [entity.to_dict() for entity in entities]
+        )
+        return [
+            self.__dispatch(sequence_number, entity)
+            for sequence_number, entity in zip(sequence_numbers, entities)
+        ]
+
+    def depth(self) -> int:
+        return self.__JOURNAL.pending_count()
+
+    def join(self) -> None:
+        for worker_queue in self.__WORKER_QUEUES:
+            worker_queue.join()
+
+    def __dispatch(
+        self, sequence_number: int, entity: RemoteEntity
+    ) -> Future:
+        update_future = Future()
+        id_hash = str(entity.id_hash)
+        worker_index = zlib.crc32(id_hash.encode()) % self.__WORKER_COUNT
+        self.__WORKER_QUEUES[worker_index].put(
+            (sequence_number, entity, update_future)
+        )
+        return update_future
+
+    def __work(self, worker_queue: Queue) -> None:
+        while True:
+            queue_item = worker_queue.get()
+            if queue_item is None:
+                worker_queue.task_done()
+                return
+
+            sequence_number, entity, update_future = queue_item
+            try:
+                update_future.set_result(self.__UPDATE_HANDLER(entity))
+            except Exception as err:
+                # a failing update must not block the entity's later updates
+                # nor be replayed forever after a restart - the journal only
+                # covers crashes, failed updates are not retried
+                logger.exception(
+                    f"Failed to process queued update #{sequence_number}"
+                )
+                update_future.set_exception(err)
+            finally:
+                self.__JOURNAL.acknowledge(sequence_number)
+                worker_queue.task_done()